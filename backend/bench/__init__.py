@@ -0,0 +1 @@
+"""Reproducible benchmarks for the API; see bench/run.py for usage."""
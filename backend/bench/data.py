@@ -0,0 +1,176 @@
+"""Seeded synthetic shop data.
+
+The same seed and scale always produce the same documents (ids, names,
+plates, quote items and dates), so two benchmark runs only differ by the
+code under test.
+"""
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import server
+
+# clients per scale; the other collections are derived from it
+SCALES = {"small": 200, "medium": 2000, "large": 20000}
+VEHICLES_PER_CLIENT = 1.4
+QUOTES_PER_CLIENT = 3
+APPOINTMENTS_PER_CLIENT = 2
+SERVICE_COUNT = 40
+PART_COUNT = 150
+INSERT_BATCH_SIZE = 1000
+
+# History spans the year before this date; fixed so reruns match.
+REFERENCE_DATE = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+FIRST_NAMES = ["Ana", "Bruno", "Carla", "Diego", "Eduarda", "Fábio", "Gabriela", "Heitor", "Isabela", "João",
+               "Larissa", "Marcos", "Natália", "Otávio", "Paula", "Rafael", "Sofia", "Tiago", "Vitória", "Wagner"]
+LAST_NAMES = ["Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Lima", "Gomes",
+              "Costa", "Ribeiro", "Martins", "Carvalho", "Araújo", "Melo", "Barbosa", "Cardoso", "Rocha", "Dias"]
+CARS = [("Volkswagen", "Gol"), ("Volkswagen", "Polo"), ("Fiat", "Uno"), ("Fiat", "Argo"), ("Chevrolet", "Onix"),
+        ("Chevrolet", "Prisma"), ("Ford", "Ka"), ("Hyundai", "HB20"), ("Toyota", "Corolla"), ("Honda", "Civic"),
+        ("Renault", "Sandero"), ("Jeep", "Renegade")]
+SERVICE_NAMES = ["Troca de óleo", "Alinhamento", "Balanceamento", "Revisão de freios", "Troca de correia",
+                 "Limpeza de bicos", "Diagnóstico eletrônico", "Troca de embreagem", "Higienização do ar"]
+PART_NAMES = ["Filtro de óleo", "Pastilha de freio", "Disco de freio", "Correia dentada", "Vela de ignição",
+              "Amortecedor", "Bateria", "Filtro de ar", "Óleo 5W30", "Lâmpada farol"]
+SUPPLIERS = ["Bosch", "NGK", "Cofap", "Fras-le", "Mahle", "Moura", None]
+
+
+class ShopDataGenerator:
+    def __init__(self, seed: int = 42, scale: str = "small"):
+        self.rng = random.Random(seed)
+        self.client_count = SCALES[scale]
+
+    def uuid(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def past_date(self, days: int = 365) -> datetime:
+        return REFERENCE_DATE - timedelta(seconds=self.rng.randrange(days * 86400))
+
+    def digits(self, count: int) -> str:
+        return "".join(str(self.rng.randrange(10)) for _ in range(count))
+
+    def plate(self) -> str:
+        letters = "".join(self.rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(3))
+        return f"{letters}{self.rng.randrange(10)}{self.rng.choice('ABCDEFGHIJ')}{self.digits(2)}"
+
+    def catalog(self, names, count, price_field, model):
+        docs = []
+        for index in range(count):
+            doc = {
+                "id": self.uuid(),
+                "name": f"{names[index % len(names)]} {index // len(names) + 1}",
+                "supplier": self.rng.choice(SUPPLIERS),
+                price_field: round(self.rng.uniform(20, 900), 2),
+                "created_at": self.past_date(),
+            }
+            if model is server.Part:
+                doc["stock"] = self.rng.randrange(0, 60)
+            docs.append(model(**doc).model_dump())
+        return docs
+
+    def generate(self) -> dict:
+        """Documents per collection, shaped exactly like the API writes them."""
+        services = self.catalog(SERVICE_NAMES, SERVICE_COUNT, "default_price", server.Service)
+        parts = self.catalog(PART_NAMES, PART_COUNT, "price", server.Part)
+
+        clients, vehicles = [], []
+        for _ in range(self.client_count):
+            name = f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)} {self.rng.choice(LAST_NAMES)}"
+            client = server.Client(
+                id=self.uuid(),
+                name=name,
+                phone=f"(11) 9{self.digits(4)}-{self.digits(4)}",
+                email=f"{name.split()[0].lower()}.{self.digits(4)}@example.com",
+                cpf=f"{self.digits(3)}.{self.digits(3)}.{self.digits(3)}-{self.digits(2)}",
+                created_at=self.past_date(),
+            ).model_dump()
+            client["search"] = server.search_keys("clients", client)
+            clients.append(client)
+        for index in range(int(self.client_count * VEHICLES_PER_CLIENT)):
+            # every client owns at least one vehicle
+            owner = clients[index] if index < len(clients) else self.rng.choice(clients)
+            brand, model = self.rng.choice(CARS)
+            vehicle = server.Vehicle(
+                id=self.uuid(),
+                client_id=owner["id"],
+                license_plate=self.plate(),
+                brand=brand,
+                model=model,
+                year=self.rng.randrange(2005, 2026),
+                mileage=self.rng.randrange(5000, 250000),
+                created_at=max(owner["created_at"], self.past_date()),
+            ).model_dump()
+            vehicle["search"] = server.search_keys("vehicles", vehicle)
+            vehicles.append(vehicle)
+
+        quotes = [self.quote(self.rng.choice(vehicles), services, parts)
+                  for _ in range(self.client_count * QUOTES_PER_CLIENT)]
+        appointments = []
+        for _ in range(self.client_count * APPOINTMENTS_PER_CLIENT):
+            vehicle = self.rng.choice(vehicles)
+            created_at = self.past_date()
+            appointments.append(server.Appointment(
+                id=self.uuid(),
+                client_id=vehicle["client_id"],
+                vehicle_id=vehicle["id"],
+                appointment_date=created_at + timedelta(days=self.rng.randrange(1, 30), hours=self.rng.randrange(8, 18)),
+                status=self.rng.choice(["scheduled", "confirmed", "completed", "completed", "cancelled"]),
+                created_at=created_at,
+            ).model_dump())
+
+        return {
+            "services": services,
+            "parts": parts,
+            "clients": clients,
+            "vehicles": vehicles,
+            "quotes": quotes,
+            "appointments": appointments,
+        }
+
+    def quote(self, vehicle: dict, services: list, parts: list) -> dict:
+        items = []
+        for _ in range(self.rng.randrange(1, 9)):
+            kind = self.rng.choice(["service", "part"])
+            source = self.rng.choice(services if kind == "service" else parts)
+            price = source["default_price"] if kind == "service" else source["price"]
+            quantity = 1 if kind == "service" else self.rng.randrange(1, 5)
+            items.append({
+                "type": kind,
+                "item_id": source["id"],
+                "name": source["name"],
+                "supplier": source["supplier"],
+                "quantity": quantity,
+                "unit_price": price,
+                "total": round(price * quantity, 2),
+            })
+        subtotal = round(sum(item["total"] for item in items), 2)
+        labor_cost = self.rng.choice([0, 0, 80, 150, 300])
+        discount = self.rng.choice([0, 0, 0, 25, 50])
+        status = self.rng.choice(["pending", "pending", "approved", "approved", "rejected", "completed"])
+        created_at = self.past_date()
+        return server.Quote(
+            id=self.uuid(),
+            client_id=vehicle["client_id"],
+            vehicle_id=vehicle["id"],
+            items=items,
+            subtotal=subtotal,
+            labor_cost=labor_cost,
+            discount=discount,
+            total=round(subtotal + labor_cost - discount, 2),
+            status=status,
+            created_at=created_at,
+            approved_at=created_at + timedelta(days=2) if status in ("approved", "completed") else None,
+        ).model_dump()
+
+
+async def seed_database(db, seed: int = 42, scale: str = "small") -> dict:
+    """Insert a generated data set into `db` and return it."""
+    data = ShopDataGenerator(seed, scale).generate()
+    for name, docs in data.items():
+        for start in range(0, len(docs), INSERT_BATCH_SIZE):
+            # insert copies: the driver adds _id to the dicts it is given
+            await db[name].insert_many([dict(doc) for doc in docs[start:start + INSERT_BATCH_SIZE]])
+    await server.reconcile_dashboard_stats()
+    await server.rebuild_revenue_rollups()
+    return data
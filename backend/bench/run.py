@@ -0,0 +1,231 @@
+"""Run the benchmark scenarios and compare them with a stored baseline.
+
+Usage (from backend/):
+    python -m bench.run [--backend memory|mongo] [--scale small|medium|large] [--seed N]
+                        [--scenario NAME ...] [--save] [--tolerance 0.25]
+
+Requests go through the real FastAPI app over httpx's ASGI transport, so
+the numbers cover routing, validation, serialization and the database
+driver, but no network. The memory backend needs mongomock-motor; the
+mongo backend uses MONGO_URL and drops BENCH_DB_NAME before seeding.
+
+Results are compared with bench/baselines/<backend>-<scale>.json and the
+exit status is 1 when a scenario regressed past --tolerance; --save
+overwrites the baseline. memory-small.json is committed as the reference for
+CI. Latencies depend on the machine, so re-record it (--save) when comparing
+on a different host.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+RSS_SAMPLE_SECONDS = 0.005
+WARMUP_REQUESTS = 5
+
+
+@dataclass
+class Context:
+    http: object
+    headers: dict
+    credentials: dict
+    data: dict
+    state: dict = field(default_factory=dict)
+
+
+def current_rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # ru_maxrss is the process-lifetime peak (KiB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Nearest-rank percentile."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(fraction * len(sorted_values) + 0.5))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+async def run_scenario(ctx: Context, scenario) -> dict:
+    if scenario.prepare:
+        await scenario.prepare(ctx)
+    for index in range(WARMUP_REQUESTS):
+        await scenario.send(ctx, scenario.requests + index)
+
+    latencies, errors = [], 0
+    peak_rss = current_rss_bytes()
+    slots = asyncio.Semaphore(scenario.concurrency)
+    done = asyncio.Event()
+
+    async def sample_rss():
+        nonlocal peak_rss
+        while not done.is_set():
+            peak_rss = max(peak_rss, current_rss_bytes())
+            await asyncio.sleep(RSS_SAMPLE_SECONDS)
+
+    async def one(index):
+        nonlocal errors
+        async with slots:
+            started = time.perf_counter()
+            response = await scenario.send(ctx, index)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code not in scenario.expected_status:
+                errors += 1
+
+    sampler = asyncio.create_task(sample_rss())
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(scenario.requests)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await sampler
+
+    latencies.sort()
+    return {
+        "requests": scenario.requests,
+        "concurrency": scenario.concurrency,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "throughput_rps": round(scenario.requests / elapsed, 1),
+        "peak_rss_mb": round(peak_rss / 2**20, 1),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Scenarios whose p95 or throughput moved past the tolerance."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        if result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']} -> {result['p95_ms']} ms")
+        if result["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['throughput_rps']} -> {result['throughput_rps']} req/s")
+        if result["errors"] > before["errors"]:
+            regressions.append(f"{name}: errors {before['errors']} -> {result['errors']}")
+    return regressions
+
+
+def print_table(results: dict, baseline: dict):
+    print(f"{'scenario':18} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'rss MB':>8} {'errors':>7}  p95 vs baseline")
+    for name, result in results.items():
+        before = baseline.get("scenarios", {}).get(name)
+        delta = f"{(result['p95_ms'] / before['p95_ms'] - 1) * 100:+.0f}%" if before and before["p95_ms"] else "-"
+        print(f"{name:18} {result['p50_ms']:9.2f} {result['p95_ms']:9.2f} {result['p99_ms']:9.2f} "
+              f"{result['throughput_rps']:9.1f} {result['peak_rss_mb']:8.1f} {result['errors']:7}  {delta}")
+
+
+async def benchmark(args) -> int:
+    import httpx
+    import server
+    from bench.data import seed_database
+    from bench.scenarios import SCENARIOS
+
+    names = args.scenario or list(SCENARIOS)
+    unknown = sorted(set(names) - set(SCENARIOS))
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(unknown)}; choose from {', '.join(SCENARIOS)}")
+        return 2
+
+    if args.backend == "memory":
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            print("The memory backend needs mongomock-motor: pip install mongomock-motor")
+            return 2
+        server.db = AsyncMongoMockClient()[args.db_name]
+    else:
+        await server.client.drop_database(args.db_name)
+
+    print(f"Seeding {args.scale} data set (seed {args.seed}) into {args.backend} ...")
+    data = await seed_database(server.db, args.seed, args.scale)
+    await server.startup_event()
+    transport = httpx.ASGITransport(app=server.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+            credentials = {"username": "ibs", "password": "ibs1234"}
+            login = await http.post("/api/auth/login", json=credentials)
+            headers = {"Authorization": f"Bearer {login.json()['token']}"}
+            ctx = Context(http, headers, credentials, data)
+            results = {}
+            for name in names:
+                print(f"Running {name} ...")
+                results[name] = await run_scenario(ctx, SCENARIOS[name])
+    finally:
+        for task in ("stats_reconciler", "revocation_sync"):
+            getattr(server.app.state, task).cancel()
+        await server.shutdown_db_client()
+
+    baseline_path = BASELINE_DIR / f"{args.backend}-{args.scale}.json"
+    baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+    print_table(results, baseline)
+
+    if not baseline:
+        print(f"No baseline at {baseline_path}; run with --save to record one")
+    regressions = compare(results, baseline, args.tolerance) if baseline else []
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+
+    if args.save:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        baseline_path.write_text(json.dumps({
+            "meta": {
+                "backend": args.backend,
+                "scale": args.scale,
+                "seed": args.seed,
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            },
+            "scenarios": results,
+        }, indent=2) + "\n")
+        print(f"Baseline written to {baseline_path}")
+    return 1 if regressions else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="IBS Auto Center API benchmarks")
+    parser.add_argument("--backend", choices=["memory", "mongo"], default="memory")
+    parser.add_argument("--scale", choices=["small", "medium", "large"], default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scenario", action="append", help="Run only this scenario (repeatable)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p95/throughput drift before failing")
+    parser.add_argument("--save", action="store_true", help="Record the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    args.db_name = os.environ.get("BENCH_DB_NAME", "ibs_bench")
+    if args.backend == "mongo" and "bench" not in args.db_name:
+        # the database is dropped before seeding
+        print(f"Refusing to drop {args.db_name!r}: BENCH_DB_NAME must contain 'bench'")
+        return 2
+
+    # server reads its configuration at import time
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ["DB_NAME"] = args.db_name
+    os.environ["PDF_CACHE_DIR"] = tempfile.mkdtemp(prefix="ibs-bench-pdf-")
+    # measure bcrypt, not the login throttle
+    os.environ.setdefault("LOGIN_USER_BURST", "1000000")
+    os.environ.setdefault("LOGIN_IP_BURST", "1000000")
+    if args.backend == "memory":
+        # the stand-in lacks $type; seeded dates are all BSON dates anyway
+        os.environ["DATE_DUAL_READ"] = "0"
+    return asyncio.run(benchmark(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Benchmark scenarios.
+
+A scenario issues `requests` calls against the ASGI app with at most
+`concurrency` in flight. `send(ctx, index)` performs call number `index`;
+`prepare(ctx)` runs once beforehand, untimed, for lookups such as page
+cursors.
+"""
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+import server
+
+LIST_PAGES = 5
+LIST_PAGE_SIZE = 50
+
+
+@dataclass
+class Scenario:
+    name: str
+    send: Callable[..., Awaitable]
+    requests: int = 200
+    concurrency: int = 8
+    prepare: Optional[Callable[..., Awaitable]] = None
+    expected_status: tuple = (200,)
+
+
+def list_pages(collection_name: str) -> Scenario:
+    """Walk the first LIST_PAGES pages of a list route, newest first."""
+    path = f"/api/{collection_name}"
+
+    async def prepare(ctx):
+        cursors, after = [None], None
+        for _ in range(LIST_PAGES - 1):
+            params = {"limit": LIST_PAGE_SIZE, **({"after": after} if after else {})}
+            response = await ctx.http.get(path, params=params, headers=ctx.headers)
+            after = response.headers.get(server.NEXT_CURSOR_HEADER)
+            if not after:
+                break
+            cursors.append(after)
+        ctx.state[collection_name] = cursors
+
+    async def send(ctx, index):
+        cursors = ctx.state[collection_name]
+        after = cursors[index % len(cursors)]
+        params = {"limit": LIST_PAGE_SIZE, **({"after": after} if after else {})}
+        return await ctx.http.get(path, params=params, headers=ctx.headers)
+
+    return Scenario(f"list_{collection_name}", send, prepare=prepare)
+
+
+async def get_dashboard(ctx, index):
+    return await ctx.http.get("/api/dashboard/stats", headers=ctx.headers)
+
+
+async def get_quote_pdf(ctx, index):
+    # Distinct quotes in order: the first pass over the data is rendered,
+    # later passes (requests > quotes) are cache hits.
+    quote = ctx.data["quotes"][index % len(ctx.data["quotes"])]
+    return await ctx.http.get(f"/api/quotes/{quote['id']}/pdf", headers=ctx.headers)
+
+
+async def login(ctx, index):
+    return await ctx.http.post("/api/auth/login", json=ctx.credentials)
+
+
+async def create_quote(ctx, index):
+    template = ctx.data["quotes"][index % len(ctx.data["quotes"])]
+    payload = {
+        "client_id": template["client_id"],
+        "vehicle_id": template["vehicle_id"],
+        "items": template["items"],
+        "labor_cost": template["labor_cost"],
+        "discount": template["discount"],
+    }
+    return await ctx.http.post("/api/quotes", json=payload, headers=ctx.headers)
+
+
+SCENARIOS = {scenario.name: scenario for scenario in [
+    list_pages("clients"),
+    list_pages("quotes"),
+    list_pages("appointments"),
+    Scenario("dashboard", get_dashboard),
+    Scenario("quote_pdf", get_quote_pdf, requests=100, concurrency=4),
+    Scenario("login_burst", login, requests=40, concurrency=16),
+    Scenario("create_quote", create_quote),
+]}
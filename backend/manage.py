@@ -0,0 +1,114 @@
+"""Maintenance commands for the IBS Auto Center API.
+
+Usage:
+    python manage.py ensure-indexes
+    python manage.py check-indexes
+    python manage.py reconcile-stats
+    python manage.py migrate-dates [--collection NAME] [--batch-size N] [--restart]
+    python manage.py backfill-search [--batch-size N]
+    python manage.py bump-versions [--collection NAME]
+    python manage.py rebuild-revenue
+"""
+import argparse
+import asyncio
+import sys
+
+import server
+
+COMMANDS = {}
+
+def command(name: str, help_text: str, arguments=()):
+    """Register a command; `arguments` are (flags, kwargs) pairs for add_argument."""
+    def register(func):
+        COMMANDS[name] = (func, help_text, arguments)
+        return func
+    return register
+
+@command("ensure-indexes", "Create the indexes declared in server.INDEXES")
+async def ensure_indexes(args) -> int:
+    await server.ensure_indexes()
+    print("Indexes are up to date")
+    return 0
+
+@command("check-indexes", "Explain every route query shape and report COLLSCANs")
+async def check_indexes(args) -> int:
+    report = await server.check_index_coverage()
+    for entry in report:
+        marker = "COLLSCAN" if entry["collscan"] else "ok"
+        print(f"{marker:9} {entry['collection']:13} {entry['query']:32} {' <- '.join(entry['stages'])}")
+    missing = [entry for entry in report if entry["collscan"]]
+    print(f"{len(missing)} of {len(report)} query shapes are not covered by an index")
+    return 1 if missing else 0
+
+@command("reconcile-stats", "Recompute the dashboard counters from the source collections")
+async def reconcile_stats(args) -> int:
+    stats = await server.reconcile_dashboard_stats()
+    for key, value in stats.items():
+        print(f"{key}: {value}")
+    return 0
+
+@command("migrate-dates", "Convert legacy ISO string dates to BSON dates (resumable)", [
+    (("--collection",), {"choices": sorted(server.DATE_FIELDS), "help": "Only migrate this collection"}),
+    (("--batch-size",), {"type": int, "default": server.DATE_MIGRATION_BATCH_SIZE}),
+    (("--restart",), {"action": "store_true", "help": "Ignore saved checkpoints and rescan from the start"}),
+])
+async def migrate_dates(args) -> int:
+    names = [args.collection] if args.collection else sorted(server.DATE_FIELDS)
+    remaining = 0
+    for name in names:
+        checkpoint = await server.migrate_legacy_dates(name, args.batch_size, args.restart)
+        left = await server.count_legacy_dates(name)
+        remaining += left
+        print(f"{name:13} scanned {checkpoint['scanned']:>8}  converted {checkpoint['converted']:>8}  legacy left {left}")
+    if remaining:
+        print(f"{remaining} documents still hold string dates; rerun with --restart once writers are upgraded")
+        return 1
+    print("No legacy dates left; DATE_DUAL_READ=0 can be set")
+    return 0
+
+@command("backfill-search", "Recompute the normalized search keys of clients and vehicles", [
+    (("--batch-size",), {"type": int, "default": server.SEARCH_BACKFILL_BATCH_SIZE}),
+])
+async def backfill_search(args) -> int:
+    for name in server.SEARCH_COLLECTIONS:
+        updated = await server.backfill_search_keys(name, args.batch_size)
+        print(f"{name:13} updated {updated}")
+    return 0
+
+@command("rebuild-revenue", "Recompute the daily revenue rollups from the quotes")
+async def rebuild_revenue(args) -> int:
+    try:
+        days = await server.rebuild_revenue_rollups()
+    except RuntimeError as e:
+        print(e)
+        return 1
+    print(f"Rebuilt {days} daily revenue buckets")
+    return 0
+
+@command("bump-versions", "Invalidate cached list responses after editing the database by hand", [
+    (("--collection",), {"choices": server.VERSIONED_COLLECTIONS, "help": "Only bump this collection"}),
+])
+async def bump_versions(args) -> int:
+    names = [args.collection] if args.collection else server.VERSIONED_COLLECTIONS
+    for name in names:
+        await server.bump_version(name)
+        print(f"{name:13} {server.collection_version(name)}")
+    return 0
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="IBS Auto Center maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (func, help_text, arguments) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text)
+        for flags, kwargs in arguments:
+            subparser.add_argument(*flags, **kwargs)
+    args = parser.parse_args(argv)
+
+    func, _, _ = COMMANDS[args.command]
+    try:
+        return asyncio.run(func(args))
+    finally:
+        server.client.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
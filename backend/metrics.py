@@ -0,0 +1,160 @@
+"""In-process metrics in the Prometheus text exposition format.
+
+Kept free of FastAPI/Motor imports: server.py needs the MongoDB command
+listener before it creates the Motor client. Every worker exposes its own
+numbers; Prometheus sums them across scrape targets.
+"""
+import logging
+import math
+import threading
+
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+logger = logging.getLogger(__name__)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*zip(names, values), *extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter keyed by label values. Thread safe: MongoDB events
+    arrive on Motor's executor threads."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name, self.help_text, self.labels = name, help_text, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values=(), amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, values, (), value) for values, value in self._values.items()]
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for name, values, extra, value in self.samples():
+            lines.append(f"{name}{_labels(self.labels, values, extra)} {_number(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, label_values=(), value=0):
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram(Counter):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, label_values, value: float):
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                # one count per bucket, then sum and count
+                series = self._values[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            snapshot = [(values, list(series)) for values, series in self._values.items()]
+        samples = []
+        for values, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", values, (("le", _number(bound)),), cumulative))
+            samples.append((f"{self.name}_sum", values, (), series[-2]))
+            samples.append((f"{self.name}_count", values, (), series[-1]))
+        return samples
+
+
+def render(metrics) -> bytes:
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def command_shape(command_name: str, command) -> str:
+    """Field names of a command's filter or pipeline stages, never the values,
+    so slow-query logs do not leak CPFs or phone numbers."""
+    if command_name == "aggregate":
+        stages = [next(iter(stage), "?") for stage in command.get("pipeline", [])]
+        return "pipeline=" + ",".join(stages)
+    statements = command.get("updates") or command.get("deletes")
+    query = statements[0].get("q") if statements else command.get("filter", command.get("query"))
+    if isinstance(query, dict):
+        return "filter=" + ",".join(sorted(query))
+    return ""
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Times every MongoDB command by collection and command name and logs the
+    ones slower than `slow_ms` (0 disables the log)."""
+
+    def __init__(self, slow_ms: float = 0):
+        self.slow_ms = slow_ms
+        self.duration = Histogram(
+            "mongodb_command_duration_seconds", "MongoDB command round trip time",
+            ("collection", "command"),
+        )
+        self.failures = Counter("mongodb_command_failures_total", "MongoDB commands that failed", ("collection", "command"))
+        self.slow = Counter("mongodb_slow_commands_total", "MongoDB commands above the slow threshold", ("collection", "command"))
+        self._pending = {}
+
+    @property
+    def metrics(self):
+        return [self.duration, self.failures, self.slow]
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        collection = target if isinstance(target, str) else "-"
+        shape = command_shape(event.command_name, event.command) if self.slow_ms else ""
+        self._pending[(event.request_id, event.connection_id)] = (collection, shape)
+
+    def _finish(self, event):
+        collection, shape = self._pending.pop((event.request_id, event.connection_id), ("-", ""))
+        labels = (collection, event.command_name)
+        seconds = event.duration_micros / 1_000_000
+        self.duration.observe(labels, seconds)
+        if self.slow_ms and seconds * 1000 >= self.slow_ms:
+            self.slow.inc(labels)
+            logger.warning(f"Slow MongoDB {event.command_name} on {collection}: {seconds * 1000:.1f} ms {shape}")
+        return labels
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self.failures.inc(self._finish(event))
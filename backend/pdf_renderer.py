@@ -0,0 +1,196 @@
+"""Quote PDF rendering.
+
+Kept free of FastAPI/Motor imports so it can run inside a process pool:
+workers only import this module and receive a plain-data render spec
+built by server.build_quote_render_spec().
+"""
+import io
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.enums import TA_RIGHT
+
+
+def render_quote_pdf(spec: dict) -> bytes:
+    """Render a quote PDF from its render spec and return the document bytes.
+
+    spec keys: workshop_name, quote (id, status, items, subtotal, labor_cost,
+    discount, total, notes), quote_date, client_name, vehicle_label and an
+    optional logo asset (PNG data with its pixel width and height).
+    """
+    quote = spec['quote']
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    story = []
+    styles = getSampleStyleSheet()
+    
+    header_title_style = ParagraphStyle(
+        'HeaderTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        textColor=colors.white,
+        alignment=TA_RIGHT,
+        leading=22,
+        spaceAfter=4
+    )
+    header_quote_style = ParagraphStyle(
+        'HeaderQuote',
+        parent=styles['Normal'],
+        fontSize=11,
+        textColor=colors.HexColor('#FCA5A5'),
+        alignment=TA_RIGHT,
+        leading=14,
+        spaceAfter=2
+    )
+    header_date_style = ParagraphStyle(
+        'HeaderDate',
+        parent=styles['Normal'],
+        fontSize=9,
+        textColor=colors.HexColor('#D4D4D8'),
+        alignment=TA_RIGHT,
+        leading=12
+    )
+
+    quote_date = spec['quote_date']
+
+    logo_box = None
+    logo_asset = spec.get('logo')
+    if logo_asset:
+        try:
+            img_width, img_height = logo_asset['width'], logo_asset['height']
+            max_width = 1.25 * inch
+            max_height = 0.95 * inch
+            scale = min(max_width / img_width, max_height / img_height)
+            logo = Image(io.BytesIO(logo_asset['data']), width=img_width * scale, height=img_height * scale)
+            logo.hAlign = 'CENTER'
+
+            logo_box = Table([[logo]], colWidths=[1.5 * inch], rowHeights=[1.15 * inch])
+            logo_box.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#000000')),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+                ('TOPPADDING', (0, 0), (-1, -1), 4),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+                ('LEFTPADDING', (0, 0), (-1, -1), 4),
+                ('RIGHTPADDING', (0, 0), (-1, -1), 4),
+            ]))
+        except Exception:
+            # Keep PDF generation working even if the logo cannot be decoded.
+            logo_box = None
+    
+    header_content = [
+        Paragraph(spec['workshop_name'], header_title_style),
+        Paragraph(f"ORCAMENTO #{quote['id'][:8]}", header_quote_style),
+        Paragraph(f"Emitido em {quote_date}", header_date_style)
+    ]
+
+    if logo_box:
+        header_table = Table([[logo_box, header_content]], colWidths=[1.75 * inch, 4.25 * inch])
+        header_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#111827')),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('TOPPADDING', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+            ('LEFTPADDING', (0, 0), (-1, -1), 12),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 12),
+            ('LINEBELOW', (0, 0), (-1, -1), 3, colors.HexColor('#DC2626')),
+        ]))
+    else:
+        header_table = Table([[header_content]], colWidths=[6.0 * inch])
+        header_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#111827')),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('TOPPADDING', (0, 0), (-1, -1), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+            ('LEFTPADDING', (0, 0), (-1, -1), 12),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 12),
+            ('LINEBELOW', (0, 0), (-1, -1), 3, colors.HexColor('#DC2626')),
+        ]))
+
+    story.append(header_table)
+    
+    story.append(Spacer(1, 0.2*inch))
+    
+    info_data = [
+        ['Cliente:', spec['client_name']],
+        ['Veículo:', spec['vehicle_label']],
+        ['Data:', quote_date],
+        ['Status:', quote['status'].upper()]
+    ]
+    
+    info_table = Table(info_data, colWidths=[1.5*inch, 4.5*inch])
+    info_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#18181b')),
+        ('TEXTCOLOR', (0, 0), (0, -1), colors.white),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#27272a'))
+    ]))
+    
+    story.append(info_table)
+    story.append(Spacer(1, 0.3*inch))
+    
+    story.append(Paragraph("<b>Itens do Orçamento</b>", styles['Heading3']))
+    story.append(Spacer(1, 0.1*inch))
+    
+    items_data = [['Tipo', 'Item', 'Qtd', 'Preço Unit.', 'Total']]
+    for item in quote['items']:
+        items_data.append([
+            item['type'].upper(),
+            item['name'],
+            str(item['quantity']),
+            f"R$ {item['unit_price']:.2f}",
+            f"R$ {item['total']:.2f}"
+        ])
+    
+    items_table = Table(items_data, colWidths=[1*inch, 2.5*inch, 0.7*inch, 1.2*inch, 1.2*inch])
+    items_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#DC2626')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#27272a')),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9fafb')])
+    ]))
+    
+    story.append(items_table)
+    story.append(Spacer(1, 0.3*inch))
+    
+    totals_data = [
+        ['Subtotal:', f"R$ {quote['subtotal']:.2f}"],
+    ]
+    
+    if quote.get('labor_cost', 0) > 0:
+        totals_data.append(['Mão de Obra:', f"R$ {quote['labor_cost']:.2f}"])
+    
+    totals_data.append(['Desconto:', f"R$ {quote['discount']:.2f}"])
+    totals_data.append(['TOTAL:', f"R$ {quote['total']:.2f}"])
+    
+    totals_table = Table(totals_data, colWidths=[4.8*inch, 1.8*inch])
+    last_row = len(totals_data) - 1
+    totals_table.setStyle(TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
+        ('FONTNAME', (0, last_row), (-1, last_row), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, last_row), (-1, last_row), 14),
+        ('TEXTCOLOR', (0, last_row), (-1, last_row), colors.HexColor('#DC2626')),
+        ('LINEABOVE', (0, last_row), (-1, last_row), 2, colors.HexColor('#DC2626')),
+        ('TOPPADDING', (0, last_row), (-1, last_row), 12)
+    ]))
+    
+    story.append(totals_table)
+    
+    if quote.get('notes'):
+        story.append(Spacer(1, 0.3*inch))
+        story.append(Paragraph("<b>Observações:</b>", styles['Heading3']))
+        story.append(Paragraph(quote['notes'], styles['Normal']))
+    
+    doc.build(story)
+    return buffer.getvalue()
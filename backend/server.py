@@ -1,38 +1,65 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, UploadFile, File
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Response, UploadFile, File, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers
+from starlette.routing import Match
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, IndexModel, InsertOne, UpdateOne, ReturnDocument
+from pymongo.errors import OperationFailure, BulkWriteError, DuplicateKeyError
+from bson import json_util
 import os
+import asyncio
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, ValidationError, TypeAdapter, create_model
 from typing import List, Optional, Literal
 import uuid
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
 import bcrypt
 import jwt
 import requests
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_RIGHT
-from reportlab.lib.utils import ImageReader
 import io
+import csv
+import json
+import base64
+import hashlib
+import hmac
+import ipaddress
+import math
+import re
+import unicodedata
+import time
+import zipfile
+import gzip
+import brotli
+import orjson
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from functools import lru_cache
 from urllib.parse import urlparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image as PILImage
+
+from pdf_renderer import render_quote_pdf
+from metrics import Counter, Gauge, Histogram, MongoCommandTimer, SIZE_BUCKETS, render as render_metrics
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 UPLOADS_DIR = ROOT_DIR / "uploads"
 UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
 
-# MongoDB connection
+# MongoDB connection. Every command is timed by collection and operation;
+# commands slower than SLOW_QUERY_MS are logged with their filter shape.
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '200'))
+mongo_timer = MongoCommandTimer(slow_ms=SLOW_QUERY_MS)
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, tz_aware=True, event_listeners=[mongo_timer])
 db = client[os.environ['DB_NAME']]
 
 # JWT Configuration
@@ -40,6 +67,17 @@ SECRET_KEY = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production'
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 480
 
+# Signing keys by kid, e.g. JWT_KEYS="2026a:secret1,2026b:secret2". New tokens
+# are signed with JWT_ACTIVE_KID; older kids keep verifying until removed, so
+# rotating a secret does not log anyone out. Tokens without a kid header were
+# signed with JWT_SECRET.
+JWT_KEYS = dict(
+    entry.split(":", 1) for entry in os.environ.get('JWT_KEYS', '').split(",") if ":" in entry
+) or {"default": SECRET_KEY}
+JWT_ACTIVE_KID = os.environ.get('JWT_ACTIVE_KID') or next(iter(JWT_KEYS))
+if JWT_ACTIVE_KID not in JWT_KEYS:
+    raise RuntimeError(f"JWT_ACTIVE_KID {JWT_ACTIVE_KID!r} is not listed in JWT_KEYS")
+
 security = HTTPBearer()
 
 # Create the main app without a prefix
@@ -214,145 +252,1707 @@ class DashboardStats(BaseModel):
     monthly_revenue: float
     recent_appointments: List[dict]
 
+class RevenueBucket(BaseModel):
+    period: str
+    start: date
+    quotes: int = 0
+    pending: int = 0
+    approved: int = 0
+    rejected: int = 0
+    completed: int = 0
+    revenue: float = 0
+    labor: float = 0
+    parts: float = 0
+    services: float = 0
+    discount: float = 0
+
+class RevenueReport(BaseModel):
+    group_by: Literal["day", "week", "month"]
+    start: date
+    end: date
+    buckets: List[RevenueBucket]
+    totals: RevenueBucket
+
 # ===== AUTH HELPERS =====
 
-async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
+# verify_token runs on every request. Tokens that passed full verification
+# are cached by digest until their own exp, so the hot path is one dict lookup
+# plus an O(1) revocation check.
+TOKEN_CACHE_MAX_ENTRIES = int(os.environ.get('TOKEN_CACHE_MAX_ENTRIES', '10000'))
+REVOCATION_POLL_SECONDS = float(os.environ.get('REVOCATION_POLL_SECONDS', '10'))
+
+_token_cache = OrderedDict()  # sha256(token) -> claims
+_revoked_jtis = {}            # jti -> exp timestamp
+_revocations_synced = {"until": datetime.min.replace(tzinfo=timezone.utc)}
+
+def create_access_token(username: str) -> str:
+    expires = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    token_data = {"sub": username, "exp": expires, "jti": uuid.uuid4().hex}
+    return jwt.encode(token_data, JWT_KEYS[JWT_ACTIVE_KID], algorithm=ALGORITHM, headers={"kid": JWT_ACTIVE_KID})
+
+def _decode_token(token: str) -> dict:
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        if username is None:
+        kid = jwt.get_unverified_header(token).get("kid")
+        if kid is None:
+            key = SECRET_KEY
+        elif kid in JWT_KEYS:
+            key = JWT_KEYS[kid]
+        else:
             raise HTTPException(status_code=401, detail="Invalid token")
-        return username
+        payload = jwt.decode(token, key, algorithms=[ALGORITHM])
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    if payload.get("sub") is None:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return payload
+
+async def verify_token_claims(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+    token = credentials.credentials
+    digest = hashlib.sha256(token.encode('utf-8')).digest()
+    claims = _token_cache.get(digest)
+    if claims is None:
+        claims = _decode_token(token)
+        _token_cache[digest] = claims
+        while len(_token_cache) > TOKEN_CACHE_MAX_ENTRIES:
+            _token_cache.popitem(last=False)
+    elif claims["exp"] <= time.time():
+        _token_cache.pop(digest, None)
+        raise HTTPException(status_code=401, detail="Token expired")
+    else:
+        # least recently used first, so tokens in active use stay cached
+        _token_cache.move_to_end(digest)
+    if claims.get("jti") in _revoked_jtis:
+        raise HTTPException(status_code=401, detail="Token revoked")
+    return claims
+
+async def verify_token(claims: dict = Depends(verify_token_claims)):
+    return claims["sub"]
+
+async def revoke_token(claims: dict):
+    if not claims.get("jti"):
+        # Tokens issued before jti existed cannot be revoked individually;
+        # they simply run out at their exp.
+        return
+    _revoked_jtis[claims["jti"]] = claims["exp"]
+    await db.revoked_tokens.update_one(
+        {"jti": claims["jti"]},
+        {"$set": {
+            "jti": claims["jti"],
+            "expires_at": datetime.fromtimestamp(claims["exp"], tz=timezone.utc),
+            "revoked_at": datetime.now(timezone.utc),
+        }},
+        upsert=True
+    )
+
+async def sync_revoked_tokens():
+    """Pull revocations made by other workers since the last sync."""
+    now = datetime.now(timezone.utc)
+    cursor = db.revoked_tokens.find(
+        {"revoked_at": {"$gt": _revocations_synced["until"]}}, {"_id": 0, "jti": 1, "expires_at": 1}
+    )
+    async for entry in cursor:
+        _revoked_jtis[entry["jti"]] = as_utc(entry["expires_at"]).timestamp()
+    _revocations_synced["until"] = now - timedelta(seconds=REVOCATION_POLL_SECONDS)
+    expired = [jti for jti, exp in _revoked_jtis.items() if exp <= now.timestamp()]
+    for jti in expired:
+        del _revoked_jtis[jti]
+
+async def _sync_revoked_tokens_periodically():
+    while True:
+        await asyncio.sleep(REVOCATION_POLL_SECONDS)
+        try:
+            await sync_revoked_tokens()
+        except Exception:
+            logger.exception("Revoked token sync failed")
+
+# bcrypt burns 100-300 ms of CPU per call. It runs in a small dedicated pool
+# (bcrypt releases the GIL) so logins never occupy the event loop, and the
+# number of hashes waiting is capped so a login flood cannot pile up work.
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '2'))
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', '32'))
+
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+password_hash_metrics = {"pending": 0, "rejected": 0}
+
+async def _run_password_task(func, *args):
+    if password_hash_metrics["pending"] >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_QUEUE:
+        password_hash_metrics["rejected"] += 1
+        raise HTTPException(
+            status_code=503,
+            detail="Too many logins in progress, try again shortly",
+            headers={"Retry-After": "1"}
+        )
+    password_hash_metrics["pending"] += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_password_executor, func, *args)
+    finally:
+        password_hash_metrics["pending"] -= 1
+
+async def hash_password(password: str) -> str:
+    hashed = await _run_password_task(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt())
+    return hashed.decode('utf-8')
+
+async def check_password(password: str, hashed: str) -> bool:
+    return await _run_password_task(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+
+# Login throttling: one in-memory token bucket per username and one per
+# client IP. Each attempt takes a token from both; buckets refill steadily.
+LOGIN_USER_BURST = float(os.environ.get('LOGIN_USER_BURST', '5'))
+LOGIN_USER_RATE_PER_MINUTE = float(os.environ.get('LOGIN_USER_RATE_PER_MINUTE', '10'))
+LOGIN_IP_BURST = float(os.environ.get('LOGIN_IP_BURST', '20'))
+LOGIN_IP_RATE_PER_MINUTE = float(os.environ.get('LOGIN_IP_RATE_PER_MINUTE', '60'))
+LOGIN_BUCKETS_MAX = 10000
+
+# Behind a reverse proxy the peer address is the proxy's. TRUSTED_PROXIES
+# lists the proxies (addresses or CIDR ranges, "*" for any peer) whose
+# X-Forwarded-For is believed, like uvicorn's --forwarded-allow-ips; the
+# client is the nearest address in that header that is not one of them.
+def parse_trusted_proxies(value: str):
+    entries = [entry.strip() for entry in value.split(",") if entry.strip()]
+    if "*" in entries:
+        return "*"
+    return tuple(ipaddress.ip_network(entry, strict=False) for entry in entries)
+
+TRUSTED_PROXIES = parse_trusted_proxies(os.environ.get('TRUSTED_PROXIES', ''))
+
+def _is_trusted_proxy(host: str) -> bool:
+    if TRUSTED_PROXIES == "*":
+        return True
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in TRUSTED_PROXIES)
+
+def client_ip(request: Request) -> str:
+    peer = request.client.host if request.client else "unknown"
+    if not _is_trusted_proxy(peer):
+        return peer
+    hops = [hop.strip() for header in request.headers.getlist("x-forwarded-for") for hop in header.split(",")]
+    hops = [hop for hop in hops if hop]
+    for hop in reversed(hops):
+        if not _is_trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else peer
+
+_login_buckets = OrderedDict()  # key -> (tokens, last refill time)
+
+def _take_login_token(key: tuple, burst: float, rate_per_minute: float, now: float) -> float:
+    """Take one token; return 0 if allowed, else the seconds until one is available."""
+    tokens, updated_at = _login_buckets.get(key, (burst, now))
+    tokens = min(burst, tokens + (now - updated_at) * rate_per_minute / 60)
+    if tokens < 1:
+        _login_buckets[key] = (tokens, now)
+        return (1 - tokens) * 60 / rate_per_minute
+    _login_buckets[key] = (tokens - 1, now)
+    _login_buckets.move_to_end(key)
+    while len(_login_buckets) > LOGIN_BUCKETS_MAX:
+        _login_buckets.popitem(last=False)
+    return 0
+
+def throttle_login(username: str, client_ip: str):
+    now = time.monotonic()
+    retry_after = max(
+        _take_login_token(("user", username), LOGIN_USER_BURST, LOGIN_USER_RATE_PER_MINUTE, now),
+        _take_login_token(("ip", client_ip), LOGIN_IP_BURST, LOGIN_IP_RATE_PER_MINUTE, now),
+    )
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many login attempts, try again later",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
 
 async def init_admin():
     admin = await db.admins.find_one({"username": "ibs"}, {"_id": 0})
     if not admin:
-        hashed_password = bcrypt.hashpw("ibs1234".encode('utf-8'), bcrypt.gensalt())
+        hashed_password = await hash_password("ibs1234")
         await db.admins.insert_one({
             "id": str(uuid.uuid4()),
             "username": "ibs",
-            "password": hashed_password.decode('utf-8'),
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "password": hashed_password,
+            "created_at": datetime.now(timezone.utc)
         })
         logger.info("Admin user created: ibs / ibs1234")
 
+# ===== DATE CODEC =====
+
+# Dates are stored as native BSON datetimes. Documents written before that
+# switch hold ISO strings; while DATE_DUAL_READ is on, reads decode both and
+# range filters match both. Turn it off once `manage.py migrate-dates`
+# reports no legacy values left.
+DATE_DUAL_READ = os.environ.get('DATE_DUAL_READ', '1') == '1'
+DATE_MIGRATION_BATCH_SIZE = int(os.environ.get('DATE_MIGRATION_BATCH_SIZE', '500'))
+DATE_FIELDS = {
+    "admins": ("created_at",),
+    "clients": ("created_at",),
+    "vehicles": ("created_at",),
+    "services": ("created_at",),
+    "parts": ("created_at",),
+    "appointments": ("created_at", "appointment_date"),
+    "quotes": ("created_at", "approved_at"),
+}
+
+def as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def parse_date(value):
+    """Stored date as a datetime, accepting legacy ISO strings."""
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+def decode_dates(collection_name: str, docs: List[dict]) -> List[dict]:
+    """Decode legacy string dates in place; a no-op once DATE_DUAL_READ is off.
+
+    Legacy values were typed in by hand and often lack an offset; they are
+    read as UTC, like migrate-dates stores them, so they compare with the
+    tz-aware dates the driver returns.
+    """
+    if DATE_DUAL_READ:
+        fields = DATE_FIELDS[collection_name]
+        for doc in docs:
+            for field in fields:
+                if isinstance(doc.get(field), str):
+                    doc[field] = as_utc(parse_date(doc[field]))
+    return docs
+
+def combine_filters(*filters: dict) -> dict:
+    """AND query fragments together, even when they share keys such as $or."""
+    filters = [query for query in filters if query]
+    if len(filters) > 1:
+        return {"$and": filters}
+    return filters[0] if filters else {}
+
+async def count_legacy_dates(collection_name: str) -> int:
+    return await db[collection_name].count_documents(
+        {"$or": [{field: {"$type": "string"}} for field in DATE_FIELDS[collection_name]]}
+    )
+
+async def migrate_legacy_dates(collection_name: str, batch_size: int = DATE_MIGRATION_BATCH_SIZE,
+                               restart: bool = False) -> dict:
+    """Rewrite the ISO string dates of one collection as BSON dates.
+
+    Walks the collection in `id` order and checkpoints the last id handled in
+    db.migrations after every batch, so an interrupted run resumes where it
+    stopped. Each update matches the old string value, so a document changed
+    concurrently by the API is left alone rather than overwritten.
+    """
+    fields = DATE_FIELDS[collection_name]
+    checkpoint_id = f"dates:{collection_name}"
+    checkpoint = None if restart else await db.migrations.find_one({"id": checkpoint_id}, {"_id": 0})
+    if checkpoint and checkpoint.get("completed_at"):
+        return checkpoint
+    checkpoint = checkpoint or {"id": checkpoint_id, "last_id": "", "scanned": 0, "converted": 0}
+
+    collection = db[collection_name]
+    projection = {"_id": 0, "id": 1, **{field: 1 for field in fields}}
+    while True:
+        batch = await collection.find({"id": {"$gt": checkpoint["last_id"]}}, projection).sort(
+            "id", ASCENDING
+        ).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        ops = []
+        for doc in batch:
+            legacy = {field: doc[field] for field in fields if isinstance(doc.get(field), str)}
+            if legacy:
+                ops.append(UpdateOne(
+                    {"id": doc["id"], **legacy},
+                    {"$set": {field: as_utc(parse_date(value)) for field, value in legacy.items()}}
+                ))
+        if ops:
+            result = await collection.bulk_write(ops, ordered=False)
+            checkpoint["converted"] += result.modified_count
+        checkpoint["scanned"] += len(batch)
+        checkpoint["last_id"] = batch[-1]["id"]
+        await db.migrations.replace_one({"id": checkpoint_id}, checkpoint, upsert=True)
+
+    checkpoint["completed_at"] = datetime.now(timezone.utc)
+    await db.migrations.replace_one({"id": checkpoint_id}, checkpoint, upsert=True)
+    if checkpoint["converted"] and collection_name in VERSIONED_COLLECTIONS:
+        # Migrated dates serialize differently, so cached lists are stale
+        await bump_version(collection_name)
+    return checkpoint
+
+# ===== PAGINATION HELPERS =====
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(sort_value, doc_id: str) -> str:
+    # json_util keeps BSON types (dates, etc.) intact across the round trip
+    raw = json_util.dumps([sort_value, doc_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, doc_id = json_util.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(doc_id, str):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return sort_value, doc_id
+
+def parse_sort(sort: str, allowed_fields: set):
+    field = sort.lstrip("-")
+    if field not in allowed_fields:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid sort field. Use one of: {', '.join(sorted(allowed_fields))}"
+        )
+    return field, -1 if sort.startswith("-") else 1
+
+def date_range_filter(field: str, date_from: Optional[datetime], date_to: Optional[datetime]) -> dict:
+    """Half-open [date_from, date_to) filter on a stored date field."""
+    condition = {}
+    if date_from:
+        condition["$gte"] = as_utc(date_from)
+    if date_to:
+        condition["$lt"] = as_utc(date_to)
+    if not condition:
+        return {}
+    if not DATE_DUAL_READ:
+        return {field: condition}
+    # BSON comparisons never cross types, so legacy strings need their own branch
+    legacy = {op: value.isoformat() for op, value in condition.items()}
+    return {"$or": [{field: condition}, {field: legacy}]}
+
+def keyset_filter(collection_name: str, field: str, direction: int, after: str) -> dict:
+    """Match the documents that come after cursor `after` in (field, id) order."""
+    last_value, last_id = decode_cursor(after)
+    op = "$gt" if direction == 1 else "$lt"
+    branches = [
+        {field: {op: last_value}},
+        {field: last_value, "id": {op: last_id}},
+    ]
+    if DATE_DUAL_READ and field in DATE_FIELDS.get(collection_name, ()):
+        # Strings sort before dates, so a page boundary can fall between the
+        # legacy and the migrated documents.
+        if direction == 1 and isinstance(last_value, str):
+            branches.append({field: {"$type": "date"}})
+        elif direction == -1 and isinstance(last_value, datetime):
+            branches.append({field: {"$type": "string"}})
+    return {"$or": branches}
+
+async def paginate(collection, query: dict, sort: str, allowed_sort_fields: set,
+                   limit: int, after: Optional[str], response: Response,
+                   projection: Optional[dict] = None) -> List[dict]:
+    """Keyset pagination over (sort field, id).
+
+    Fetches one extra row to know whether another page exists and, if so,
+    exposes its cursor in the X-Next-Cursor header. Cost per page depends on
+    `limit`, never on the collection size.
+    """
+    field, direction = parse_sort(sort, allowed_sort_fields)
+    # The cursor needs the sort field and id even when a sparse projection
+    # left them out; fetch them anyway and drop them again afterwards.
+    hidden = []
+    if projection is not None:
+        hidden = [key for key in (field, "id") if not projection.get(key)]
+        projection = {**projection, **{key: 1 for key in hidden}}
+    if after:
+        query = combine_filters(query, keyset_filter(collection.name, field, direction, after))
+
+    docs = await collection.find(query, projection or {"_id": 0}).sort(
+        [(field, direction), ("id", direction)]
+    ).limit(limit + 1).to_list(limit + 1)
+
+    if len(docs) > limit:
+        docs = docs[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(docs[-1].get(field), docs[-1]["id"])
+    for doc in docs if hidden else ():
+        for key in hidden:
+            doc.pop(key, None)
+    return docs
+
+# ===== RESPONSE SERIALIZATION =====
+
+# List routes named in FAST_JSON_ROUTES skip response_model validation: the
+# documents come straight from our own writes, are projected to the model's
+# fields and go through orjson in one pass. Clear the variable (or drop a
+# route from it) to fall back to the regular FastAPI path for comparison.
+FAST_JSON_ROUTES = {
+    route.strip()
+    for route in os.environ.get(
+        'FAST_JSON_ROUTES', 'clients,vehicles,services,parts,appointments,quotes'
+    ).split(",")
+    if route.strip()
+}
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', '1024'))
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+COLLECTION_MODELS = {
+    "clients": Client,
+    "vehicles": Vehicle,
+    "services": Service,
+    "parts": Part,
+    "appointments": Appointment,
+    "quotes": Quote,
+}
+
+def model_projection(model) -> dict:
+    return {"_id": 0, **{field: 1 for field in model.model_fields}}
+
+def parse_fields(fields: Optional[str], model) -> Optional[List[str]]:
+    """Validated `fields=` selection, or None when the caller wants everything."""
+    if not fields:
+        return None
+    requested = list(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    unknown = [field for field in requested if field not in model.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+def sparse_projection(model, fields: Optional[List[str]]) -> dict:
+    """Mongo projection for a `fields=` selection; `id` is always returned."""
+    if fields is None:
+        return model_projection(model)
+    return {"_id": 0, "id": 1, **{field: 1 for field in fields}}
+
+@lru_cache(maxsize=256)
+def partial_adapter(model, fields: tuple, many: bool) -> TypeAdapter:
+    """Validator/serializer for documents restricted to `fields`."""
+    partial = create_model(
+        f"{model.__name__}Fields",
+        **{field: (model.model_fields[field].annotation, model.model_fields[field]) for field in fields}
+    )
+    return TypeAdapter(List[partial] if many else partial)
+
+SUPPORTED_ENCODINGS = ("br", "gzip")  # preferred first when q-values tie
+
+def negotiate_encoding(request: Request) -> Optional[str]:
+    """The supported coding with the highest q in Accept-Encoding; q=0 rules
+    a coding out and "*" stands for the ones not listed."""
+    weights = {}
+    for part in request.headers.get("accept-encoding", "").split(","):
+        coding, *params = [piece.strip() for piece in part.split(";")]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding.lower()] = q
+    best, best_q = None, 0.0
+    for coding in SUPPORTED_ENCODINGS:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+def dump_json(payload) -> bytes:
+    return orjson.dumps(payload, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+def encoded_json_response(request: Request, payload, headers=None) -> Response:
+    """Serialize with orjson and compress large bodies for clients that accept it."""
+    return compressed_response(request, dump_json(payload), headers)
+
+def compressed_response(request: Request, body: bytes, headers=None) -> Response:
+    headers = dict(headers or {})
+    headers["Vary"] = "Accept-Encoding"
+    encoding = negotiate_encoding(request) if len(body) >= COMPRESS_MIN_BYTES else None
+    if encoding == "br":
+        body = brotli.compress(body, quality=BROTLI_QUALITY)
+    elif encoding == "gzip":
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def document_response(collection_name: str, request: Request, payload, fields: Optional[List[str]],
+                      headers=None, many: bool = False):
+    """Serialize documents read from `collection_name`.
+
+    Fast routes go straight to orjson. Otherwise full documents are left to
+    the route's response_model and sparse ones are checked against a partial
+    model, since the full one would reject the missing fields.
+    """
+    if collection_name in FAST_JSON_ROUTES:
+        return encoded_json_response(request, payload, headers)
+    decode_dates(collection_name, payload if many else [payload])
+    if fields is None:
+        return payload
+    selected = ("id", *(field for field in fields if field != "id"))
+    adapter = partial_adapter(COLLECTION_MODELS[collection_name], selected, many)
+    return Response(
+        content=adapter.dump_json(adapter.validate_python(payload)),
+        media_type="application/json",
+        headers=headers
+    )
+
+def list_response(collection_name: str, request: Request, response: Response, docs: List[dict],
+                  fields: Optional[List[str]] = None):
+    # Headers set on the injected response (X-Next-Cursor) are only merged
+    # by FastAPI when the handler returns plain data, so carry them over.
+    headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    return document_response(collection_name, request, docs, fields, headers, many=True)
+
+# ===== INDEXES =====
+
+# Every lookup goes through the string `id` field; the compound indexes back
+# the paginated list sorts, the by-client/status filters and the dashboard.
+INDEXES = {
+    "admins": [
+        IndexModel([("username", ASCENDING)], unique=True, name="username_unique"),
+    ],
+    "settings": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+    ],
+    "stats": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+    ],
+    "revenue_daily": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+    ],
+    "revenue_rebuilds": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+    ],
+    "migrations": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+    ],
+    "versions": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+    ],
+    "booking_locks": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+    ],
+    "revoked_tokens": [
+        IndexModel([("jti", ASCENDING)], unique=True, name="jti_unique"),
+        IndexModel([("revoked_at", ASCENDING)], name="revoked_at"),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl"),
+    ],
+    "clients": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+        IndexModel([("name", ASCENDING), ("id", ASCENDING)], name="name_id"),
+        IndexModel([("search.cpf", ASCENDING)], name="search_cpf"),
+        # one client per CPF; clients without one are left out
+        IndexModel([("search.cpf", ASCENDING)], unique=True, name="search_cpf_unique",
+                   partialFilterExpression={"search.cpf": {"$type": "string"}}),
+        IndexModel([("search.phone", ASCENDING)], name="search_phone"),
+        IndexModel([("search.email", ASCENDING)], name="search_email"),
+        IndexModel([("search.name_tokens", ASCENDING)], name="search_name_tokens"),
+    ],
+    "vehicles": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+        IndexModel([("client_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], name="client_created_at_id"),
+        IndexModel([("license_plate", ASCENDING), ("id", ASCENDING)], name="license_plate_id"),
+        IndexModel([("model", ASCENDING), ("id", ASCENDING)], name="model_id"),
+        IndexModel([("search.plate", ASCENDING)], name="search_plate"),
+        IndexModel([("search.plate", ASCENDING)], unique=True, name="search_plate_unique",
+                   partialFilterExpression={"search.plate": {"$type": "string"}}),
+        IndexModel([("search.name_tokens", ASCENDING)], name="search_name_tokens"),
+    ],
+    "services": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+        IndexModel([("name", ASCENDING), ("id", ASCENDING)], name="name_id"),
+        IndexModel([("default_price", ASCENDING), ("id", ASCENDING)], name="default_price_id"),
+    ],
+    "parts": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+        IndexModel([("name", ASCENDING), ("id", ASCENDING)], name="name_id"),
+        IndexModel([("price", ASCENDING), ("id", ASCENDING)], name="price_id"),
+        IndexModel([("stock", ASCENDING), ("id", ASCENDING)], name="stock_id"),
+    ],
+    "appointments": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], name="status_created_at_id"),
+        IndexModel([("client_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], name="client_created_at_id"),
+        IndexModel([("vehicle_id", ASCENDING), ("appointment_date", ASCENDING)], name="vehicle_appointment_date"),
+        IndexModel([("appointment_date", ASCENDING), ("id", ASCENDING)], name="appointment_date_id"),
+        IndexModel(
+            [("client_id", ASCENDING), ("appointment_date", ASCENDING), ("id", ASCENDING)],
+            name="client_appointment_date_id"
+        ),
+    ],
+    "quotes": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], name="status_created_at_id"),
+        IndexModel([("client_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], name="client_created_at_id"),
+        IndexModel([("vehicle_id", ASCENDING), ("created_at", ASCENDING)], name="vehicle_created_at"),
+        IndexModel([("total", ASCENDING), ("id", ASCENDING)], name="total_id"),
+    ],
+}
+
+# Query shapes issued by the route handlers, used by check_index_coverage().
+# Every sort a list route accepts (its *_SORT_FIELDS) has an entry here.
+# (name, collection, filter, sort)
+QUERY_SHAPES = [
+    ("login", "admins", {"username": "ibs"}, None),
+    ("collection_versions", "versions", {"id": {"$in": ["clients"]}}, None),
+    ("settings", "settings", {"id": "settings"}, None),
+    ("dashboard_stats", "stats", {"id": "dashboard"}, None),
+    ("get_clients", "clients", {}, [("created_at", 1), ("id", 1)]),
+    ("get_clients?sort=name", "clients", {}, [("name", 1), ("id", 1)]),
+    ("client_by_id", "clients", {"id": "x"}, None),
+    ("get_vehicles", "vehicles", {}, [("created_at", 1), ("id", 1)]),
+    ("get_vehicles?sort=license_plate", "vehicles", {}, [("license_plate", 1), ("id", 1)]),
+    ("get_vehicles?sort=model", "vehicles", {}, [("model", 1), ("id", 1)]),
+    ("get_vehicles_by_client", "vehicles", {"client_id": "x"}, [("created_at", 1), ("id", 1)]),
+    ("vehicle_by_id", "vehicles", {"id": "x"}, None),
+    ("search_clients?cpf", "clients", {"search.cpf": {"$regex": "^123"}}, None),
+    ("search_clients?phone", "clients", {"search.phone": {"$regex": "^119"}}, None),
+    ("search_clients?email", "clients", {"search.email": {"$regex": "^ana"}}, None),
+    ("search_clients?name", "clients", {"search.name_tokens": {"$regex": "^ana"}}, None),
+    ("search_vehicles?plate", "vehicles", {"search.plate": {"$regex": "^ABC"}}, None),
+    ("search_vehicles?name", "vehicles", {"search.name_tokens": {"$regex": "^gol"}}, None),
+    ("get_services", "services", {}, [("created_at", 1), ("id", 1)]),
+    ("get_services?sort=name", "services", {}, [("name", 1), ("id", 1)]),
+    ("get_services?sort=default_price", "services", {}, [("default_price", 1), ("id", 1)]),
+    ("service_by_id", "services", {"id": "x"}, None),
+    ("get_parts", "parts", {}, [("created_at", 1), ("id", 1)]),
+    ("get_parts?sort=name", "parts", {}, [("name", 1), ("id", 1)]),
+    ("get_parts?sort=price", "parts", {}, [("price", 1), ("id", 1)]),
+    ("get_parts?sort=stock", "parts", {}, [("stock", 1), ("id", 1)]),
+    ("part_by_id", "parts", {"id": "x"}, None),
+    ("get_appointments", "appointments", {}, [("created_at", 1), ("id", 1)]),
+    ("get_appointments?sort=appointment_date", "appointments", {}, [("appointment_date", 1), ("id", 1)]),
+    ("get_appointments?status", "appointments", {"status": "scheduled"}, [("created_at", 1), ("id", 1)]),
+    ("get_appointments?client_id", "appointments", {"client_id": "x"}, [("created_at", 1), ("id", 1)]),
+    ("appointment_by_id", "appointments", {"id": "x"}, None),
+    ("appointment_calendar", "appointments", {"appointment_date": {"$gte": datetime(2026, 1, 5, tzinfo=timezone.utc)}},
+     [("appointment_date", 1), ("id", 1)]),
+    ("appointment_calendar?client_id", "appointments",
+     {"client_id": "x", "appointment_date": {"$gte": datetime(2026, 1, 5, tzinfo=timezone.utc)}},
+     [("appointment_date", 1), ("id", 1)]),
+    ("booking_lock", "booking_locks", {"id": "vehicle:x", "expires_at": {"$lte": datetime(2026, 1, 5, tzinfo=timezone.utc)}},
+     None),
+    ("appointment_conflict?vehicle_id", "appointments",
+     {"vehicle_id": "x", "appointment_date": {"$gte": datetime(2026, 1, 5, tzinfo=timezone.utc)}}, None),
+    ("client_overview_appointments", "appointments", {"client_id": "x"}, [("appointment_date", -1), ("id", -1)]),
+    ("dashboard_pending_appointments", "appointments", {"status": {"$in": ["scheduled", "confirmed"]}}, None),
+    ("dashboard_recent_appointments", "appointments", {}, [("created_at", -1)]),
+    ("get_quotes", "quotes", {}, [("created_at", 1), ("id", 1)]),
+    ("get_quotes?sort=total", "quotes", {}, [("total", 1), ("id", 1)]),
+    ("bootstrap_quotes", "quotes", {}, [("created_at", -1), ("id", -1)]),
+    ("get_quotes?status", "quotes", {"status": "pending"}, [("created_at", 1), ("id", 1)]),
+    ("get_quotes?client_id", "quotes", {"client_id": "x"}, [("created_at", 1), ("id", 1)]),
+    ("quote_by_id", "quotes", {"id": "x"}, None),
+    ("client_overview_quotes", "quotes", {"client_id": "x"}, [("created_at", -1), ("id", -1)]),
+    ("dashboard_pending_quotes", "quotes", {"status": "pending"}, None),
+    ("reconcile_revenue", "quotes", {"status": {"$in": ["approved", "completed"]}}, None),
+    ("revenue_rebuild", "revenue_rebuilds", {"id": "revenue_daily", "started_at": {"$gt": datetime(2026, 1, 5, tzinfo=timezone.utc)}},
+     None),
+    ("revenue_report", "revenue_daily", {"id": {"$gte": "2026-01-01", "$lt": "2027-01-01"}}, None),
+]
+
+async def ensure_indexes():
+    """Create the declared indexes. Safe to run on every startup."""
+    for collection_name, indexes in INDEXES.items():
+        try:
+            await db[collection_name].create_indexes(indexes)
+        except OperationFailure as e:
+            # Keep the API booting; duplicates or a conflicting legacy index
+            # need manual cleanup and are surfaced by check_index_coverage().
+            logger.error(f"Could not create indexes on {collection_name}: {e}")
+
+def _plan_stages(plan: dict):
+    yield plan.get("stage")
+    for key in ("inputStage", "outerStage", "innerStage"):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+async def check_index_coverage() -> List[dict]:
+    """Explain every known route query shape and report the ones doing a COLLSCAN."""
+    report = []
+    for name, collection_name, query, sort in QUERY_SHAPES:
+        cursor = db[collection_name].find(query, {"_id": 0}).limit(DEFAULT_PAGE_SIZE)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        stages = list(_plan_stages(explain["queryPlanner"]["winningPlan"]))
+        report.append({
+            "query": name,
+            "collection": collection_name,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+        })
+    return report
+
+# ===== DASHBOARD COUNTERS =====
+
+# The dashboard reads a single materialized document kept up to date with
+# $inc deltas by every handler that changes a counted document. A periodic
+# reconciliation recomputes it from the source collections to correct any
+# drift (crashes between the write and the $inc, manual database edits...).
+STATS_DOC_ID = "dashboard"
+PENDING_APPOINTMENT_STATUSES = ["scheduled", "confirmed"]
+REVENUE_QUOTE_STATUSES = ["approved", "completed"]
+DASHBOARD_CACHE_TTL_SECONDS = float(os.environ.get('DASHBOARD_CACHE_TTL_SECONDS', '15'))
+STATS_RECONCILE_INTERVAL_SECONDS = float(os.environ.get('STATS_RECONCILE_INTERVAL_SECONDS', '3600'))
+
+_dashboard_cache = {"value": None, "expires_at": 0.0}
+
+def month_key(value) -> str:
+    return as_utc(parse_date(value)).strftime("%Y-%m")
+
+def _stats_contribution(collection_name: str, doc: Optional[dict]) -> dict:
+    """Counters a single document adds to the dashboard stats."""
+    if not doc:
+        return {}
+    if collection_name == "clients":
+        return {"total_clients": 1}
+    if collection_name == "vehicles":
+        return {"total_vehicles": 1}
+    if collection_name == "appointments":
+        return {"pending_appointments": 1} if doc.get("status") in PENDING_APPOINTMENT_STATUSES else {}
+    if collection_name == "quotes":
+        if doc.get("status") == "pending":
+            return {"pending_quotes": 1}
+        if doc.get("status") in REVENUE_QUOTE_STATUSES:
+            return {f"revenue_by_month.{month_key(doc['created_at'])}": doc.get("total", 0)}
+    return {}
+
+async def apply_stats_change(collection_name: str, before: Optional[dict], after: Optional[dict]):
+    """Apply the counter delta of a document going from `before` to `after`.
+
+    Pass before=None for inserts and after=None for deletes.
+    """
+    delta = _stats_contribution(collection_name, after)
+    for key, value in _stats_contribution(collection_name, before).items():
+        delta[key] = delta.get(key, 0) - value
+    await increment_stats(delta)
+
+async def increment_stats(delta: dict):
+    delta = {key: value for key, value in delta.items() if value}
+    # Recent appointments are part of the cached payload too, so any counted
+    # write drops the local copy even when no counter moved.
+    _dashboard_cache["expires_at"] = 0.0
+    if delta:
+        await db.stats.update_one({"id": STATS_DOC_ID}, {"$inc": delta}, upsert=True)
+
+async def reconcile_dashboard_stats() -> dict:
+    """Recompute the dashboard counters from the source collections."""
+    month = {"$dateToString": {"format": "%Y-%m", "date": "$created_at"}}
+    if DATE_DUAL_READ:
+        month = {"$cond": [
+            {"$eq": [{"$type": "$created_at"}, "string"]}, {"$substrBytes": ["$created_at", 0, 7]}, month
+        ]}
+    revenue_pipeline = [
+        {"$match": {"status": {"$in": REVENUE_QUOTE_STATUSES}}},
+        {"$group": {"_id": month, "total": {"$sum": "$total"}}},
+    ]
+    total_clients, total_vehicles, pending_appointments, pending_quotes, revenue = await asyncio.gather(
+        db.clients.count_documents({}),
+        db.vehicles.count_documents({}),
+        db.appointments.count_documents({"status": {"$in": PENDING_APPOINTMENT_STATUSES}}),
+        db.quotes.count_documents({"status": "pending"}),
+        db.quotes.aggregate(revenue_pipeline).to_list(None),
+    )
+    stats = {
+        "id": STATS_DOC_ID,
+        "total_clients": total_clients,
+        "total_vehicles": total_vehicles,
+        "pending_appointments": pending_appointments,
+        "pending_quotes": pending_quotes,
+        "revenue_by_month": {row["_id"]: row["total"] for row in revenue if row["_id"]},
+        "reconciled_at": datetime.now(timezone.utc),
+    }
+    await db.stats.replace_one({"id": STATS_DOC_ID}, stats, upsert=True)
+    _dashboard_cache["expires_at"] = 0.0
+    return stats
+
+async def _reconcile_stats_periodically():
+    while True:
+        await asyncio.sleep(STATS_RECONCILE_INTERVAL_SECONDS)
+        try:
+            await reconcile_dashboard_stats()
+        except Exception:
+            logger.exception("Dashboard stats reconciliation failed")
+
+# ===== REVENUE ROLLUPS =====
+
+# One small document per UTC day in db.revenue_daily. Quote handlers apply $inc
+# deltas the same way as the dashboard counters; `manage.py rebuild-revenue`
+# recomputes every bucket from the quotes. Amounts only count approved and
+# completed quotes.
+#
+# Quotes are bucketed by created_at, the day the quote was written, like
+# revenue_by_month on the dashboard -- not by the day it was approved.
+# approved_at is cleared when a quote moves on to "completed", so it cannot
+# date completed revenue.
+#
+# While a rebuild runs, handlers park their deltas on its db.revenue_rebuilds
+# document instead of applying them (see rebuild_revenue_rollups).
+ROLLUP_COUNT_STATUSES = ("pending", "approved", "rejected", "completed")
+ROLLUP_AMOUNT_FIELDS = ("revenue", "labor", "parts", "services", "discount")
+ROLLUP_BATCH_SIZE = 1000
+REVENUE_REBUILD_ID = "revenue_daily"
+# A rebuild older than this is assumed dead and no longer parks deltas.
+REVENUE_REBUILD_TIMEOUT_SECONDS = float(os.environ.get('REVENUE_REBUILD_TIMEOUT_SECONDS', '600'))
+
+def day_key(value) -> str:
+    return as_utc(parse_date(value)).strftime("%Y-%m-%d")
+
+def _revenue_contribution(doc: Optional[dict]) -> dict:
+    """{day: counters} a single quote adds to the daily buckets."""
+    if not doc:
+        return {}
+    counters = {"quotes": 1}
+    if doc.get("status") in ROLLUP_COUNT_STATUSES:
+        counters[doc["status"]] = 1
+    if doc.get("status") in REVENUE_QUOTE_STATUSES:
+        items = doc.get("items") or []
+        counters.update(
+            revenue=doc.get("total", 0),
+            labor=doc.get("labor_cost", 0),
+            parts=sum(item.get("total", 0) for item in items if item.get("type") == "part"),
+            services=sum(item.get("total", 0) for item in items if item.get("type") == "service"),
+            discount=doc.get("discount", 0),
+        )
+    return {day_key(doc["created_at"]): counters}
+
+def _add_counters(buckets: dict, contribution: dict, sign: int = 1):
+    for day, counters in contribution.items():
+        bucket = buckets.setdefault(day, {})
+        for key, value in counters.items():
+            bucket[key] = bucket.get(key, 0) + sign * value
+
+async def apply_revenue_change(before: Optional[dict], after: Optional[dict]):
+    """Move a quote's contribution from `before` to `after` (None for insert/delete)."""
+    change = {
+        "quote_id": (before or after)["id"],
+        "before": _revenue_contribution(before),
+        "after": _revenue_contribution(after),
+    }
+    stale = datetime.now(timezone.utc) - timedelta(seconds=REVENUE_REBUILD_TIMEOUT_SECONDS)
+    parked = await db.revenue_rebuilds.update_one(
+        {"id": REVENUE_REBUILD_ID, "started_at": {"$gt": stale}},
+        {"$push": {"changes": change}}
+    )
+    if not parked.matched_count:
+        await _apply_revenue_changes([change])
+
+async def _apply_revenue_changes(changes: List[dict]):
+    delta = {}
+    for change in changes:
+        _add_counters(delta, change["before"], -1)
+        _add_counters(delta, change["after"])
+    ops = []
+    for day, counters in delta.items():
+        changed = {key: value for key, value in counters.items() if value}
+        if changed:
+            ops.append(UpdateOne({"id": day}, {"$inc": changed}, upsert=True))
+    if ops:
+        await db.revenue_daily.bulk_write(ops, ordered=False)
+
+async def rebuild_revenue_rollups() -> int:
+    """Recompute every daily bucket from the quotes; returns the number of days.
+
+    Quote writes keep going meanwhile. From the start of the rebuild their
+    deltas are parked instead of applied, the buckets are built in a staging
+    collection and renamed over db.revenue_daily, and the parked deltas are
+    then applied to the new buckets. The scan may or may not see a quote that
+    changed during it, so each such quote contributes the state before its
+    first parked change, and the parked deltas move it to the current one.
+    """
+    started_at = datetime.now(timezone.utc)
+    stale = started_at - timedelta(seconds=REVENUE_REBUILD_TIMEOUT_SECONDS)
+    await db.revenue_rebuilds.delete_one({"id": REVENUE_REBUILD_ID, "started_at": {"$lte": stale}})
+    try:
+        await db.revenue_rebuilds.insert_one({"id": REVENUE_REBUILD_ID, "started_at": started_at, "changes": []})
+    except DuplicateKeyError:
+        raise RuntimeError("Another revenue rebuild is running") from None
+
+    drained, swapped = [], False
+    try:
+        projection = {
+            "_id": 0, "id": 1, "created_at": 1, "status": 1, "total": 1, "labor_cost": 1, "discount": 1,
+            "items.type": 1, "items.total": 1,
+        }
+        scanned = {}
+        async for quote in db.quotes.find({}, projection).batch_size(ROLLUP_BATCH_SIZE):
+            scanned[quote["id"]] = _revenue_contribution(quote)
+        # Changes parked so far may or may not be reflected in the scan.
+        drained = (await db.revenue_rebuilds.find_one_and_update(
+            {"id": REVENUE_REBUILD_ID}, {"$set": {"changes": []}}, projection={"_id": 0}
+        ))["changes"]
+        for change in reversed(drained):
+            scanned[change["quote_id"]] = change["before"]
+        buckets = {}
+        for contribution in scanned.values():
+            _add_counters(buckets, contribution)
+        for change in drained:
+            _add_counters(buckets, change["before"], -1)
+            _add_counters(buckets, change["after"])
+
+        staging = db.revenue_daily_rebuild
+        await staging.drop()
+        await staging.create_indexes(INDEXES["revenue_daily"])
+        docs = [{"id": day, **counters} for day, counters in buckets.items()]
+        for start in range(0, len(docs), ROLLUP_BATCH_SIZE):
+            await staging.insert_many(docs[start:start + ROLLUP_BATCH_SIZE])
+        await staging.rename("revenue_daily", dropTarget=True)
+        swapped = True
+    finally:
+        # Parked changes go to the live buckets: the rebuilt ones, or after a
+        # failure the previous ones, which have not seen any of them.
+        rebuild = await db.revenue_rebuilds.find_one_and_delete({"id": REVENUE_REBUILD_ID}, {"_id": 0})
+        changes = ([] if swapped else drained) + (rebuild["changes"] if rebuild else [])
+        if changes:
+            await _apply_revenue_changes(changes)
+    return len(buckets)
+
+# ===== COLLECTION VERSIONS =====
+
+# Every handler that writes a collection bumps its counter in db.versions.
+# List routes derive their ETag from it and answer If-None-Match with a 304
+# before running the list query. The counter is read from db.versions on
+# every such request (one indexed lookup), never from memory alone: workers
+# are serverless instances that sit frozen between requests, so a copy
+# refreshed in the background would confirm ETags from before another
+# worker's write. The epoch changes whenever a counter document is recreated,
+# so a wiped database cannot replay old ETags.
+VERSIONED_COLLECTIONS = ("clients", "vehicles", "services", "parts", "appointments", "quotes", "settings")
+
+_collection_versions = {}  # name -> (epoch, counter)
+
+def collection_version(name: str) -> str:
+    epoch, counter = _collection_versions.get(name, ("0", 0))
+    return f"{epoch}.{counter}"
+
+def _remember_version(doc: dict):
+    current = _collection_versions.get(doc["id"])
+    if current is None or current[0] != doc["epoch"] or current[1] < doc["version"]:
+        _collection_versions[doc["id"]] = (doc["epoch"], doc["version"])
+
+async def bump_version(name: str):
+    doc = await db.versions.find_one_and_update(
+        {"id": name},
+        {"$inc": {"version": 1}, "$setOnInsert": {"epoch": uuid.uuid4().hex[:8]}},
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    _remember_version(doc)
+
+async def refresh_versions():
+    async for doc in db.versions.find({}, {"_id": 0}):
+        _remember_version(doc)
+
+async def fetch_versions(*names: str) -> dict:
+    """Current version of each named collection, read from db.versions."""
+    versions = {name: "0.0" for name in names}
+    async for doc in db.versions.find({"id": {"$in": list(names)}}, {"_id": 0}):
+        _remember_version(doc)
+        versions[doc["id"]] = f"{doc['epoch']}.{doc['version']}"
+    return versions
+
+def list_etag(request: Request, collection_name: str, version: str) -> str:
+    """Weak ETag for a list request: collection version plus the exact query."""
+    params = "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+    fast = collection_name in FAST_JSON_ROUTES
+    key = f"{version}|{request.url.path}?{params}|{fast}"
+    return f'W/"{hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]}"'
+
+async def check_list_etag(request: Request, response: Response, collection_name: str) -> Optional[Response]:
+    """Return a 304 when the client's copy is current, else tag the response."""
+    versions = await fetch_versions(collection_name)
+    etag = list_etag(request, collection_name, versions[collection_name])
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+# ===== SETTINGS CACHE =====
+
+# The settings singleton is read on every PDF render but edited maybe once a
+# month, so each worker keeps it in memory, tagged with the "settings"
+# version it was loaded at. Every read checks that version against db.versions
+# (a tiny indexed lookup) and reloads when any worker has written since.
+_settings_cache = {"version": None, "doc": None}
+
+async def reload_settings(version: Optional[str] = None) -> dict:
+    if version is None:
+        version = (await fetch_versions("settings"))["settings"]
+    doc = await db.settings.find_one_and_update(
+        {"id": "settings"},
+        {"$setOnInsert": Settings().model_dump(exclude={"id"})},
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    _settings_cache.update(version=version, doc=doc)
+    return doc
+
+async def get_cached_settings() -> dict:
+    """Current settings document; treat it as read-only."""
+    version = (await fetch_versions("settings"))["settings"]
+    if _settings_cache["doc"] is None or _settings_cache["version"] != version:
+        return await reload_settings(version)
+    return _settings_cache["doc"]
+
+async def write_settings(update_fields: dict) -> dict:
+    """Apply an update and invalidate the cached copy on every worker."""
+    doc = await db.settings.find_one_and_update(
+        {"id": "settings"},
+        {"$set": update_fields, "$setOnInsert": Settings().model_dump(exclude={"id", *update_fields})},
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    await bump_version("settings")
+    # another worker may write between the update and the bump; reload
+    # rather than pin this doc to a version it may not match
+    _settings_cache.update(version=None, doc=None)
+    await invalidate_pdf_cache()
+    return doc
+
 # ===== AUTH ROUTES =====
 
 @api_router.post("/auth/login", response_model=LoginResponse)
-async def login(request: LoginRequest):
+async def login(request: LoginRequest, http_request: Request):
+    throttle_login(request.username, client_ip(http_request))
     admin = await db.admins.find_one({"username": request.username}, {"_id": 0})
     
     if not admin:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    if not bcrypt.checkpw(request.password.encode('utf-8'), admin["password"].encode('utf-8')):
+    if not await check_password(request.password, admin["password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    expires = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    token_data = {"sub": admin["username"], "exp": expires}
-    token = jwt.encode(token_data, SECRET_KEY, algorithm=ALGORITHM)
+    token = create_access_token(admin["username"])
     
     return LoginResponse(token=token, username=admin["username"])
 
+@api_router.post("/auth/logout")
+async def logout(claims: dict = Depends(verify_token_claims)):
+    await revoke_token(claims)
+    return {"message": "Logged out successfully"}
+
+# ===== SEARCH KEYS =====
+
+# Clients and vehicles carry a `search` subdocument of normalized keys
+# (digits-only CPF/phone, bare uppercase plate, accent-free lowercase name
+# tokens). Every key is indexed, so lookups are anchored prefix scans instead
+# of downloading the collection. The response models ignore the subdocument.
+SEARCH_COLLECTIONS = ("clients", "vehicles")
+SEARCH_DEFAULT_LIMIT = 10
+SEARCH_MAX_LIMIT = 50
+SEARCH_BACKFILL_BATCH_SIZE = 500
+
+def normalize_text(value: Optional[str]) -> str:
+    decomposed = unicodedata.normalize("NFKD", value or "")
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(re.sub(r"[^\w@.]+", " ", stripped.lower()).split())
+
+def digits_only(value: Optional[str]) -> str:
+    return re.sub(r"\D", "", value or "")
+
+def normalize_plate(value: Optional[str]) -> str:
+    return re.sub(r"[^A-Z0-9]", "", (value or "").upper())
+
+def search_keys(collection_name: str, data: dict) -> dict:
+    """Normalized search keys for the source fields present in `data`."""
+    keys = {}
+    if collection_name == "clients":
+        if "name" in data:
+            keys["name"] = normalize_text(data["name"])
+            keys["name_tokens"] = keys["name"].split()
+        for field in ("cpf", "phone"):
+            if field in data:
+                keys[field] = digits_only(data[field]) or None
+        if "email" in data:
+            keys["email"] = (data["email"] or "").strip().lower() or None
+    elif collection_name == "vehicles":
+        if "license_plate" in data:
+            keys["plate"] = normalize_plate(data["license_plate"]) or None
+        if "brand" in data or "model" in data:
+            keys["name_tokens"] = normalize_text(f"{data.get('brand', '')} {data.get('model', '')}").split()
+    return keys
+
+def search_update(collection_name: str, data: dict) -> dict:
+    """`$set` fragment refreshing the search keys touched by an update."""
+    return {f"search.{key}": value for key, value in search_keys(collection_name, data).items()}
+
+async def backfill_search_keys(collection_name: str, batch_size: int = SEARCH_BACKFILL_BATCH_SIZE,
+                               missing_only: bool = False) -> int:
+    """Recompute the search subdocument of every document (or only of the
+    ones without one), in id order."""
+    collection = db[collection_name]
+    last_id, updated = "", 0
+    while True:
+        query = {"id": {"$gt": last_id}}
+        if missing_only:
+            query["search"] = {"$exists": False}
+        batch = await collection.find(query, {"_id": 0, "search": 0}).sort(
+            "id", ASCENDING
+        ).limit(batch_size).to_list(batch_size)
+        if not batch:
+            return updated
+        ops = [
+            UpdateOne({"id": doc["id"]}, {"$set": {"search": search_keys(collection_name, doc)}})
+            for doc in batch
+        ]
+        result = await collection.bulk_write(ops, ordered=False)
+        updated += result.modified_count
+        last_id = batch[-1]["id"]
+
+async def backfill_missing_search_keys():
+    """Give documents written before the search keys existed (or restored from
+    an old dump) their keys, so /search finds them without a manual backfill."""
+    for name in SEARCH_COLLECTIONS:
+        updated = await backfill_search_keys(name, missing_only=True)
+        if updated:
+            logger.info(f"Backfilled search keys for {updated} {name}")
+
 # ===== CLIENT ROUTES =====
 
+CLIENT_SORT_FIELDS = {"created_at", "name"}
+
 @api_router.get("/clients", response_model=List[Client])
-async def get_clients(username: str = Depends(verify_token)):
-    clients = await db.clients.find({}, {"_id": 0}).to_list(1000)
-    for client in clients:
-        if isinstance(client.get('created_at'), str):
-            client['created_at'] = datetime.fromisoformat(client['created_at'])
-    return clients
+async def get_clients(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    sort: str = "created_at",
+    fields: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    username: str = Depends(verify_token)
+):
+    not_modified = await check_list_etag(request, response, "clients")
+    if not_modified:
+        return not_modified
+    query = date_range_filter("created_at", created_from, created_to)
+    selected = parse_fields(fields, Client)
+    clients = await paginate(db.clients, query, sort, CLIENT_SORT_FIELDS, limit, after, response,
+                             projection=sparse_projection(Client, selected))
+    return list_response("clients", request, response, clients, selected)
+
+@api_router.get("/clients/{client_id}", response_model=Client)
+async def get_client(
+    client_id: str,
+    request: Request,
+    fields: Optional[str] = None,
+    username: str = Depends(verify_token)
+):
+    selected = parse_fields(fields, Client)
+    client = await db.clients.find_one({"id": client_id}, sparse_projection(Client, selected))
+    if not client:
+        raise HTTPException(status_code=404, detail="Client not found")
+    return document_response("clients", request, client, selected)
 
 @api_router.post("/clients", response_model=Client)
 async def create_client(client_data: ClientCreate, username: str = Depends(verify_token)):
     client = Client(**client_data.model_dump())
     doc = client.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    await db.clients.insert_one(doc)
+    doc["search"] = search_keys("clients", doc)
+    try:
+        await db.clients.insert_one(doc)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="A client with this CPF already exists")
+    await bump_version("clients")
+    await apply_stats_change("clients", None, doc)
     return client
 
 @api_router.put("/clients/{client_id}", response_model=Client)
 async def update_client(client_id: str, client_data: ClientCreate, username: str = Depends(verify_token)):
-    result = await db.clients.update_one({"id": client_id}, {"$set": client_data.model_dump(exclude_none=True)})
+    update_data = client_data.model_dump(exclude_none=True)
+    try:
+        result = await db.clients.update_one(
+            {"id": client_id}, {"$set": {**update_data, **search_update("clients", update_data)}}
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="A client with this CPF already exists")
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Client not found")
+    await bump_version("clients")
+    await invalidate_pdf_cache(client_id=client_id)
     updated = await db.clients.find_one({"id": client_id}, {"_id": 0})
-    if isinstance(updated['created_at'], str):
-        updated['created_at'] = datetime.fromisoformat(updated['created_at'])
+    decode_dates("clients", [updated])
     return Client(**updated)
 
 @api_router.delete("/clients/{client_id}")
 async def delete_client(client_id: str, username: str = Depends(verify_token)):
-    result = await db.clients.delete_one({"id": client_id})
-    if result.deleted_count == 0:
+    deleted = await db.clients.find_one_and_delete({"id": client_id}, {"_id": 0, "id": 1})
+    if not deleted:
         raise HTTPException(status_code=404, detail="Client not found")
+    await bump_version("clients")
+    await apply_stats_change("clients", deleted, None)
+    await invalidate_pdf_cache(client_id=client_id)
     return {"message": "Client deleted successfully"}
 
+# ===== CLIENT OVERVIEW =====
+
+OVERVIEW_DEFAULT_LIMIT = 20
+
+class QuoteSummary(BaseModel):
+    id: str
+    vehicle_id: str
+    vehicle_label: str = "N/A"
+    status: str
+    total: float
+    created_at: datetime
+    approved_at: Optional[datetime] = None
+
+class AppointmentSummary(BaseModel):
+    id: str
+    vehicle_id: str
+    vehicle_label: str = "N/A"
+    appointment_date: datetime
+    status: str
+    notes: Optional[str] = None
+
+class ClientTotals(BaseModel):
+    vehicles: int = 0
+    quotes: int = 0
+    open_quotes: int = 0
+    lifetime_revenue: float = 0
+    appointments: int = 0
+    pending_appointments: int = 0
+
+class ClientOverview(BaseModel):
+    client: Client
+    vehicles: List[Vehicle]
+    totals: ClientTotals
+    quotes: List[QuoteSummary]
+    appointments: List[AppointmentSummary]
+    quotes_next_cursor: Optional[str] = None
+    appointments_next_cursor: Optional[str] = None
+
+def _history_lookup(collection_name: str, client_id: str, field: str, after: Optional[str],
+                    limit: int, model) -> dict:
+    """$lookup of one page of the client's documents, newest first."""
+    match = {"client_id": client_id}
+    if after:
+        match = combine_filters(match, keyset_filter(collection_name, field, -1, after))
+    return {"$lookup": {
+        "from": collection_name,
+        "pipeline": [
+            {"$match": match},
+            {"$sort": {field: -1, "id": -1}},
+            {"$limit": limit + 1},
+            {"$project": {"_id": 0, **{name: 1 for name in model.model_fields if name != "vehicle_label"}}},
+        ],
+        "as": collection_name,
+    }}
+
+def _totals_lookup(collection_name: str, client_id: str, accumulators: dict) -> dict:
+    return {"$lookup": {
+        "from": collection_name,
+        "pipeline": [
+            {"$match": {"client_id": client_id}},
+            {"$group": {"_id": None, "count": {"$sum": 1}, **accumulators}},
+            {"$project": {"_id": 0}},
+        ],
+        "as": f"{collection_name}_totals",
+    }}
+
+def _history_page(collection_name: str, docs: List[dict], field: str, limit: int, labels: dict):
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        # From the stored value, as paginate does: a legacy string boundary
+        # must stay a string for keyset_filter to pick the right branch.
+        next_cursor = encode_cursor(docs[-1][field], docs[-1]["id"])
+    decode_dates(collection_name, docs)
+    for doc in docs:
+        doc["vehicle_label"] = labels.get(doc["vehicle_id"], "N/A")
+    return docs, next_cursor
+
+@api_router.get("/clients/{client_id}/overview", response_model=ClientOverview)
+async def get_client_overview(
+    client_id: str,
+    limit: int = Query(OVERVIEW_DEFAULT_LIMIT, ge=1, le=MAX_PAGE_SIZE),
+    quotes_after: Optional[str] = None,
+    appointments_after: Optional[str] = None,
+    username: str = Depends(verify_token)
+):
+    """Client, vehicles, totals and one page of quotes/appointments in a single aggregation."""
+    pipeline = [
+        {"$match": {"id": client_id}},
+        {"$limit": 1},
+        {"$project": {"_id": 0, "search": 0}},
+        {"$lookup": {
+            "from": "vehicles",
+            "pipeline": [
+                {"$match": {"client_id": client_id}},
+                {"$sort": {"created_at": 1, "id": 1}},
+                {"$project": {"_id": 0, "search": 0}},
+            ],
+            "as": "vehicles",
+        }},
+        _history_lookup("quotes", client_id, "created_at", quotes_after, limit, QuoteSummary),
+        _history_lookup("appointments", client_id, "appointment_date", appointments_after, limit, AppointmentSummary),
+        _totals_lookup("quotes", client_id, {
+            "open": {"$sum": {"$cond": [{"$eq": ["$status", "pending"]}, 1, 0]}},
+            "revenue": {"$sum": {"$cond": [{"$in": ["$status", REVENUE_QUOTE_STATUSES]}, "$total", 0]}},
+        }),
+        _totals_lookup("appointments", client_id, {
+            "open": {"$sum": {"$cond": [{"$in": ["$status", PENDING_APPOINTMENT_STATUSES]}, 1, 0]}},
+        }),
+    ]
+    rows = await db.clients.aggregate(pipeline).to_list(1)
+    if not rows:
+        raise HTTPException(status_code=404, detail="Client not found")
+    overview = rows[0]
+
+    vehicles = decode_dates("vehicles", overview.pop("vehicles"))
+    labels = {
+        vehicle["id"]: f"{vehicle['brand']} {vehicle['model']} - {vehicle['license_plate']}"
+        for vehicle in vehicles
+    }
+    quotes, quotes_next = _history_page("quotes", overview.pop("quotes"), "created_at", limit, labels)
+    appointments, appointments_next = _history_page(
+        "appointments", overview.pop("appointments"), "appointment_date", limit, labels
+    )
+    quote_totals = (overview.pop("quotes_totals") or [{}])[0]
+    appointment_totals = (overview.pop("appointments_totals") or [{}])[0]
+
+    return ClientOverview(
+        client=decode_dates("clients", [overview])[0],
+        vehicles=vehicles,
+        totals=ClientTotals(
+            vehicles=len(vehicles),
+            quotes=quote_totals.get("count", 0),
+            open_quotes=quote_totals.get("open", 0),
+            lifetime_revenue=quote_totals.get("revenue", 0),
+            appointments=appointment_totals.get("count", 0),
+            pending_appointments=appointment_totals.get("open", 0),
+        ),
+        quotes=quotes,
+        appointments=appointments,
+        quotes_next_cursor=quotes_next,
+        appointments_next_cursor=appointments_next,
+    )
+
 # ===== VEHICLE ROUTES =====
 
+VEHICLE_SORT_FIELDS = {"created_at", "license_plate", "model"}
+
 @api_router.get("/vehicles", response_model=List[Vehicle])
-async def get_vehicles(username: str = Depends(verify_token)):
-    vehicles = await db.vehicles.find({}, {"_id": 0}).to_list(1000)
-    for vehicle in vehicles:
-        if isinstance(vehicle.get('created_at'), str):
-            vehicle['created_at'] = datetime.fromisoformat(vehicle['created_at'])
-    return vehicles
+async def get_vehicles(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    sort: str = "created_at",
+    fields: Optional[str] = None,
+    client_id: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    username: str = Depends(verify_token)
+):
+    not_modified = await check_list_etag(request, response, "vehicles")
+    if not_modified:
+        return not_modified
+    query = date_range_filter("created_at", created_from, created_to)
+    if client_id:
+        query["client_id"] = client_id
+    selected = parse_fields(fields, Vehicle)
+    vehicles = await paginate(db.vehicles, query, sort, VEHICLE_SORT_FIELDS, limit, after, response,
+                              projection=sparse_projection(Vehicle, selected))
+    return list_response("vehicles", request, response, vehicles, selected)
+
+@api_router.get("/vehicles/{vehicle_id}", response_model=Vehicle)
+async def get_vehicle(
+    vehicle_id: str,
+    request: Request,
+    fields: Optional[str] = None,
+    username: str = Depends(verify_token)
+):
+    selected = parse_fields(fields, Vehicle)
+    vehicle = await db.vehicles.find_one({"id": vehicle_id}, sparse_projection(Vehicle, selected))
+    if not vehicle:
+        raise HTTPException(status_code=404, detail="Vehicle not found")
+    return document_response("vehicles", request, vehicle, selected)
 
 @api_router.get("/vehicles/by-client/{client_id}", response_model=List[Vehicle])
-async def get_vehicles_by_client(client_id: str, username: str = Depends(verify_token)):
-    vehicles = await db.vehicles.find({"client_id": client_id}, {"_id": 0}).to_list(1000)
-    for vehicle in vehicles:
-        if isinstance(vehicle.get('created_at'), str):
-            vehicle['created_at'] = datetime.fromisoformat(vehicle['created_at'])
-    return vehicles
+async def get_vehicles_by_client(
+    client_id: str,
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    sort: str = "created_at",
+    fields: Optional[str] = None,
+    username: str = Depends(verify_token)
+):
+    not_modified = await check_list_etag(request, response, "vehicles")
+    if not_modified:
+        return not_modified
+    selected = parse_fields(fields, Vehicle)
+    vehicles = await paginate(db.vehicles, {"client_id": client_id}, sort, VEHICLE_SORT_FIELDS, limit, after, response,
+                              projection=sparse_projection(Vehicle, selected))
+    return list_response("vehicles", request, response, vehicles, selected)
 
 @api_router.post("/vehicles", response_model=Vehicle)
 async def create_vehicle(vehicle_data: VehicleCreate, username: str = Depends(verify_token)):
     vehicle = Vehicle(**vehicle_data.model_dump())
     doc = vehicle.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    await db.vehicles.insert_one(doc)
+    doc["search"] = search_keys("vehicles", doc)
+    try:
+        await db.vehicles.insert_one(doc)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="A vehicle with this license plate already exists")
+    await bump_version("vehicles")
+    await apply_stats_change("vehicles", None, doc)
     return vehicle
 
 @api_router.put("/vehicles/{vehicle_id}", response_model=Vehicle)
 async def update_vehicle(vehicle_id: str, vehicle_data: VehicleCreate, username: str = Depends(verify_token)):
-    result = await db.vehicles.update_one({"id": vehicle_id}, {"$set": vehicle_data.model_dump(exclude_none=True)})
+    update_data = vehicle_data.model_dump(exclude_none=True)
+    try:
+        result = await db.vehicles.update_one(
+            {"id": vehicle_id}, {"$set": {**update_data, **search_update("vehicles", update_data)}}
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="A vehicle with this license plate already exists")
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Vehicle not found")
+    await bump_version("vehicles")
+    await invalidate_pdf_cache(vehicle_id=vehicle_id)
     updated = await db.vehicles.find_one({"id": vehicle_id}, {"_id": 0})
-    if isinstance(updated['created_at'], str):
-        updated['created_at'] = datetime.fromisoformat(updated['created_at'])
+    decode_dates("vehicles", [updated])
     return Vehicle(**updated)
 
 @api_router.delete("/vehicles/{vehicle_id}")
 async def delete_vehicle(vehicle_id: str, username: str = Depends(verify_token)):
-    result = await db.vehicles.delete_one({"id": vehicle_id})
-    if result.deleted_count == 0:
+    deleted = await db.vehicles.find_one_and_delete({"id": vehicle_id}, {"_id": 0, "id": 1})
+    if not deleted:
         raise HTTPException(status_code=404, detail="Vehicle not found")
+    await bump_version("vehicles")
+    await apply_stats_change("vehicles", deleted, None)
+    await invalidate_pdf_cache(vehicle_id=vehicle_id)
     return {"message": "Vehicle deleted successfully"}
 
+# ===== SEARCH ROUTES =====
+
+class SearchResults(BaseModel):
+    clients: List[Client] = []
+    vehicles: List[Vehicle] = []
+
+def _prefix(value: str) -> dict:
+    return {"$regex": "^" + re.escape(value)}
+
+def _rank_client(doc: dict, text: str, digits: str) -> int:
+    keys = doc.get("search") or {}
+    if digits and digits in (keys.get("cpf"), keys.get("phone")):
+        return 4
+    if text and text in (keys.get("name"), keys.get("email")):
+        return 3
+    if text and (keys.get("name") or "").startswith(text):
+        return 2
+    return 1
+
+def _rank_vehicle(doc: dict, plate: str, text: str) -> int:
+    keys = doc.get("search") or {}
+    if plate and keys.get("plate") == plate:
+        return 4
+    if plate and (keys.get("plate") or "").startswith(plate):
+        return 3
+    if text and " ".join(keys.get("name_tokens") or []).startswith(text):
+        return 2
+    return 1
+
+async def _search_collection(collection_name: str, queries: List[dict], limit: int, rank) -> List[dict]:
+    """Run each indexed prefix query, merge by id and keep the best `limit`."""
+    model = COLLECTION_MODELS[collection_name]
+    projection = {**model_projection(model), "search": 1}
+    batches = await asyncio.gather(*(
+        db[collection_name].find(query, projection).limit(limit).to_list(limit) for query in queries
+    ))
+    found = {doc["id"]: doc for batch in batches for doc in batch}
+    ranked = sorted(found.values(), key=lambda doc: (-rank(doc), (doc.get("search") or {}).get("name", ""), doc["id"]))
+    return decode_dates(collection_name, ranked[:limit])
+
+@api_router.get("/search", response_model=SearchResults)
+async def search(
+    q: str = Query(..., min_length=1, max_length=100),
+    scope: Literal["all", "clients", "vehicles"] = "all",
+    limit: int = Query(SEARCH_DEFAULT_LIMIT, ge=1, le=SEARCH_MAX_LIMIT),
+    username: str = Depends(verify_token)
+):
+    """Prefix search over client name/CPF/phone/e-mail and vehicle plate/brand/model."""
+    text, plate = normalize_text(q), normalize_plate(q)
+    tokens = text.split()
+    # Only treat the query as a CPF/phone when it has no letters ("ABC-1D23"
+    # should not hit phones containing 123).
+    digits = "" if re.search(r"[a-z]", text) else digits_only(q)
+    clients, vehicles = [], []
+
+    if scope in ("all", "clients"):
+        queries = []
+        if tokens:
+            queries.append({"$and": [{"search.name_tokens": _prefix(token)} for token in tokens]})
+            queries.append({"search.email": _prefix(text)})
+        if len(digits) >= 3:
+            queries.append({"search.cpf": _prefix(digits)})
+            queries.append({"search.phone": _prefix(digits)})
+        if queries:
+            clients = await _search_collection(
+                "clients", queries, limit, lambda doc: _rank_client(doc, text, digits)
+            )
+
+    if scope in ("all", "vehicles"):
+        queries = []
+        if len(plate) >= 2:
+            queries.append({"search.plate": _prefix(plate)})
+        if tokens:
+            queries.append({"$and": [{"search.name_tokens": _prefix(token)} for token in tokens]})
+        if queries:
+            vehicles = await _search_collection(
+                "vehicles", queries, limit, lambda doc: _rank_vehicle(doc, plate, text)
+            )
+    return SearchResults(clients=clients, vehicles=vehicles)
+
+# ===== PAGE BOOTSTRAP =====
+
+# One round trip for everything a screen needs. Each section carries its
+# collection version; the client sends back the stamps it already holds
+# (?known=clients:<v>,vehicles:<v>) and unchanged sections are not queried
+# at all, coming back with "data": null.
+BOOTSTRAP_SECTIONS = {
+    # section -> (model, fields); None keeps every model field
+    # quote cards only show the item count and suppliers; the editor loads
+    # the full quote from /quotes/{id}
+    "quotes": (Quote, ["client_id", "vehicle_id", "status", "labor_cost", "total", "created_at", "items.supplier"]),
+    "clients": (Client, ["name"]),
+    "vehicles": (Vehicle, ["client_id", "brand", "model", "license_plate", "year"]),
+    "services": (Service, ["name", "default_price", "supplier"]),
+    "parts": (Part, ["name", "price", "supplier"]),
+}
+# Sections that grow with the shop's history are sent newest first, one page
+# at a time; the section carries the cursor for /bootstrap/sections/{name}.
+BOOTSTRAP_PAGED_SECTIONS = {"quotes"}
+BOOTSTRAP_PAGE_SIZE = int(os.environ.get('BOOTSTRAP_PAGE_SIZE', '50'))
+BOOTSTRAP_PAGES = {
+    "quotes": ["quotes", "clients", "vehicles", "services", "parts"],
+    # appointments themselves come from /appointments/calendar, one month at a time
+    "appointments": ["clients", "vehicles"],
+}
+
+def parse_known_versions(known: Optional[str]) -> dict:
+    versions = {}
+    for entry in (known or "").split(","):
+        name, _, version = entry.partition(":")
+        if name.strip() and version.strip():
+            versions[name.strip()] = version.strip()
+    return versions
+
+async def _load_bootstrap_section(name: str, after: Optional[str] = None,
+                                  query: Optional[dict] = None) -> tuple:
+    """Serialized section data and, for paged sections, the next cursor."""
+    model, fields = BOOTSTRAP_SECTIONS[name]
+    projection = sparse_projection(model, fields)
+    if name not in BOOTSTRAP_PAGED_SECTIONS:
+        docs = await db[name].find({}, projection).sort([("created_at", 1), ("id", 1)]).to_list(None)
+        return dump_json(docs), None
+    scratch = Response()
+    docs = await paginate(db[name], query or {}, "-created_at", {"created_at"},
+                          BOOTSTRAP_PAGE_SIZE, after, scratch, projection=projection)
+    return dump_json(docs), scratch.headers.get(NEXT_CURSOR_HEADER)
+
+@api_router.get("/bootstrap/{page}")
+async def bootstrap_page(
+    page: Literal["quotes", "appointments"],
+    request: Request,
+    known: Optional[str] = None,
+    username: str = Depends(verify_token)
+):
+    """All sections of a screen in one response: {"sections": {name: {"version", "data"}}}.
+
+    Paged sections also carry "next", the cursor of their second page."""
+    names = BOOTSTRAP_PAGES[page]
+    known_versions = parse_known_versions(known)
+    # Read the versions before the data so a concurrent write can only make
+    # the stamp older than the payload, never newer.
+    versions = await fetch_versions(*names)
+    stale = [name for name in names if known_versions.get(name) != versions[name]]
+    loaded = dict(zip(stale, await asyncio.gather(*(_load_bootstrap_section(name) for name in stale))))
+
+    # Sections are serialized once and spliced into the envelope as raw JSON.
+    entries = []
+    for name in names:
+        data, next_cursor = loaded.get(name, (b"null", None))
+        entry = dump_json(name) + b':{"version":' + dump_json(versions[name]) + b',"data":' + data
+        if name in BOOTSTRAP_PAGED_SECTIONS and name in loaded:
+            entry += b',"next":' + dump_json(next_cursor)
+        entries.append(entry + b"}")
+    return compressed_response(request, b'{"sections":{' + b",".join(entries) + b"}}")
+
+@api_router.get("/bootstrap/sections/{name}")
+async def bootstrap_section_page(
+    name: Literal["quotes"],
+    request: Request,
+    after: Optional[str] = None,
+    client_id: Optional[str] = None,
+    username: str = Depends(verify_token)
+):
+    """Further pages of a paged section, same slim fields: {"data", "next"}."""
+    query = {"client_id": client_id} if client_id else {}
+    data, next_cursor = await _load_bootstrap_section(name, after, query)
+    return compressed_response(request, b'{"data":' + data + b',"next":' + dump_json(next_cursor) + b"}")
+
 # ===== SERVICE ROUTES =====
 
+SERVICE_SORT_FIELDS = {"created_at", "name", "default_price"}
+
 @api_router.get("/services", response_model=List[Service])
-async def get_services(username: str = Depends(verify_token)):
-    services = await db.services.find({}, {"_id": 0}).to_list(1000)
-    for service in services:
-        if isinstance(service.get('created_at'), str):
-            service['created_at'] = datetime.fromisoformat(service['created_at'])
-    return services
+async def get_services(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    sort: str = "created_at",
+    fields: Optional[str] = None,
+    supplier: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    username: str = Depends(verify_token)
+):
+    not_modified = await check_list_etag(request, response, "services")
+    if not_modified:
+        return not_modified
+    query = date_range_filter("created_at", created_from, created_to)
+    if supplier:
+        query["supplier"] = supplier
+    selected = parse_fields(fields, Service)
+    services = await paginate(db.services, query, sort, SERVICE_SORT_FIELDS, limit, after, response,
+                              projection=sparse_projection(Service, selected))
+    return list_response("services", request, response, services, selected)
+
+@api_router.get("/services/{service_id}", response_model=Service)
+async def get_service(
+    service_id: str,
+    request: Request,
+    fields: Optional[str] = None,
+    username: str = Depends(verify_token)
+):
+    selected = parse_fields(fields, Service)
+    service = await db.services.find_one({"id": service_id}, sparse_projection(Service, selected))
+    if not service:
+        raise HTTPException(status_code=404, detail="Service not found")
+    return document_response("services", request, service, selected)
 
 @api_router.post("/services", response_model=Service)
 async def create_service(service_data: ServiceCreate, username: str = Depends(verify_token)):
     service = Service(**service_data.model_dump())
     doc = service.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     await db.services.insert_one(doc)
+    await bump_version("services")
     return service
 
 @api_router.put("/services/{service_id}", response_model=Service)
@@ -360,9 +1960,9 @@ async def update_service(service_id: str, service_data: ServiceCreate, username:
     result = await db.services.update_one({"id": service_id}, {"$set": service_data.model_dump(exclude_none=True)})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Service not found")
+    await bump_version("services")
     updated = await db.services.find_one({"id": service_id}, {"_id": 0})
-    if isinstance(updated['created_at'], str):
-        updated['created_at'] = datetime.fromisoformat(updated['created_at'])
+    decode_dates("services", [updated])
     return Service(**updated)
 
 @api_router.delete("/services/{service_id}")
@@ -370,24 +1970,56 @@ async def delete_service(service_id: str, username: str = Depends(verify_token))
     result = await db.services.delete_one({"id": service_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Service not found")
+    await bump_version("services")
     return {"message": "Service deleted successfully"}
 
 # ===== PART ROUTES =====
 
+PART_SORT_FIELDS = {"created_at", "name", "price", "stock"}
+
 @api_router.get("/parts", response_model=List[Part])
-async def get_parts(username: str = Depends(verify_token)):
-    parts = await db.parts.find({}, {"_id": 0}).to_list(1000)
-    for part in parts:
-        if isinstance(part.get('created_at'), str):
-            part['created_at'] = datetime.fromisoformat(part['created_at'])
-    return parts
+async def get_parts(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    sort: str = "created_at",
+    fields: Optional[str] = None,
+    supplier: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    username: str = Depends(verify_token)
+):
+    not_modified = await check_list_etag(request, response, "parts")
+    if not_modified:
+        return not_modified
+    query = date_range_filter("created_at", created_from, created_to)
+    if supplier:
+        query["supplier"] = supplier
+    selected = parse_fields(fields, Part)
+    parts = await paginate(db.parts, query, sort, PART_SORT_FIELDS, limit, after, response,
+                           projection=sparse_projection(Part, selected))
+    return list_response("parts", request, response, parts, selected)
+
+@api_router.get("/parts/{part_id}", response_model=Part)
+async def get_part(
+    part_id: str,
+    request: Request,
+    fields: Optional[str] = None,
+    username: str = Depends(verify_token)
+):
+    selected = parse_fields(fields, Part)
+    part = await db.parts.find_one({"id": part_id}, sparse_projection(Part, selected))
+    if not part:
+        raise HTTPException(status_code=404, detail="Part not found")
+    return document_response("parts", request, part, selected)
 
 @api_router.post("/parts", response_model=Part)
 async def create_part(part_data: PartCreate, username: str = Depends(verify_token)):
     part = Part(**part_data.model_dump())
     doc = part.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     await db.parts.insert_one(doc)
+    await bump_version("parts")
     return part
 
 @api_router.put("/parts/{part_id}", response_model=Part)
@@ -395,9 +2027,9 @@ async def update_part(part_id: str, part_data: PartCreate, username: str = Depen
     result = await db.parts.update_one({"id": part_id}, {"$set": part_data.model_dump(exclude_none=True)})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Part not found")
+    await bump_version("parts")
     updated = await db.parts.find_one({"id": part_id}, {"_id": 0})
-    if isinstance(updated['created_at'], str):
-        updated['created_at'] = datetime.fromisoformat(updated['created_at'])
+    decode_dates("parts", [updated])
     return Part(**updated)
 
 @api_router.delete("/parts/{part_id}")
@@ -405,63 +2037,575 @@ async def delete_part(part_id: str, username: str = Depends(verify_token)):
     result = await db.parts.delete_one({"id": part_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Part not found")
+    await bump_version("parts")
     return {"message": "Part deleted successfully"}
 
 # ===== APPOINTMENT ROUTES =====
 
+APPOINTMENT_SORT_FIELDS = {"created_at", "appointment_date"}
+
+# A booking occupies one slot from its start time, so two bookings collide
+# when they start less than APPOINTMENT_SLOT_MINUTES apart. APPOINTMENT_BAYS
+# caps how many bookings may overlap across the whole shop (0: no cap).
+APPOINTMENT_SLOT_MINUTES = int(os.environ.get('APPOINTMENT_SLOT_MINUTES', '60'))
+APPOINTMENT_BAYS = int(os.environ.get('APPOINTMENT_BAYS', '0'))
+CALENDAR_MAX_DAYS = 62
+BOOKING_LOCK_SECONDS = 10
+BOOKING_LOCK_ATTEMPTS = 20
+
+@asynccontextmanager
+async def booking_lock(vehicle_id: str):
+    """Serialize conflict check and write per vehicle (shop-wide when bays are
+    capped), so two concurrent bookings cannot both pass the check.
+
+    The lock is a db.booking_locks document claimed by a conditional upsert:
+    the unique id makes the insert fail while another holder's lock is live,
+    and a lock left behind by a crashed worker is taken over once it expires.
+    """
+    key = "bays" if APPOINTMENT_BAYS else f"vehicle:{vehicle_id}"
+    token = uuid.uuid4().hex
+    for attempt in range(BOOKING_LOCK_ATTEMPTS):
+        now = datetime.now(timezone.utc)
+        try:
+            await db.booking_locks.update_one(
+                {"id": key, "expires_at": {"$lte": now}},
+                {"$set": {"token": token, "expires_at": now + timedelta(seconds=BOOKING_LOCK_SECONDS)}},
+                upsert=True
+            )
+            break
+        except DuplicateKeyError:
+            await asyncio.sleep(0.01 * (attempt + 1))
+    else:
+        raise HTTPException(status_code=409, detail="Another booking for this time is being saved, try again")
+    try:
+        yield
+    finally:
+        await db.booking_locks.delete_one({"id": key, "token": token})
+
+async def find_booking_conflict(appointment_date: datetime, vehicle_id: str, exclude_id: Optional[str] = None) -> Optional[str]:
+    """Why the slot cannot be booked, or None. Each probe is an indexed range scan."""
+    slot = timedelta(minutes=APPOINTMENT_SLOT_MINUTES)
+    start = as_utc(appointment_date)
+    # (start - slot, start + slot); BSON dates have millisecond precision
+    window = date_range_filter("appointment_date", start - slot + timedelta(milliseconds=1), start + slot)
+    active = {"status": {"$ne": "cancelled"}}
+    if exclude_id:
+        active["id"] = {"$ne": exclude_id}
+    if await db.appointments.find_one(combine_filters(window, {"vehicle_id": vehicle_id, **active}), {"_id": 0, "id": 1}):
+        return "Vehicle already has an appointment at this time"
+    if APPOINTMENT_BAYS:
+        overlapping = await db.appointments.count_documents(combine_filters(window, active), limit=APPOINTMENT_BAYS)
+        if overlapping >= APPOINTMENT_BAYS:
+            return "No bay is free at this time"
+    return None
+
 @api_router.get("/appointments", response_model=List[Appointment])
-async def get_appointments(username: str = Depends(verify_token)):
-    appointments = await db.appointments.find({}, {"_id": 0}).to_list(1000)
-    for appointment in appointments:
-        if isinstance(appointment.get('created_at'), str):
-            appointment['created_at'] = datetime.fromisoformat(appointment['created_at'])
-        if isinstance(appointment.get('appointment_date'), str):
-            appointment['appointment_date'] = datetime.fromisoformat(appointment['appointment_date'])
-    return appointments
+async def get_appointments(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    sort: str = "created_at",
+    fields: Optional[str] = None,
+    status: Optional[Literal["scheduled", "confirmed", "completed", "cancelled"]] = None,
+    client_id: Optional[str] = None,
+    vehicle_id: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    username: str = Depends(verify_token)
+):
+    not_modified = await check_list_etag(request, response, "appointments")
+    if not_modified:
+        return not_modified
+    query = combine_filters(
+        date_range_filter("created_at", created_from, created_to),
+        date_range_filter("appointment_date", date_from, date_to),
+    )
+    if status:
+        query["status"] = status
+    if client_id:
+        query["client_id"] = client_id
+    if vehicle_id:
+        query["vehicle_id"] = vehicle_id
+    selected = parse_fields(fields, Appointment)
+    appointments = await paginate(db.appointments, query, sort, APPOINTMENT_SORT_FIELDS, limit, after, response,
+                                  projection=sparse_projection(Appointment, selected))
+    return list_response("appointments", request, response, appointments, selected)
+
+@api_router.get("/appointments/calendar", response_model=List[Appointment])
+async def get_appointment_calendar(
+    request: Request,
+    response: Response,
+    date_from: datetime = Query(..., alias="from"),
+    date_to: datetime = Query(..., alias="to"),
+    client_id: Optional[str] = None,
+    vehicle_id: Optional[str] = None,
+    status: Optional[Literal["scheduled", "confirmed", "completed", "cancelled"]] = None,
+    fields: Optional[str] = None,
+    username: str = Depends(verify_token)
+):
+    """Appointments starting in [from, to), ordered by appointment date."""
+    if as_utc(date_to) <= as_utc(date_from):
+        raise HTTPException(status_code=400, detail="'to' must be after 'from'")
+    if as_utc(date_to) - as_utc(date_from) > timedelta(days=CALENDAR_MAX_DAYS):
+        raise HTTPException(status_code=400, detail=f"Calendar window is limited to {CALENDAR_MAX_DAYS} days")
+    not_modified = await check_list_etag(request, response, "appointments")
+    if not_modified:
+        return not_modified
+    query = date_range_filter("appointment_date", date_from, date_to)
+    if client_id:
+        query["client_id"] = client_id
+    if vehicle_id:
+        query["vehicle_id"] = vehicle_id
+    if status:
+        query["status"] = status
+    selected = parse_fields(fields, Appointment)
+    projection = sparse_projection(Appointment, selected)
+    projection.update(appointment_date=1, id=1)
+    cursor = db.appointments.find(query, projection).sort([("appointment_date", 1), ("id", 1)])
+    appointments = decode_dates("appointments", await cursor.to_list(None))
+    if DATE_DUAL_READ:
+        # legacy string dates sort apart from BSON dates
+        appointments.sort(key=lambda doc: (as_utc(doc["appointment_date"]), doc["id"]))
+    if selected is not None:
+        for doc in appointments:
+            if "appointment_date" not in selected:
+                doc.pop("appointment_date")
+    return list_response("appointments", request, response, appointments, selected)
+
+@api_router.get("/appointments/{appointment_id}", response_model=Appointment)
+async def get_appointment(
+    appointment_id: str,
+    request: Request,
+    fields: Optional[str] = None,
+    username: str = Depends(verify_token)
+):
+    selected = parse_fields(fields, Appointment)
+    appointment = await db.appointments.find_one({"id": appointment_id}, sparse_projection(Appointment, selected))
+    if not appointment:
+        raise HTTPException(status_code=404, detail="Appointment not found")
+    return document_response("appointments", request, appointment, selected)
 
 @api_router.post("/appointments", response_model=Appointment)
-async def create_appointment(appointment_data: AppointmentCreate, username: str = Depends(verify_token)):
+async def create_appointment(
+    appointment_data: AppointmentCreate,
+    check_conflicts: bool = False,
+    username: str = Depends(verify_token)
+):
     appointment = Appointment(**appointment_data.model_dump())
     doc = appointment.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    doc['appointment_date'] = doc['appointment_date'].isoformat()
-    await db.appointments.insert_one(doc)
+    if check_conflicts and appointment_data.status != "cancelled":
+        async with booking_lock(appointment_data.vehicle_id):
+            conflict = await find_booking_conflict(appointment_data.appointment_date, appointment_data.vehicle_id)
+            if conflict:
+                raise HTTPException(status_code=409, detail=conflict)
+            await db.appointments.insert_one(doc)
+    else:
+        await db.appointments.insert_one(doc)
+    await bump_version("appointments")
+    await apply_stats_change("appointments", None, doc)
     return appointment
 
 @api_router.put("/appointments/{appointment_id}", response_model=Appointment)
-async def update_appointment(appointment_id: str, appointment_data: AppointmentCreate, username: str = Depends(verify_token)):
+async def update_appointment(
+    appointment_id: str,
+    appointment_data: AppointmentCreate,
+    check_conflicts: bool = False,
+    username: str = Depends(verify_token)
+):
     update_data = appointment_data.model_dump(exclude_none=True)
-    if 'appointment_date' in update_data and isinstance(update_data['appointment_date'], datetime):
-        update_data['appointment_date'] = update_data['appointment_date'].isoformat()
-    
-    result = await db.appointments.update_one({"id": appointment_id}, {"$set": update_data})
-    if result.matched_count == 0:
+    if check_conflicts and appointment_data.status != "cancelled":
+        async with booking_lock(appointment_data.vehicle_id):
+            conflict = await find_booking_conflict(
+                appointment_data.appointment_date, appointment_data.vehicle_id, exclude_id=appointment_id
+            )
+            if conflict:
+                raise HTTPException(status_code=409, detail=conflict)
+            previous = await db.appointments.find_one_and_update(
+                {"id": appointment_id}, {"$set": update_data}, {"_id": 0}
+            )
+    else:
+        previous = await db.appointments.find_one_and_update(
+            {"id": appointment_id}, {"$set": update_data}, {"_id": 0}
+        )
+    if not previous:
         raise HTTPException(status_code=404, detail="Appointment not found")
-    updated = await db.appointments.find_one({"id": appointment_id}, {"_id": 0})
-    if isinstance(updated['created_at'], str):
-        updated['created_at'] = datetime.fromisoformat(updated['created_at'])
-    if isinstance(updated['appointment_date'], str):
-        updated['appointment_date'] = datetime.fromisoformat(updated['appointment_date'])
+    await bump_version("appointments")
+    updated = {**previous, **update_data}
+    await apply_stats_change("appointments", previous, updated)
+    decode_dates("appointments", [updated])
     return Appointment(**updated)
 
 @api_router.delete("/appointments/{appointment_id}")
 async def delete_appointment(appointment_id: str, username: str = Depends(verify_token)):
-    result = await db.appointments.delete_one({"id": appointment_id})
-    if result.deleted_count == 0:
+    deleted = await db.appointments.find_one_and_delete({"id": appointment_id}, {"_id": 0})
+    if not deleted:
         raise HTTPException(status_code=404, detail="Appointment not found")
+    await bump_version("appointments")
+    await apply_stats_change("appointments", deleted, None)
     return {"message": "Appointment deleted successfully"}
 
+# ===== PDF RENDERER POOL =====
+
+# ReportLab is CPU bound; rendering runs in a bounded worker pool so a PDF
+# burst cannot stall the event loop. At most PDF_MAX_WORKERS documents render
+# at once, up to PDF_MAX_QUEUE more wait for a slot and the rest get a 503.
+PDF_EXECUTOR = os.environ.get('PDF_EXECUTOR', 'process')  # "process" or "thread"
+PDF_MAX_WORKERS = int(os.environ.get('PDF_MAX_WORKERS', '2'))
+PDF_MAX_QUEUE = int(os.environ.get('PDF_MAX_QUEUE', '16'))
+
+_pdf_executor = None
+_pdf_slots = asyncio.Semaphore(PDF_MAX_WORKERS)
+pdf_metrics = {
+    "in_flight": 0,
+    "queued": 0,
+    "rendered": 0,
+    "failed": 0,
+    "rejected": 0,
+    "render_seconds_total": 0.0,
+}
+
+def get_pdf_executor():
+    global _pdf_executor
+    if _pdf_executor is None:
+        if PDF_EXECUTOR == "thread":
+            _pdf_executor = ThreadPoolExecutor(max_workers=PDF_MAX_WORKERS, thread_name_prefix="pdf")
+        else:
+            # spawn: never fork a process that already runs Motor's threads
+            _pdf_executor = ProcessPoolExecutor(
+                max_workers=PDF_MAX_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+    return _pdf_executor
+
+def shutdown_pdf_executor():
+    global _pdf_executor
+    if _pdf_executor is not None:
+        _pdf_executor.shutdown(wait=False, cancel_futures=True)
+        _pdf_executor = None
+
+async def render_pdf(spec: dict, reject_when_busy: bool = True) -> bytes:
+    """Render in the worker pool.
+
+    Interactive downloads get a 503 once PDF_MAX_QUEUE requests are waiting;
+    bulk exports pass reject_when_busy=False and bound their own window.
+    """
+    if reject_when_busy and pdf_metrics["queued"] >= PDF_MAX_QUEUE:
+        pdf_metrics["rejected"] += 1
+        raise HTTPException(
+            status_code=503,
+            detail="PDF renderer is busy, try again shortly",
+            headers={"Retry-After": "2"}
+        )
+
+    pdf_metrics["queued"] += 1
+    try:
+        await _pdf_slots.acquire()
+    finally:
+        pdf_metrics["queued"] -= 1
+
+    loop = asyncio.get_running_loop()
+    pdf_metrics["in_flight"] += 1
+    started = loop.time()
+    try:
+        result = await loop.run_in_executor(get_pdf_executor(), render_quote_pdf, spec)
+    except BrokenProcessPool:
+        # A crashed worker poisons the whole pool; start a fresh one next time.
+        shutdown_pdf_executor()
+        pdf_metrics["failed"] += 1
+        raise HTTPException(status_code=500, detail="PDF rendering failed")
+    except Exception:
+        pdf_metrics["failed"] += 1
+        raise
+    finally:
+        pdf_metrics["in_flight"] -= 1
+        pdf_metrics["render_seconds_total"] += loop.time() - started
+        _pdf_slots.release()
+    pdf_metrics["rendered"] += 1
+    return result
+
+@api_router.get("/system/pdf-renderer")
+async def get_pdf_renderer_metrics(username: str = Depends(verify_token)):
+    return {
+        **pdf_metrics,
+        "executor": PDF_EXECUTOR,
+        "max_workers": PDF_MAX_WORKERS,
+        "max_queue": PDF_MAX_QUEUE,
+    }
+
+# ===== PDF CACHE =====
+
+# Rendered PDFs are content addressed: the key hashes everything that ends up
+# on the page (quote, client, vehicle and settings fields plus the logo bytes),
+# so an edit to any of them yields a new key and a stale PDF is never served.
+# Explicit invalidation below only reclaims space early.
+PDF_TEMPLATE_VERSION = "1"
+PDF_CACHE_MAX_ENTRIES = int(os.environ.get('PDF_CACHE_MAX_ENTRIES', '128'))
+PDF_DISK_CACHE = os.environ.get('PDF_DISK_CACHE', '1') == '1'
+PDF_DISK_CACHE_MAX_FILES = int(os.environ.get('PDF_DISK_CACHE_MAX_FILES', '2000'))
+# Not under UPLOADS_DIR: that directory is publicly served by StaticFiles.
+PDF_CACHE_DIR = Path(os.environ.get('PDF_CACHE_DIR', ROOT_DIR / "cache" / "pdf"))
+if PDF_DISK_CACHE:
+    PDF_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+_pdf_cache = OrderedDict()   # key -> pdf bytes, least recently used first
+_pdf_cache_refs = {}         # key -> {"quote_id", "client_id", "vehicle_id"}
+_pdf_disk_writes = {"since_prune": 0}
+
+def pdf_cache_key(spec: dict, refs: dict) -> str:
+    digest = hashlib.sha256()
+    digest.update(PDF_TEMPLATE_VERSION.encode('utf-8'))
+    payload = {key: value for key, value in spec.items() if key != "logo"}
+    digest.update(json.dumps(payload, sort_keys=True, default=str).encode('utf-8'))
+    digest.update(json.dumps(refs, sort_keys=True).encode('utf-8'))
+    if spec.get("logo"):
+        digest.update(spec["logo"]["digest"].encode('utf-8'))
+    return digest.hexdigest()
+
+def _pdf_cache_path(key: str) -> Path:
+    return PDF_CACHE_DIR / f"{key}.pdf"
+
+def _prune_pdf_disk_cache():
+    files = sorted(PDF_CACHE_DIR.glob("*.pdf"), key=lambda path: path.stat().st_mtime)
+    for path in files[:max(0, len(files) - PDF_DISK_CACHE_MAX_FILES)]:
+        path.unlink(missing_ok=True)
+
+def _remember_pdf(key: str, pdf: bytes, refs: dict):
+    _pdf_cache[key] = pdf
+    _pdf_cache.move_to_end(key)
+    _pdf_cache_refs[key] = refs
+    while len(_pdf_cache) > PDF_CACHE_MAX_ENTRIES:
+        evicted, _ = _pdf_cache.popitem(last=False)
+        _pdf_cache_refs.pop(evicted, None)
+
+async def pdf_cache_get(key: str) -> Optional[bytes]:
+    pdf = _pdf_cache.get(key)
+    if pdf is not None:
+        _pdf_cache.move_to_end(key)
+        return pdf
+    if PDF_DISK_CACHE:
+        path = _pdf_cache_path(key)
+        try:
+            pdf = await asyncio.to_thread(path.read_bytes)
+        except FileNotFoundError:
+            return None
+        # Served without entering the memory LRU: a pass over old PDFs
+        # (exports, archive downloads) would otherwise evict the hot ones.
+    return pdf
+
+async def pdf_cache_put(key: str, pdf: bytes, refs: dict):
+    _remember_pdf(key, pdf, refs)
+    if not PDF_DISK_CACHE:
+        return
+    # Write to a temp file and rename so readers never see a partial PDF.
+    tmp_path = PDF_CACHE_DIR / f"{key}.{uuid.uuid4().hex}.tmp"
+    await asyncio.to_thread(tmp_path.write_bytes, pdf)
+    await asyncio.to_thread(os.replace, tmp_path, _pdf_cache_path(key))
+    _pdf_disk_writes["since_prune"] += 1
+    if _pdf_disk_writes["since_prune"] >= 64:
+        _pdf_disk_writes["since_prune"] = 0
+        await asyncio.to_thread(_prune_pdf_disk_cache)
+
+async def invalidate_pdf_cache(**refs):
+    """Drop cached PDFs that reference the given quote_id/client_id/vehicle_id.
+
+    Called without arguments it clears the whole cache (settings changes).
+    """
+    keys = [
+        key for key, key_refs in _pdf_cache_refs.items()
+        if not refs or any(key_refs.get(name) == value for name, value in refs.items())
+    ]
+    for key in keys:
+        _pdf_cache.pop(key, None)
+        _pdf_cache_refs.pop(key, None)
+    if PDF_DISK_CACHE:
+        for key in keys:
+            await asyncio.to_thread(_pdf_cache_path(key).unlink, missing_ok=True)
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    etag = etag.removeprefix("W/")
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+# ===== LOGO ASSETS =====
+
+# The PDF header only needs a small PNG of the logo. It is prepared once
+# (decoded, downscaled, re-encoded with known dimensions) when the logo is
+# uploaded or first seen, and memoized per file mtime / URL so rendering a
+# PDF never decodes the original or touches the network.
+LOGO_PDF_MAX_PX = (375, 285)  # 1.25in x 0.95in header box at 300 DPI
+LOGO_RETRY_SECONDS = 300
+LOGO_MAX_BYTES = 5 * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 64 * 1024
+
+_logo_assets = {}        # (path, mtime_ns) or URL -> prepared asset
+_logo_prefetching = set()
+_logo_prefetch_tasks = set()  # the loop only keeps weak references to tasks
+
+def prepare_logo_asset(content) -> Optional[dict]:
+    """Decode, downscale and re-encode a logo (bytes or a path) as a PDF-ready PNG."""
+    try:
+        with PILImage.open(io.BytesIO(content) if isinstance(content, bytes) else content) as image:
+            image.load()
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA")
+            image.thumbnail(LOGO_PDF_MAX_PX)
+            output = io.BytesIO()
+            image.save(output, format="PNG", optimize=True)
+            width, height = image.size
+    except Exception:
+        # SVG and corrupt files cannot be embedded; the PDF goes without a logo.
+        return None
+    data = output.getvalue()
+    return {"data": data, "width": width, "height": height, "digest": hashlib.sha256(data).hexdigest()}
+
+def logo_local_path(logo_url: str) -> Optional[Path]:
+    if logo_url.startswith('/uploads/'):
+        return ROOT_DIR / logo_url.lstrip('/')
+    if logo_url.startswith('http://') or logo_url.startswith('https://'):
+        parsed = urlparse(logo_url)
+        if parsed.path.startswith('/uploads/'):
+            return ROOT_DIR / parsed.path.lstrip('/')
+    return None
+
+def _load_local_logo_asset(source: Path, variant: Optional[dict]) -> Optional[dict]:
+    content = source.read_bytes()
+    if variant:
+        return {
+            "data": content,
+            "width": variant["width"],
+            "height": variant["height"],
+            "digest": hashlib.sha256(content).hexdigest(),
+        }
+    return prepare_logo_asset(content)
+
+def _ensure_logo_variant(source: Path) -> Optional[dict]:
+    """Prepared PNG for an uploaded logo, written next to it once per content hash."""
+    variant_path = UPLOADS_DIR / f"{source.stem}_pdf.png"
+    if variant_path.exists():
+        with PILImage.open(variant_path) as image:
+            width, height = image.size
+        return _load_local_logo_asset(variant_path, {"width": width, "height": height})
+    asset = prepare_logo_asset(source)
+    if asset:
+        tmp_path = UPLOADS_DIR / f".{uuid.uuid4().hex}.tmp"
+        tmp_path.write_bytes(asset["data"])
+        os.replace(tmp_path, variant_path)
+    return asset
+
+async def save_upload_by_hash(file: UploadFile, prefix: str, suffix: str, max_bytes: int) -> Path:
+    """Copy an upload to UPLOADS_DIR in chunks, named after its SHA-256.
+
+    UploadLimitMiddleware already capped the request body; the file itself
+    is checked again here. Disk writes run off the event loop. Re-uploading
+    the same file reuses the existing copy.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    tmp_path = UPLOADS_DIR / f".{uuid.uuid4().hex}.tmp"
+    target = await asyncio.to_thread(open, tmp_path, "wb")
+    try:
+        while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(status_code=400, detail=f"File too large. Max size is {max_bytes // (1024 * 1024)}MB.")
+            digest.update(chunk)
+            await asyncio.to_thread(target.write, chunk)
+        await asyncio.to_thread(target.close)
+        if not size:
+            raise HTTPException(status_code=400, detail="Empty file.")
+        path = UPLOADS_DIR / f"{prefix}{digest.hexdigest()[:32]}{suffix}"
+        if path.exists():
+            # Same content: keep the existing file and its mtime, so cached
+            # logo assets and browser caches stay valid.
+            await asyncio.to_thread(tmp_path.unlink)
+        else:
+            await asyncio.to_thread(os.replace, tmp_path, path)
+        return path
+    finally:
+        target.close()
+        tmp_path.unlink(missing_ok=True)
+
+async def _prefetch_remote_logo(logo_url: str):
+    try:
+        response = await asyncio.to_thread(requests.get, logo_url, timeout=8)
+        response.raise_for_status()
+        _logo_assets[logo_url] = await asyncio.to_thread(prepare_logo_asset, response.content)
+        await invalidate_pdf_cache()
+    except Exception as e:
+        logger.warning(f"Could not fetch logo {logo_url}: {e}")
+        # Remember the failure for a while instead of retrying on every PDF.
+        _logo_assets[logo_url] = None
+        asyncio.get_running_loop().call_later(LOGO_RETRY_SECONDS, _logo_assets.pop, logo_url, None)
+    finally:
+        _logo_prefetching.discard(logo_url)
+
+async def get_logo_asset(settings: dict) -> Optional[dict]:
+    logo_url = settings.get('logo_url')
+    if not logo_url or logo_url.startswith('blob:'):
+        return None
+
+    logo_path = logo_local_path(logo_url)
+    if logo_path is None:
+        # Remote logos are fetched in the background; until then PDFs render
+        # without one rather than waiting on a third-party host.
+        if logo_url not in _logo_assets and logo_url not in _logo_prefetching:
+            _logo_prefetching.add(logo_url)
+            task = asyncio.create_task(_prefetch_remote_logo(logo_url))
+            _logo_prefetch_tasks.add(task)
+            task.add_done_callback(_logo_prefetch_tasks.discard)
+        return _logo_assets.get(logo_url)
+
+    variant = settings.get('logo_pdf_variant')
+    if variant and variant.get('source_url') == logo_url and (UPLOADS_DIR / variant['file']).exists():
+        source = UPLOADS_DIR / variant['file']
+    else:
+        source, variant = logo_path, None
+    try:
+        key = (str(source), source.stat().st_mtime_ns)
+    except FileNotFoundError:
+        return None
+    if key not in _logo_assets:
+        _logo_assets[key] = await asyncio.to_thread(_load_local_logo_asset, source, variant)
+    return _logo_assets[key]
+
 # ===== QUOTE ROUTES =====
 
+QUOTE_SORT_FIELDS = {"created_at", "total"}
+
 @api_router.get("/quotes", response_model=List[Quote])
-async def get_quotes(username: str = Depends(verify_token)):
-    quotes = await db.quotes.find({}, {"_id": 0}).to_list(1000)
-    for quote in quotes:
-        if isinstance(quote.get('created_at'), str):
-            quote['created_at'] = datetime.fromisoformat(quote['created_at'])
-        if quote.get('approved_at') and isinstance(quote['approved_at'], str):
-            quote['approved_at'] = datetime.fromisoformat(quote['approved_at'])
-    return quotes
+async def get_quotes(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    sort: str = "created_at",
+    fields: Optional[str] = None,
+    status: Optional[Literal["pending", "approved", "rejected", "completed"]] = None,
+    client_id: Optional[str] = None,
+    vehicle_id: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    username: str = Depends(verify_token)
+):
+    not_modified = await check_list_etag(request, response, "quotes")
+    if not_modified:
+        return not_modified
+    query = date_range_filter("created_at", created_from, created_to)
+    if status:
+        query["status"] = status
+    if client_id:
+        query["client_id"] = client_id
+    if vehicle_id:
+        query["vehicle_id"] = vehicle_id
+    selected = parse_fields(fields, Quote)
+    quotes = await paginate(db.quotes, query, sort, QUOTE_SORT_FIELDS, limit, after, response,
+                            projection=sparse_projection(Quote, selected))
+    return list_response("quotes", request, response, quotes, selected)
 
 @api_router.post("/quotes", response_model=Quote)
 async def create_quote(quote_data: QuoteCreate, username: str = Depends(verify_token)):
@@ -474,10 +2618,10 @@ async def create_quote(quote_data: QuoteCreate, username: str = Depends(verify_t
         total=total
     )
     doc = quote.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    if doc.get('approved_at'):
-        doc['approved_at'] = doc['approved_at'].isoformat()
     await db.quotes.insert_one(doc)
+    await bump_version("quotes")
+    await apply_stats_change("quotes", None, doc)
+    await apply_revenue_change(None, doc)
     return quote
 
 @api_router.put("/quotes/{quote_id}", response_model=Quote)
@@ -489,273 +2633,566 @@ async def update_quote(quote_id: str, quote_data: QuoteCreate, username: str = D
     update_data['subtotal'] = subtotal
     update_data['total'] = total
     
-    result = await db.quotes.update_one({"id": quote_id}, {"$set": update_data})
-    if result.matched_count == 0:
+    previous = await db.quotes.find_one_and_update({"id": quote_id}, {"$set": update_data}, {"_id": 0})
+    if not previous:
         raise HTTPException(status_code=404, detail="Quote not found")
-    updated = await db.quotes.find_one({"id": quote_id}, {"_id": 0})
-    if isinstance(updated['created_at'], str):
-        updated['created_at'] = datetime.fromisoformat(updated['created_at'])
-    if updated.get('approved_at') and isinstance(updated['approved_at'], str):
-        updated['approved_at'] = datetime.fromisoformat(updated['approved_at'])
+    await bump_version("quotes")
+    updated = {**previous, **update_data}
+    await apply_stats_change("quotes", previous, updated)
+    await apply_revenue_change(previous, updated)
+    await invalidate_pdf_cache(quote_id=quote_id)
+    decode_dates("quotes", [updated])
     return Quote(**updated)
 
 @api_router.patch("/quotes/{quote_id}/status")
 async def update_quote_status(quote_id: str, status_data: QuoteStatusUpdate, username: str = Depends(verify_token)):
     update_fields = {"status": status_data.status}
     if status_data.status == "approved":
-        update_fields["approved_at"] = datetime.now(timezone.utc).isoformat()
+        update_fields["approved_at"] = datetime.now(timezone.utc)
     else:
         update_fields["approved_at"] = None
 
-    result = await db.quotes.update_one({"id": quote_id}, {"$set": update_fields})
-    if result.matched_count == 0:
+    previous = await db.quotes.find_one_and_update({"id": quote_id}, {"$set": update_fields}, {"_id": 0})
+    if not previous:
         raise HTTPException(status_code=404, detail="Quote not found")
+    await bump_version("quotes")
+    updated = {**previous, **update_fields}
+    await apply_stats_change("quotes", previous, updated)
+    await apply_revenue_change(previous, updated)
+    await invalidate_pdf_cache(quote_id=quote_id)
     return {"message": "Quote status updated successfully", "status": status_data.status}
 
 @api_router.post("/quotes/{quote_id}/approve")
 async def approve_quote(quote_id: str, username: str = Depends(verify_token)):
-    result = await db.quotes.update_one(
-        {"id": quote_id},
-        {"$set": {"status": "approved", "approved_at": datetime.now(timezone.utc).isoformat()}}
-    )
-    if result.matched_count == 0:
+    update_fields = {"status": "approved", "approved_at": datetime.now(timezone.utc)}
+    previous = await db.quotes.find_one_and_update({"id": quote_id}, {"$set": update_fields}, {"_id": 0})
+    if not previous:
         raise HTTPException(status_code=404, detail="Quote not found")
+    await bump_version("quotes")
+    updated = {**previous, **update_fields}
+    await apply_stats_change("quotes", previous, updated)
+    await apply_revenue_change(previous, updated)
+    await invalidate_pdf_cache(quote_id=quote_id)
     return {"message": "Quote approved successfully"}
 
 @api_router.post("/quotes/{quote_id}/reject")
 async def reject_quote(quote_id: str, username: str = Depends(verify_token)):
-    result = await db.quotes.update_one({"id": quote_id}, {"$set": {"status": "rejected"}})
-    if result.matched_count == 0:
+    update_fields = {"status": "rejected"}
+    previous = await db.quotes.find_one_and_update({"id": quote_id}, {"$set": update_fields}, {"_id": 0})
+    if not previous:
         raise HTTPException(status_code=404, detail="Quote not found")
+    await bump_version("quotes")
+    updated = {**previous, **update_fields}
+    await apply_stats_change("quotes", previous, updated)
+    await apply_revenue_change(previous, updated)
+    await invalidate_pdf_cache(quote_id=quote_id)
     return {"message": "Quote rejected successfully"}
 
 @api_router.delete("/quotes/{quote_id}")
 async def delete_quote(quote_id: str, username: str = Depends(verify_token)):
-    result = await db.quotes.delete_one({"id": quote_id})
-    if result.deleted_count == 0:
+    deleted = await db.quotes.find_one_and_delete({"id": quote_id}, {"_id": 0})
+    if not deleted:
         raise HTTPException(status_code=404, detail="Quote not found")
+    await bump_version("quotes")
+    await apply_stats_change("quotes", deleted, None)
+    await apply_revenue_change(deleted, None)
+    await invalidate_pdf_cache(quote_id=quote_id)
     return {"message": "Quote deleted successfully"}
 
+def build_quote_render_spec(quote: dict, client: Optional[dict], vehicle: Optional[dict],
+                            settings: dict, logo: Optional[dict]) -> dict:
+    """Plain-data input for pdf_renderer.render_quote_pdf()."""
+    created_at = parse_date(quote['created_at'])
+    return {
+        "workshop_name": settings.get('workshop_name') or Settings().workshop_name,
+        "quote": {
+            key: quote.get(key)
+            for key in ("id", "status", "items", "subtotal", "labor_cost", "discount", "total", "notes")
+        },
+        "quote_date": created_at.strftime('%d/%m/%Y %H:%M'),
+        "client_name": client['name'] if client else 'N/A',
+        "vehicle_label": f"{vehicle['brand']} {vehicle['model']} - {vehicle['license_plate']}" if vehicle else 'N/A',
+        "logo": logo,
+    }
+
 @api_router.get("/quotes/{quote_id}/pdf")
-async def generate_quote_pdf(quote_id: str, username: str = Depends(verify_token)):
+async def generate_quote_pdf(quote_id: str, request: Request, username: str = Depends(verify_token)):
     quote = await db.quotes.find_one({"id": quote_id}, {"_id": 0})
     if not quote:
         raise HTTPException(status_code=404, detail="Quote not found")
     
-    client = await db.clients.find_one({"id": quote['client_id']}, {"_id": 0})
-    vehicle = await db.vehicles.find_one({"id": quote['vehicle_id']}, {"_id": 0})
-    settings = await db.settings.find_one({"id": "settings"}, {"_id": 0})
-    
-    if not settings:
-        settings = {"workshop_name": "IBS Auto Center"}
-    
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    story = []
-    styles = getSampleStyleSheet()
-    
-    header_title_style = ParagraphStyle(
-        'HeaderTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        textColor=colors.white,
-        alignment=TA_RIGHT,
-        leading=22,
-        spaceAfter=4
-    )
-    header_quote_style = ParagraphStyle(
-        'HeaderQuote',
-        parent=styles['Normal'],
-        fontSize=11,
-        textColor=colors.HexColor('#FCA5A5'),
-        alignment=TA_RIGHT,
-        leading=14,
-        spaceAfter=2
-    )
-    header_date_style = ParagraphStyle(
-        'HeaderDate',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.HexColor('#D4D4D8'),
-        alignment=TA_RIGHT,
-        leading=12
+    client, vehicle, settings = await asyncio.gather(
+        db.clients.find_one({"id": quote['client_id']}, {"_id": 0}),
+        db.vehicles.find_one({"id": quote['vehicle_id']}, {"_id": 0}),
+        get_cached_settings(),
     )
+    
+    logo = await get_logo_asset(settings)
+    spec = build_quote_render_spec(quote, client, vehicle, settings, logo)
+    refs = {"quote_id": quote_id, "client_id": quote['client_id'], "vehicle_id": quote['vehicle_id']}
+    key = pdf_cache_key(spec, refs)
+    etag = f'"{key}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": f"attachment; filename=orcamento_{quote_id[:8]}.pdf",
+    }
 
-    quote_date = datetime.fromisoformat(quote['created_at']).strftime('%d/%m/%Y %H:%M') if isinstance(quote['created_at'], str) else quote['created_at'].strftime('%d/%m/%Y %H:%M')
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
 
-    logo_box = None
-    logo_url = settings.get('logo_url')
-    if logo_url and not logo_url.startswith('blob:'):
-        try:
-            logo_content = None
-            logo_path = None
-
-            if logo_url.startswith('/uploads/'):
-                logo_path = ROOT_DIR / logo_url.lstrip('/')
-            elif logo_url.startswith('http://') or logo_url.startswith('https://'):
-                parsed = urlparse(logo_url)
-                if parsed.path.startswith('/uploads/'):
-                    logo_path = ROOT_DIR / parsed.path.lstrip('/')
-
-            if logo_path and logo_path.exists():
-                logo_content = logo_path.read_bytes()
-            else:
-                response = requests.get(logo_url, timeout=8)
-                response.raise_for_status()
-                logo_content = response.content
-
-            logo_bytes = io.BytesIO(logo_content)
-            image_reader = ImageReader(logo_bytes)
-            img_width, img_height = image_reader.getSize()
-            max_width = 1.25 * inch
-            max_height = 0.95 * inch
-            scale = min(max_width / img_width, max_height / img_height)
-            logo = Image(io.BytesIO(logo_content), width=img_width * scale, height=img_height * scale)
-            logo.hAlign = 'CENTER'
-
-            logo_box = Table([[logo]], colWidths=[1.5 * inch], rowHeights=[1.15 * inch])
-            logo_box.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#000000')),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('TOPPADDING', (0, 0), (-1, -1), 4),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-                ('LEFTPADDING', (0, 0), (-1, -1), 4),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 4),
-            ]))
-        except Exception:
-            # Keep PDF generation working even if logo download fails.
-            logo_box = None
+    pdf_bytes = await pdf_cache_get(key)
+    if pdf_bytes is None:
+        pdf_bytes = await render_pdf(spec)
+        await pdf_cache_put(key, pdf_bytes, refs)
     
-    header_content = [
-        Paragraph(settings['workshop_name'], header_title_style),
-        Paragraph(f"ORCAMENTO #{quote['id'][:8]}", header_quote_style),
-        Paragraph(f"Emitido em {quote_date}", header_date_style)
+    return Response(content=pdf_bytes, media_type="application/pdf", headers=headers)
+
+# ===== QUOTE PDF EXPORT =====
+
+PDF_EXPORT_BATCH_SIZE = int(os.environ.get('PDF_EXPORT_BATCH_SIZE', '100'))
+PDF_EXPORT_WINDOW = int(os.environ.get('PDF_EXPORT_WINDOW', str(PDF_MAX_WORKERS * 2)))
+
+class ZipChunkWriter:
+    """Write-only file object collecting what zipfile writes until drained.
+
+    It has no tell()/seek(), so zipfile streams entries sequentially and the
+    archive can be sent while it is being built.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+async def _with_references(quotes: List[dict]) -> List[tuple]:
+    client_ids = list({quote['client_id'] for quote in quotes})
+    vehicle_ids = list({quote['vehicle_id'] for quote in quotes})
+    clients, vehicles = await asyncio.gather(
+        db.clients.find({"id": {"$in": client_ids}}, {"_id": 0}).to_list(None),
+        db.vehicles.find({"id": {"$in": vehicle_ids}}, {"_id": 0}).to_list(None),
+    )
+    clients_by_id = {client['id']: client for client in clients}
+    vehicles_by_id = {vehicle['id']: vehicle for vehicle in vehicles}
+    return [
+        (quote, clients_by_id.get(quote['client_id']), vehicles_by_id.get(quote['vehicle_id']))
+        for quote in quotes
     ]
 
-    if logo_box:
-        header_table = Table([[logo_box, header_content]], colWidths=[1.75 * inch, 4.25 * inch])
-        header_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#111827')),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-            ('LEFTPADDING', (0, 0), (-1, -1), 12),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 12),
-            ('LINEBELOW', (0, 0), (-1, -1), 3, colors.HexColor('#DC2626')),
-        ]))
+async def _export_batches(query: dict):
+    """Yield (quote, client, vehicle) batches with references fetched in bulk."""
+    cursor = db.quotes.find(query, {"_id": 0}).sort(
+        [("created_at", 1), ("id", 1)]
+    ).batch_size(PDF_EXPORT_BATCH_SIZE)
+    batch = []
+    async for quote in cursor:
+        batch.append(quote)
+        if len(batch) >= PDF_EXPORT_BATCH_SIZE:
+            yield await _with_references(batch)
+            batch = []
+    if batch:
+        yield await _with_references(batch)
+
+async def _render_export_entry(quote: dict, client: Optional[dict], vehicle: Optional[dict],
+                               settings: dict, logo: Optional[dict]):
+    """(file name, PDF bytes, None), or (file name, None, error) when rendering failed."""
+    name = f"orcamento_{quote['id']}.pdf"
+    try:
+        spec = build_quote_render_spec(quote, client, vehicle, settings, logo)
+        refs = {"quote_id": quote['id'], "client_id": quote['client_id'], "vehicle_id": quote['vehicle_id']}
+        # Read-through only: a month-end export must not evict the hot entries.
+        pdf_bytes = await pdf_cache_get(pdf_cache_key(spec, refs))
+        if pdf_bytes is None:
+            pdf_bytes = await render_pdf(spec, reject_when_busy=False)
+    except Exception as e:
+        logger.exception(f"Could not render {name} for export")
+        return name, None, f"{e.__class__.__name__}: {e}"
+    return name, pdf_bytes, None
+
+def _add_export_entry(archive: zipfile.ZipFile, errors: List[str], entry: tuple):
+    name, pdf_bytes, error = entry
+    if error:
+        errors.append(f"{name}: {error}")
     else:
-        header_table = Table([[header_content]], colWidths=[6.0 * inch])
-        header_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#111827')),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 0), (-1, -1), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('LEFTPADDING', (0, 0), (-1, -1), 12),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 12),
-            ('LINEBELOW', (0, 0), (-1, -1), 3, colors.HexColor('#DC2626')),
-        ]))
-
-    story.append(header_table)
-    
-    story.append(Spacer(1, 0.2*inch))
-    
-    info_data = [
-        ['Cliente:', client['name'] if client else 'N/A'],
-        ['Veículo:', f"{vehicle['brand']} {vehicle['model']} - {vehicle['license_plate']}" if vehicle else 'N/A'],
-        ['Data:', quote_date],
-        ['Status:', quote['status'].upper()]
-    ]
-    
-    info_table = Table(info_data, colWidths=[1.5*inch, 4.5*inch])
-    info_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#18181b')),
-        ('TEXTCOLOR', (0, 0), (0, -1), colors.white),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#27272a'))
-    ]))
-    
-    story.append(info_table)
-    story.append(Spacer(1, 0.3*inch))
-    
-    story.append(Paragraph("<b>Itens do Orçamento</b>", styles['Heading3']))
-    story.append(Spacer(1, 0.1*inch))
-    
-    items_data = [['Tipo', 'Item', 'Qtd', 'Preço Unit.', 'Total']]
-    for item in quote['items']:
-        items_data.append([
-            item['type'].upper(),
-            item['name'],
-            str(item['quantity']),
-            f"R$ {item['unit_price']:.2f}",
-            f"R$ {item['total']:.2f}"
-        ])
-    
-    items_table = Table(items_data, colWidths=[1*inch, 2.5*inch, 0.7*inch, 1.2*inch, 1.2*inch])
-    items_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#DC2626')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#27272a')),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9fafb')])
-    ]))
-    
-    story.append(items_table)
-    story.append(Spacer(1, 0.3*inch))
-    
-    totals_data = [
-        ['Subtotal:', f"R$ {quote['subtotal']:.2f}"],
-    ]
-    
-    if quote.get('labor_cost', 0) > 0:
-        totals_data.append(['Mão de Obra:', f"R$ {quote['labor_cost']:.2f}"])
-    
-    totals_data.append(['Desconto:', f"R$ {quote['discount']:.2f}"])
-    totals_data.append(['TOTAL:', f"R$ {quote['total']:.2f}"])
-    
-    totals_table = Table(totals_data, colWidths=[4.8*inch, 1.8*inch])
-    last_row = len(totals_data) - 1
-    totals_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
-        ('FONTNAME', (0, last_row), (-1, last_row), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, last_row), (-1, last_row), 14),
-        ('TEXTCOLOR', (0, last_row), (-1, last_row), colors.HexColor('#DC2626')),
-        ('LINEABOVE', (0, last_row), (-1, last_row), 2, colors.HexColor('#DC2626')),
-        ('TOPPADDING', (0, last_row), (-1, last_row), 12)
-    ]))
-    
-    story.append(totals_table)
-    
-    if quote.get('notes'):
-        story.append(Spacer(1, 0.3*inch))
-        story.append(Paragraph("<b>Observações:</b>", styles['Heading3']))
-        story.append(Paragraph(quote['notes'], styles['Normal']))
-    
-    doc.build(story)
-    buffer.seek(0)
-    
+        archive.writestr(name, pdf_bytes)
+
+async def stream_quote_pdf_zip(query: dict):
+    """Build the ZIP incrementally, writing each PDF as soon as it is rendered.
+
+    Memory is bounded by one batch of quote documents plus PDF_EXPORT_WINDOW
+    rendered PDFs, whatever the number of quotes exported.
+
+    The 200 is sent before the first PDF exists, so failures cannot change
+    the status any more. A quote that fails to render is listed in an
+    errors.txt entry instead, and an error while reading the quotes ends the
+    export early the same way, so the client always gets a valid archive.
+    """
+    settings = await get_cached_settings()
+    logo = await get_logo_asset(settings)
+    writer = ZipChunkWriter()
+    pending = set()
+    errors = []
+    try:
+        with zipfile.ZipFile(writer, mode="w", compression=zipfile.ZIP_STORED) as archive:
+            try:
+                async for batch in _export_batches(query):
+                    for quote, client, vehicle in batch:
+                        while len(pending) >= PDF_EXPORT_WINDOW:
+                            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                            for task in done:
+                                _add_export_entry(archive, errors, task.result())
+                            yield writer.drain()
+                        pending.add(asyncio.create_task(
+                            _render_export_entry(quote, client, vehicle, settings, logo)
+                        ))
+            except Exception as e:
+                logger.exception("Quote PDF export stopped early")
+                errors.append(f"Export stopped early, later quotes are missing: {e.__class__.__name__}: {e}")
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    _add_export_entry(archive, errors, task.result())
+                yield writer.drain()
+            if errors:
+                archive.writestr("errors.txt", "\n".join(errors) + "\n")
+        # Closing the archive wrote the central directory.
+        yield writer.drain()
+    finally:
+        for task in pending:
+            task.cancel()
+
+@api_router.get("/quotes/pdf-export")
+async def export_quote_pdfs(
+    status: Optional[Literal["pending", "approved", "rejected", "completed"]] = None,
+    client_id: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    username: str = Depends(verify_token)
+):
+    query = date_range_filter("created_at", created_from, created_to)
+    if status:
+        query["status"] = status
+    if client_id:
+        query["client_id"] = client_id
+
+    filename = f"orcamentos_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.zip"
     return StreamingResponse(
-        buffer,
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=orcamento_{quote_id[:8]}.pdf"}
+        stream_quote_pdf_zip(query),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
+# Registered after /quotes/pdf-export so that path is not taken for an id.
+@api_router.get("/quotes/{quote_id}", response_model=Quote)
+async def get_quote(
+    quote_id: str,
+    request: Request,
+    fields: Optional[str] = None,
+    username: str = Depends(verify_token)
+):
+    selected = parse_fields(fields, Quote)
+    quote = await db.quotes.find_one({"id": quote_id}, sparse_projection(Quote, selected))
+    if not quote:
+        raise HTTPException(status_code=404, detail="Quote not found")
+    return document_response("quotes", request, quote, selected)
+
+# ===== COLLECTION EXPORT ROUTES =====
+
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def _csv_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=_export_value, ensure_ascii=False)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def parse_export_fields(fields: Optional[str], model) -> List[str]:
+    return parse_fields(fields, model) or list(model.model_fields)
+
+async def stream_collection_export(collection, query: dict, fields: List[str], export_format: str):
+    """Stream documents as NDJSON or CSV, flushing roughly every 64 KB."""
+    projection = {"_id": 0, **{field: 1 for field in fields}}
+    cursor = collection.find(query, projection).sort(
+        [("created_at", 1), ("id", 1)]
+    ).batch_size(EXPORT_BATCH_SIZE)
+
+    buffer = io.StringIO()
+    writer = None
+    if export_format == "csv":
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+
+    async for doc in cursor:
+        if writer:
+            writer.writerow([_csv_cell(doc.get(field)) for field in fields])
+        else:
+            buffer.write(json.dumps(doc, default=_export_value, ensure_ascii=False))
+            buffer.write("\n")
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+@api_router.get("/export/{collection_name}")
+async def export_collection(
+    collection_name: Literal["clients", "vehicles", "services", "parts", "appointments", "quotes"],
+    format: Literal["ndjson", "csv"] = "ndjson",
+    fields: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    username: str = Depends(verify_token)
+):
+    export_fields = parse_export_fields(fields, COLLECTION_MODELS[collection_name])
+    query = date_range_filter("created_at", created_from, created_to)
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_collection_export(db[collection_name], query, export_fields, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={collection_name}.{format}"}
+    )
+
+# ===== BULK IMPORT ROUTES =====
+
+IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', '1000'))
+IMPORT_READ_BYTES = 256 * 1024
+IMPORT_MAX_ERRORS = 1000
+# Longest CSV record, quoted newlines included; a stray quote would otherwise
+# pull the rest of the file into one record.
+IMPORT_MAX_RECORD_CHARS = int(os.environ.get('IMPORT_MAX_RECORD_CHARS', str(64 * 1024)))
+
+# collection -> (input model, natural key used for upserts). The key is a
+# normalized search key, matched as the indexed search.<key>, so "123.456.789-00"
+# and "12345678900" are the same client.
+IMPORT_MODELS = {
+    "clients": (ClientCreate, "cpf"),
+    "vehicles": (VehicleCreate, "plate"),
+    "services": (ServiceCreate, None),
+    "parts": (PartCreate, None),
+}
+
+class ImportRowError(BaseModel):
+    row: int
+    errors: List[dict]
+
+class ImportResult(BaseModel):
+    collection: str
+    received: int
+    inserted: int
+    updated: int
+    failed: int
+    duplicates: int  # rows superseded by a later row with the same key
+    errors: List[ImportRowError]
+    errors_truncated: bool
+
+async def _iter_upload_lines(file: UploadFile):
+    pending = b""
+    first = True
+    while True:
+        chunk = await file.read(IMPORT_READ_BYTES)
+        if not chunk:
+            break
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode('utf-8-sig' if first else 'utf-8') + "\n"
+            first = False
+    if pending:
+        yield pending.decode('utf-8-sig' if first else 'utf-8')
+
+async def _iter_import_rows(file: UploadFile, import_format: str):
+    """Yield (row number, dict) pairs; malformed rows yield their error instead."""
+    row_number = 0
+    if import_format == "ndjson":
+        async for line in _iter_upload_lines(file):
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield row_number, ValueError(f"Invalid JSON: {e}")
+                continue
+            yield row_number, row if isinstance(row, dict) else ValueError("Expected a JSON object")
+        return
+
+    header = None
+    record, record_line, line_number = "", 0, 0
+    async for line in _iter_upload_lines(file):
+        line_number += 1
+        record_line = record_line or line_number
+        # A CSV record ends at a newline only outside a quoted field.
+        record += line
+        if record.count('"') % 2:
+            if len(record) <= IMPORT_MAX_RECORD_CHARS:
+                continue
+            # Drop the record and resynchronize on the next line.
+            row_number += 1
+            yield row_number, ValueError(
+                f"Unterminated quoted field starting on line {record_line} "
+                f"(record longer than {IMPORT_MAX_RECORD_CHARS} characters)"
+            )
+            record, record_line = "", 0
+            continue
+        values, record, record_line = next(csv.reader([record]), []), "", 0
+        if not any(value.strip() for value in values):
+            continue
+        if header is None:
+            header = [value.strip() for value in values]
+            continue
+        row_number += 1
+        # Empty cells mean "not provided" so model defaults apply.
+        yield row_number, {key: value for key, value in zip(header, values) if value != ""}
+    if record:
+        yield row_number + 1, ValueError(f"Unterminated quoted field starting on line {record_line}")
+
+def _import_write_ops(collection_name: str, docs: List[dict], upsert: bool):
+    _, natural_key = IMPORT_MODELS[collection_name]
+    if not upsert or not natural_key:
+        return [InsertOne(doc) for doc in docs]
+    ops = []
+    for doc in docs:
+        key_value = doc["search"].get(natural_key)
+        if not key_value:
+            ops.append(InsertOne(doc))
+            continue
+        fields = {key: value for key, value in doc.items() if key not in ("id", "created_at")}
+        ops.append(UpdateOne(
+            {f"search.{natural_key}": key_value},
+            {"$set": fields, "$setOnInsert": {"id": doc["id"], "created_at": doc["created_at"]}},
+            upsert=True
+        ))
+    return ops
+
+def _dedupe_import_chunk(collection_name: str, chunk: List[tuple], result: dict) -> List[tuple]:
+    """Keep only the last row of each natural key; unordered upserts of the
+    same key in one bulk write could otherwise both insert."""
+    _, natural_key = IMPORT_MODELS[collection_name]
+    latest = {}
+    for index, (_, doc) in enumerate(chunk):
+        key_value = doc["search"].get(natural_key)
+        if key_value:
+            if key_value in latest:
+                result["duplicates"] += 1
+            latest[key_value] = index
+    kept = set(latest.values())
+    return [
+        entry for index, entry in enumerate(chunk)
+        if index in kept or not entry[1]["search"].get(natural_key)
+    ]
+
+async def _write_import_chunk(collection_name: str, chunk: List[tuple], upsert: bool, result: dict):
+    if upsert:
+        chunk = _dedupe_import_chunk(collection_name, chunk, result)
+    row_numbers = [row_number for row_number, _ in chunk]
+    ops = _import_write_ops(collection_name, [doc for _, doc in chunk], upsert)
+    try:
+        write = await db[collection_name].bulk_write(ops, ordered=False)
+        details = write.bulk_api_result
+    except BulkWriteError as e:
+        details = e.details
+        for error in details.get("writeErrors", []):
+            _record_import_error(result, row_numbers[error["index"]], [{"msg": error.get("errmsg")}])
+    result["inserted"] += details.get("nInserted", 0) + details.get("nUpserted", 0)
+    result["updated"] += details.get("nMatched", 0)
+
+def _record_import_error(result: dict, row_number: int, errors: List[dict]):
+    result["failed"] += 1
+    if len(result["errors"]) < IMPORT_MAX_ERRORS:
+        result["errors"].append(ImportRowError(row=row_number, errors=errors))
+    else:
+        result["errors_truncated"] = True
+
+@api_router.post("/import/{collection_name}", response_model=ImportResult)
+async def import_collection(
+    collection_name: Literal["clients", "vehicles", "services", "parts"],
+    file: UploadFile = File(...),
+    format: Optional[Literal["csv", "ndjson"]] = None,
+    upsert: bool = False,
+    username: str = Depends(verify_token)
+):
+    """Bulk insert rows validated against the collection's create model.
+
+    With upsert=true, clients are matched on CPF and vehicles on license
+    plate, both compared in normalized form; matching documents are updated
+    instead of duplicated. When the same key appears more than once, the last
+    row wins and the earlier ones are counted in "duplicates". Without upsert
+    they fail on the unique CPF/plate index.
+    """
+    import_format = format
+    if import_format is None:
+        filename = (file.filename or "").lower()
+        if filename.endswith(".csv") or file.content_type == "text/csv":
+            import_format = "csv"
+        elif filename.endswith((".ndjson", ".jsonl")) or file.content_type in ("application/x-ndjson", "application/jsonl"):
+            import_format = "ndjson"
+        else:
+            raise HTTPException(status_code=400, detail="Unknown file format. Use CSV or NDJSON.")
+    input_model, natural_key = IMPORT_MODELS[collection_name]
+    if upsert and not natural_key:
+        raise HTTPException(status_code=400, detail=f"Upsert is not supported for {collection_name}")
+
+    result = {"received": 0, "inserted": 0, "updated": 0, "failed": 0, "duplicates": 0, "errors": [],
+              "errors_truncated": False}
+    chunk = []
+    try:
+        async for row_number, row in _iter_import_rows(file, import_format):
+            result["received"] += 1
+            if isinstance(row, Exception):
+                _record_import_error(result, row_number, [{"msg": str(row)}])
+                continue
+            try:
+                data = input_model.model_validate(row)
+            except ValidationError as e:
+                _record_import_error(result, row_number, e.errors(include_url=False, include_context=False))
+                continue
+            # Same shape as the single-create handlers, without validating twice.
+            doc = {"id": str(uuid.uuid4()), **data.model_dump(), "created_at": datetime.now(timezone.utc)}
+            if collection_name in SEARCH_COLLECTIONS:
+                doc["search"] = search_keys(collection_name, doc)
+            chunk.append((row_number, doc))
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                await _write_import_chunk(collection_name, chunk, upsert, result)
+                chunk = []
+        if chunk:
+            await _write_import_chunk(collection_name, chunk, upsert, result)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse file: {e}")
+    finally:
+        counter = {"clients": "total_clients", "vehicles": "total_vehicles"}.get(collection_name)
+        if counter:
+            await increment_stats({counter: result["inserted"]})
+        if result["inserted"] or result["updated"]:
+            await bump_version(collection_name)
+
+    return ImportResult(collection=collection_name, **result)
+
 # ===== SETTINGS ROUTES =====
 
 @api_router.get("/settings", response_model=Settings)
 async def get_settings(username: str = Depends(verify_token)):
-    settings = await db.settings.find_one({"id": "settings"}, {"_id": 0})
-    if not settings:
-        settings = Settings().model_dump()
-        await db.settings.insert_one(settings)
-    return Settings(**settings)
+    return Settings(**await get_cached_settings())
 
 @api_router.post("/settings/logo-upload")
 async def upload_settings_logo(
@@ -770,103 +3207,305 @@ async def upload_settings_logo(
         "image/webp": ".webp",
         "image/svg+xml": ".svg",
     }
-    max_size = 5 * 1024 * 1024
 
     if file.content_type not in allowed_types:
         raise HTTPException(status_code=400, detail="Invalid logo format. Use PNG, JPG, WEBP or SVG.")
 
-    content = await file.read()
-    if not content:
-        raise HTTPException(status_code=400, detail="Empty file.")
-    if len(content) > max_size:
-        raise HTTPException(status_code=400, detail="Logo too large. Max size is 5MB.")
-
-    file_ext = allowed_types[file.content_type]
-    filename = f"logo_{uuid.uuid4().hex}{file_ext}"
-    file_path = UPLOADS_DIR / filename
-    file_path.write_bytes(content)
+    file_path = await save_upload_by_hash(file, "logo_", allowed_types[file.content_type], LOGO_MAX_BYTES)
 
     base_url = str(request.base_url).rstrip("/")
-    logo_url = f"{base_url}/uploads/{filename}"
-
-    await db.settings.update_one(
-        {"id": "settings"},
-        {"$set": {"logo_url": logo_url}},
-        upsert=True
-    )
+    logo_url = f"{base_url}/uploads/{file_path.name}"
+
+    update_fields = {"logo_url": logo_url, "logo_pdf_variant": None}
+    asset = await asyncio.to_thread(_ensure_logo_variant, file_path)
+    if asset:
+        variant_path = UPLOADS_DIR / f"{file_path.stem}_pdf.png"
+        update_fields["logo_pdf_variant"] = {
+            "source_url": logo_url,
+            "file": variant_path.name,
+            "width": asset["width"],
+            "height": asset["height"],
+        }
+        _logo_assets[(str(variant_path), variant_path.stat().st_mtime_ns)] = asset
+
+    await write_settings(update_fields)
 
     return {"logo_url": logo_url}
 
 @api_router.put("/settings", response_model=Settings)
 async def update_settings(settings_data: SettingsUpdate, username: str = Depends(verify_token)):
-    await db.settings.update_one(
-        {"id": "settings"},
-        {"$set": settings_data.model_dump(exclude_none=True)},
-        upsert=True
-    )
-    updated = await db.settings.find_one({"id": "settings"}, {"_id": 0})
+    updated = await write_settings(settings_data.model_dump(exclude_none=True))
+    await get_logo_asset(updated)
     return Settings(**updated)
 
 # ===== DASHBOARD ROUTES =====
 
+async def _recent_appointments(limit: int = 5) -> List[dict]:
+    pipeline = [
+        {"$sort": {"created_at": -1}},
+        {"$limit": limit},
+        {"$lookup": {"from": "clients", "localField": "client_id", "foreignField": "id", "as": "client"}},
+        {"$lookup": {"from": "vehicles", "localField": "vehicle_id", "foreignField": "id", "as": "vehicle"}},
+        {"$project": {
+            "_id": 0,
+            "id": 1,
+            "client_name": {"$ifNull": [{"$arrayElemAt": ["$client.name", 0]}, "N/A"]},
+            "vehicle": {"$cond": [
+                {"$gt": [{"$size": "$vehicle"}, 0]},
+                {"$concat": [
+                    {"$arrayElemAt": ["$vehicle.brand", 0]}, " ", {"$arrayElemAt": ["$vehicle.model", 0]}
+                ]},
+                "N/A",
+            ]},
+            "date": "$appointment_date",
+            "status": 1,
+        }},
+    ]
+    return await db.appointments.aggregate(pipeline).to_list(limit)
+
 @api_router.get("/dashboard/stats", response_model=DashboardStats)
 async def get_dashboard_stats(username: str = Depends(verify_token)):
-    total_clients = await db.clients.count_documents({})
-    total_vehicles = await db.vehicles.count_documents({})
-    pending_appointments = await db.appointments.count_documents({"status": {"$in": ["scheduled", "confirmed"]}})
-    pending_quotes = await db.quotes.count_documents({"status": "pending"})
-    
+    loop = asyncio.get_running_loop()
+    if _dashboard_cache["value"] is not None and loop.time() < _dashboard_cache["expires_at"]:
+        return _dashboard_cache["value"]
+
+    stats, recent_appointments = await asyncio.gather(
+        db.stats.find_one({"id": STATS_DOC_ID}, {"_id": 0}),
+        _recent_appointments(),
+    )
+    if not stats:
+        stats = await reconcile_dashboard_stats()
+
     now = datetime.now(timezone.utc)
-    start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    
-    approved_quotes = await db.quotes.find({
-        "status": {"$in": ["approved", "completed"]},
-        "created_at": {"$gte": start_of_month.isoformat()}
-    }, {"_id": 0}).to_list(1000)
-    
-    monthly_revenue = sum(quote['total'] for quote in approved_quotes)
-    
-    recent_appointments_raw = await db.appointments.find(
-        {},
-        {"_id": 0}
-    ).sort("created_at", -1).limit(5).to_list(5)
-    
-    recent_appointments = []
-    for apt in recent_appointments_raw:
-        client = await db.clients.find_one({"id": apt['client_id']}, {"_id": 0})
-        vehicle = await db.vehicles.find_one({"id": apt['vehicle_id']}, {"_id": 0})
-        recent_appointments.append({
-            "id": apt['id'],
-            "client_name": client['name'] if client else 'N/A',
-            "vehicle": f"{vehicle['brand']} {vehicle['model']}" if vehicle else 'N/A',
-            "date": apt['appointment_date'],
-            "status": apt['status']
-        })
-    
-    return DashboardStats(
-        total_clients=total_clients,
-        total_vehicles=total_vehicles,
-        pending_appointments=pending_appointments,
-        pending_quotes=pending_quotes,
-        monthly_revenue=monthly_revenue,
+    value = DashboardStats(
+        total_clients=stats.get("total_clients", 0),
+        total_vehicles=stats.get("total_vehicles", 0),
+        pending_appointments=stats.get("pending_appointments", 0),
+        pending_quotes=stats.get("pending_quotes", 0),
+        monthly_revenue=stats.get("revenue_by_month", {}).get(month_key(now), 0),
         recent_appointments=recent_appointments
     )
+    _dashboard_cache["value"] = value
+    _dashboard_cache["expires_at"] = loop.time() + DASHBOARD_CACHE_TTL_SECONDS
+    return value
+
+# ===== REPORT ROUTES =====
+
+REPORT_MAX_DAYS = int(os.environ.get('REPORT_MAX_DAYS', '3700'))
+
+def period_start(day: date, group_by: str) -> date:
+    if group_by == "week":
+        return day - timedelta(days=day.weekday())
+    if group_by == "month":
+        return day.replace(day=1)
+    return day
+
+def period_label(start: date, group_by: str) -> str:
+    if group_by == "week":
+        year, week, _ = start.isocalendar()
+        return f"{year}-W{week:02d}"
+    if group_by == "month":
+        return start.strftime("%Y-%m")
+    return start.isoformat()
+
+def revenue_bucket(period: str, start: date, counters: dict) -> RevenueBucket:
+    values = {key: round(value, 2) if key in ROLLUP_AMOUNT_FIELDS else value for key, value in counters.items()}
+    return RevenueBucket(period=period, start=start, **values)
+
+@api_router.get("/reports/revenue", response_model=RevenueReport)
+async def get_revenue_report(
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    group_by: Literal["day", "week", "month"] = "month",
+    username: str = Depends(verify_token)
+):
+    """Quote counts and revenue for the UTC days in [from, to), one bucket per period.
+
+    Reads one rollup document per day in the range, never the quotes. Quotes
+    count on the day they were created, not approved. Edge weeks and months
+    only cover the days inside the range.
+    """
+    if date_to <= date_from:
+        raise HTTPException(status_code=400, detail="'to' must be after 'from'")
+    if (date_to - date_from).days > REPORT_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Report range is limited to {REPORT_MAX_DAYS} days")
+
+    rows = await db.revenue_daily.find(
+        {"id": {"$gte": date_from.isoformat(), "$lt": date_to.isoformat()}}, {"_id": 0}
+    ).to_list(None)
+    periods = {}
+    # every period gets a bucket, so charts have no gaps
+    day = date_from
+    while day < date_to:
+        periods.setdefault(period_start(day, group_by), {})
+        day += timedelta(days=1)
+    totals = {}
+    for row in rows:
+        counters = {key: value for key, value in row.items() if key != "id"}
+        start = period_start(date.fromisoformat(row["id"]), group_by)
+        _add_counters(periods, {start: counters})
+        _add_counters(totals, {"total": counters})
+
+    return RevenueReport(
+        group_by=group_by,
+        start=date_from,
+        end=date_to,
+        buckets=[revenue_bucket(period_label(start, group_by), start, counters) for start, counters in periods.items()],
+        totals=revenue_bucket("total", date_from, totals.get("total", {})),
+    )
+
+# ===== METRICS =====
+
+# Route labels use the path template (/api/clients/{client_id}), never the raw
+# path, so the number of series stays bounded. Requests that match no route
+# (static uploads, 404s) share the "other" label. The template is resolved
+# before the request runs, so the in-flight gauge is labelled too.
+# GET /metrics accepts METRICS_TOKEN as a bearer token for scrapers, or any
+# valid admin token.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+http_request_duration = Histogram("http_request_duration_seconds", "Request latency by route", ("method", "route"))
+http_response_size = Histogram("http_response_size_bytes", "Response body size by route", ("method", "route"), SIZE_BUCKETS)
+http_requests_total = Counter("http_requests_total", "Requests served by route and status", ("method", "route", "status"))
+http_requests_in_flight = Gauge("http_requests_in_flight", "Requests being served by route", ("method", "route"))
+
+# (metric name, help, source dict, key, type) for the pool counters kept elsewhere
+POOL_METRICS = (
+    ("pdf_renders_in_flight", "PDF renders running", pdf_metrics, "in_flight", Gauge),
+    ("pdf_renders_queued", "PDF renders waiting for a worker", pdf_metrics, "queued", Gauge),
+    ("pdf_renders_total", "PDFs rendered", pdf_metrics, "rendered", Counter),
+    ("pdf_render_failures_total", "PDF renders that failed", pdf_metrics, "failed", Counter),
+    ("pdf_renders_rejected_total", "PDF renders rejected with a 503", pdf_metrics, "rejected", Counter),
+    ("pdf_render_seconds_total", "Time spent rendering PDFs", pdf_metrics, "render_seconds_total", Counter),
+    ("password_hashes_pending", "bcrypt operations running or queued", password_hash_metrics, "pending", Gauge),
+    ("password_hashes_rejected_total", "bcrypt operations rejected with a 503", password_hash_metrics, "rejected", Counter),
+)
+
+def route_label(scope) -> str:
+    """Path template of the route the router will pick, as it would store it
+    in scope["route"]; mounts such as /uploads have none."""
+    partial = "other"
+    for route in app.router.routes:
+        match, child_scope = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(child_scope.get("route"), "path", "other")
+        if match == Match.PARTIAL and partial == "other":
+            partial = getattr(child_scope.get("route"), "path", "other")
+    return partial
+
+class RequestMetricsMiddleware:
+    """Plain ASGI middleware so streamed responses are measured without buffering."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        response = {"status": 500, "size": 0}
+
+        async def send_with_metrics(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["size"] += len(message.get("body", b""))
+            await send(message)
+
+        labels = (scope["method"], route_label(scope))
+        http_requests_in_flight.inc(labels)
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            http_requests_in_flight.inc(labels, -1)
+            http_request_duration.observe(labels, time.perf_counter() - started)
+            http_response_size.observe(labels, response["size"])
+            http_requests_total.inc((*labels, str(response["status"])))
+
+async def verify_metrics_access(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    if METRICS_TOKEN and hmac.compare_digest(credentials.credentials.encode(), METRICS_TOKEN.encode()):
+        return
+    await verify_token_claims(credentials)
+
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(verify_metrics_access)])
+async def get_metrics():
+    pools = []
+    for name, help_text, source, key, kind in POOL_METRICS:
+        metric = kind(name, help_text)
+        metric.inc((), source[key])
+        pools.append(metric)
+    body = render_metrics([
+        http_request_duration, http_response_size, http_requests_total, http_requests_in_flight,
+        *mongo_timer.metrics, *pools,
+    ])
+    return Response(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Multipart bodies are spooled by Starlette before the route runs, so upload
+# limits are enforced here, on the raw request, before any byte is stored.
+UPLOAD_FORM_OVERHEAD = 64 * 1024  # boundaries and part headers
+UPLOAD_LIMITS = {"/api/settings/logo-upload": LOGO_MAX_BYTES}
+
+class UploadLimitMiddleware:
+    """413 for upload bodies over their limit: up front from Content-Length,
+    otherwise as soon as the streamed bytes pass it."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        max_bytes = UPLOAD_LIMITS.get(scope["path"]) if scope["type"] == "http" else None
+        if max_bytes is None:
+            await self.app(scope, receive, send)
+            return
+        limit = max_bytes + UPLOAD_FORM_OVERHEAD
+        detail = f"File too large. Max size is {max_bytes // (1024 * 1024)}MB."
+        content_length = Headers(scope=scope).get("content-length", "")
+        if content_length.isdigit() and int(content_length) > limit:
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # FastAPI re-raises HTTPExceptions from body parsing as is
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
 
 origins = [
     "https://ibs-new-site-2.vercel.app",
     "http://localhost:3000",
 ]
 
+# innermost, so its 413s still get CORS headers
+app.add_middleware(UploadLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,       # Origem permitida
     allow_credentials=True,
     allow_methods=["*"],         # Permite todos os métodos (GET, POST, PUT, DELETE)
     allow_headers=["*"],         # Permite todos os cabeçalhos
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
+app.add_middleware(RequestMetricsMiddleware)
+
+class ImmutableStaticFiles(StaticFiles):
+    """Uploads are never rewritten under the same name (new logos get a new
+    content-hash name), so browsers may cache them for good."""
+
+    def file_response(self, *args, **kwargs) -> Response:
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
 
 # Include the router in the main app
-app.mount("/uploads", StaticFiles(directory=str(UPLOADS_DIR)), name="uploads")
+app.mount("/uploads", ImmutableStaticFiles(directory=str(UPLOADS_DIR)), name="uploads")
 app.include_router(api_router)
 
 logging.basicConfig(
@@ -877,9 +3516,24 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("startup")
 async def startup_event():
+    await ensure_indexes()
+    await backfill_missing_search_keys()
+    if os.environ.get('INDEX_CHECK_ON_STARTUP') == '1':
+        for entry in await check_index_coverage():
+            if entry["collscan"]:
+                logger.warning(f"COLLSCAN for {entry['query']} on {entry['collection']}")
     await init_admin()
+    await refresh_versions()
+    await get_logo_asset(await reload_settings())
+    if not await db.stats.find_one({"id": STATS_DOC_ID}, {"_id": 1}):
+        await reconcile_dashboard_stats()
+    app.state.stats_reconciler = asyncio.create_task(_reconcile_stats_periodically())
+    await sync_revoked_tokens()
+    app.state.revocation_sync = asyncio.create_task(_sync_revoked_tokens_periodically())
     logger.info("IBS Auto Center API started")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    shutdown_pdf_executor()
+    _password_executor.shutdown(wait=False)
     client.close()
@@ -39,6 +39,10 @@ export const AuthProvider = ({ children }) => {
   };
 
   const logout = () => {
+    if (token) {
+      // Revoke server-side so the token stops working before it expires.
+      axios.post(`${API}/auth/logout`).catch(() => {});
+    }
     setToken(null);
     setUser(null);
     localStorage.removeItem('token');
@@ -8,8 +8,8 @@ import { Textarea } from '@/components/ui/textarea';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select';
 import { Dialog, DialogContent, DialogHeader, DialogTitle, DialogFooter } from '@/components/ui/dialog';
 import { toast } from 'sonner';
-import { Plus, Edit, Trash2, Calendar as CalendarIcon } from 'lucide-react';
-import { format } from 'date-fns';
+import { Plus, Edit, Trash2, ChevronLeft, ChevronRight, Calendar as CalendarIcon } from 'lucide-react';
+import { format, startOfMonth, addMonths } from 'date-fns';
 import { ptBR } from 'date-fns/locale';
 
 export default function Appointments() {
@@ -19,6 +19,7 @@ export default function Appointments() {
   const [loading, setLoading] = useState(true);
   const [dialogOpen, setDialogOpen] = useState(false);
   const [editingAppointment, setEditingAppointment] = useState(null);
+  const [month, setMonth] = useState(() => startOfMonth(new Date()));
   const [formData, setFormData] = useState({
     client_id: '',
     vehicle_id: '',
@@ -29,18 +30,19 @@ export default function Appointments() {
 
   useEffect(() => {
     loadData();
-  }, []);
+  }, [month]);
 
+  // Only the visible month is requested; the calendar endpoint serves it
+  // from one indexed range scan.
   const loadData = async () => {
     try {
-      const [appointmentsRes, clientsRes, vehiclesRes] = await Promise.all([
-        api.getAppointments(),
-        api.getClients(),
-        api.getVehicles(),
+      const [{ data }, { data: monthAppointments }] = await Promise.all([
+        api.getBootstrap('appointments'),
+        api.getAppointmentCalendar(month.toISOString(), addMonths(month, 1).toISOString()),
       ]);
-      setAppointments(appointmentsRes.data);
-      setClients(clientsRes.data);
-      setVehicles(vehiclesRes.data);
+      setAppointments(monthAppointments);
+      setClients(data.clients);
+      setVehicles(data.vehicles);
     } catch (error) {
       toast.error('Erro ao carregar dados');
     } finally {
@@ -56,17 +58,21 @@ export default function Appointments() {
         appointment_date: new Date(formData.appointment_date).toISOString(),
       };
       if (editingAppointment) {
-        await api.updateAppointment(editingAppointment.id, data);
+        await api.updateAppointment(editingAppointment.id, data, { check_conflicts: true });
         toast.success('Agendamento atualizado com sucesso!');
       } else {
-        await api.createAppointment(data);
+        await api.createAppointment(data, { check_conflicts: true });
         toast.success('Agendamento criado com sucesso!');
       }
       setDialogOpen(false);
       resetForm();
       loadData();
     } catch (error) {
-      toast.error('Erro ao salvar agendamento');
+      if (error.response?.status === 409) {
+        toast.error('Horário indisponível: já existe um agendamento neste horário');
+      } else {
+        toast.error('Erro ao salvar agendamento');
+      }
     }
   };
 
@@ -162,6 +168,29 @@ export default function Appointments() {
             </h1>
             <p className="text-zinc-400 text-sm mt-1">Gerencie os agendamentos da oficina</p>
           </div>
+          <div className="flex items-center gap-2">
+            <Button
+              onClick={() => setMonth((current) => addMonths(current, -1))}
+              variant="ghost"
+              size="sm"
+              className="hover:bg-zinc-800 text-zinc-400 hover:text-white rounded-sm"
+              data-testid="previous-month-button"
+            >
+              <ChevronLeft className="w-4 h-4" />
+            </Button>
+            <span className="text-sm font-semibold uppercase text-zinc-200 w-36 text-center" data-testid="calendar-month">
+              {format(month, 'MMMM yyyy', { locale: ptBR })}
+            </span>
+            <Button
+              onClick={() => setMonth((current) => addMonths(current, 1))}
+              variant="ghost"
+              size="sm"
+              className="hover:bg-zinc-800 text-zinc-400 hover:text-white rounded-sm"
+              data-testid="next-month-button"
+            >
+              <ChevronRight className="w-4 h-4" />
+            </Button>
+          </div>
           <Button
             onClick={() => { resetForm(); setDialogOpen(true); }}
             className="bg-red-600 hover:bg-red-700 text-white font-bold uppercase tracking-wide rounded-sm h-10 px-6 active:scale-95"
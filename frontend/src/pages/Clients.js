@@ -20,12 +20,13 @@ export default function Clients() {
   const [clients, setClients] = useState([]);
   const [loading, setLoading] = useState(true);
   const [searchTerm, setSearchTerm] = useState('');
+  const [searchResults, setSearchResults] = useState(null);
   const [dialogOpen, setDialogOpen] = useState(false);
   const [editingClient, setEditingClient] = useState(null);
   const [historyDialogOpen, setHistoryDialogOpen] = useState(false);
   const [historyLoading, setHistoryLoading] = useState(false);
   const [historyClient, setHistoryClient] = useState(null);
-  const [historyData, setHistoryData] = useState({ quotes: [], appointments: [] });
+  const [historyData, setHistoryData] = useState({ quotes: [], appointments: [], totals: {} });
   const [formData, setFormData] = useState({
     name: '',
     phone: '',
@@ -96,38 +97,8 @@ export default function Clients() {
     setHistoryDialogOpen(true);
     setHistoryLoading(true);
     try {
-      const [quotesRes, appointmentsRes, vehiclesRes] = await Promise.all([
-        api.getQuotes(),
-        api.getAppointments(),
-        api.getVehicles(),
-      ]);
-
-      const vehiclesById = vehiclesRes.data.reduce((acc, vehicle) => {
-        acc[vehicle.id] = vehicle;
-        return acc;
-      }, {});
-
-      const quotes = quotesRes.data
-        .filter((quote) => quote.client_id === client.id)
-        .map((quote) => ({
-          ...quote,
-          vehicle_label: vehiclesById[quote.vehicle_id]
-            ? `${vehiclesById[quote.vehicle_id].brand} ${vehiclesById[quote.vehicle_id].model} - ${vehiclesById[quote.vehicle_id].license_plate}`
-            : 'N/A',
-        }))
-        .sort((a, b) => new Date(b.created_at) - new Date(a.created_at));
-
-      const appointments = appointmentsRes.data
-        .filter((apt) => apt.client_id === client.id)
-        .map((apt) => ({
-          ...apt,
-          vehicle_label: vehiclesById[apt.vehicle_id]
-            ? `${vehiclesById[apt.vehicle_id].brand} ${vehiclesById[apt.vehicle_id].model} - ${vehiclesById[apt.vehicle_id].license_plate}`
-            : 'N/A',
-        }))
-        .sort((a, b) => new Date(b.appointment_date) - new Date(a.appointment_date));
-
-      setHistoryData({ quotes, appointments });
+      const response = await api.getClientOverview(client.id);
+      setHistoryData(response.data);
     } catch (error) {
       toast.error('Erro ao carregar histórico do cliente');
     } finally {
@@ -135,18 +106,50 @@ export default function Clients() {
     }
   };
 
+  const loadMoreHistory = async (kind) => {
+    const cursorKey = `${kind}_next_cursor`;
+    try {
+      const response = await api.getClientOverview(historyClient.id, { [`${kind}_after`]: historyData[cursorKey] });
+      setHistoryData((prev) => ({
+        ...prev,
+        [kind]: [...prev[kind], ...response.data[kind]],
+        [cursorKey]: response.data[cursorKey],
+      }));
+    } catch (error) {
+      toast.error('Erro ao carregar histórico do cliente');
+    }
+  };
+
   const resetForm = () => {
     setEditingClient(null);
     setFormData({ name: '', phone: '', email: '', cpf: '', address: '' });
   };
 
+  // Name, phone, CPF and e-mail lookups run on the server's indexed search.
+  useEffect(() => {
+    const term = searchTerm.trim();
+    if (!term) {
+      setSearchResults(null);
+      return undefined;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const response = await api.search(term, { scope: 'clients', limit: 50 });
+        if (!cancelled) setSearchResults(response.data.clients);
+      } catch (error) {
+        if (!cancelled) toast.error('Erro ao buscar clientes');
+      }
+    }, 250);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchTerm, clients]);
+
   const filteredClients = useMemo(
-    () => clients.filter((client) =>
-      client.name.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      (client.phone || '').includes(searchTerm) ||
-      (client.email && client.email.toLowerCase().includes(searchTerm.toLowerCase()))
-    ),
-    [clients, searchTerm]
+    () => searchResults ?? clients,
+    [clients, searchResults]
   );
 
   return (
@@ -364,8 +367,11 @@ export default function Clients() {
                 <div className="border border-zinc-800 rounded-sm overflow-hidden">
                   <div className="px-4 py-3 bg-zinc-900/60 border-b border-zinc-800">
                     <h3 className="text-sm font-semibold uppercase text-zinc-300">
-                      Orçamentos ({historyData.quotes.length})
+                      Orçamentos ({historyData.totals.quotes ?? 0})
                     </h3>
+                    <div className="text-xs text-zinc-500 mt-1">
+                      Em aberto: {historyData.totals.open_quotes ?? 0} • Faturado: R$ {(historyData.totals.lifetime_revenue ?? 0).toFixed(2)}
+                    </div>
                   </div>
                   {historyData.quotes.length === 0 ? (
                     <div className="p-4 text-sm text-zinc-500">Nenhum orçamento para este cliente.</div>
@@ -386,6 +392,18 @@ export default function Clients() {
                           </div>
                         </div>
                       ))}
+                      {historyData.quotes_next_cursor && (
+                        <div className="p-3 text-center">
+                          <Button
+                            type="button"
+                            variant="ghost"
+                            onClick={() => loadMoreHistory('quotes')}
+                            className="text-xs text-zinc-400 hover:text-white"
+                          >
+                            Carregar mais
+                          </Button>
+                        </div>
+                      )}
                     </div>
                   )}
                 </div>
@@ -393,7 +411,7 @@ export default function Clients() {
                 <div className="border border-zinc-800 rounded-sm overflow-hidden">
                   <div className="px-4 py-3 bg-zinc-900/60 border-b border-zinc-800">
                     <h3 className="text-sm font-semibold uppercase text-zinc-300">
-                      Agendamentos ({historyData.appointments.length})
+                      Agendamentos ({historyData.totals.appointments ?? 0})
                     </h3>
                   </div>
                   {historyData.appointments.length === 0 ? (
@@ -411,6 +429,18 @@ export default function Clients() {
                           <div className="text-xs text-zinc-400 uppercase">Status: {apt.status}</div>
                         </div>
                       ))}
+                      {historyData.appointments_next_cursor && (
+                        <div className="p-3 text-center">
+                          <Button
+                            type="button"
+                            variant="ghost"
+                            onClick={() => loadMoreHistory('appointments')}
+                            className="text-xs text-zinc-400 hover:text-white"
+                          >
+                            Carregar mais
+                          </Button>
+                        </div>
+                      )}
                     </div>
                   )}
                 </div>
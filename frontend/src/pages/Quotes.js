@@ -19,6 +19,8 @@ export default function Quotes() {
   const [services, setServices] = useState([]);
   const [parts, setParts] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [quotesNext, setQuotesNext] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [dialogOpen, setDialogOpen] = useState(false);
   const [editingQuote, setEditingQuote] = useState(null);
   const [quoteClientFilter, setQuoteClientFilter] = useState('all');
@@ -43,22 +45,25 @@ export default function Quotes() {
 
   useEffect(() => {
     loadData();
-  }, []);
+  }, [quoteClientFilter]);
 
+  // Quotes arrive newest first, one page at a time, with only the fields the
+  // cards show; the editor fetches the full quote.
   const loadData = async () => {
     try {
-      const [quotesRes, clientsRes, vehiclesRes, servicesRes, partsRes] = await Promise.all([
-        api.getQuotes(),
-        api.getClients(),
-        api.getVehicles(),
-        api.getServices(),
-        api.getParts(),
-      ]);
-      setQuotes(quotesRes.data);
-      setClients(clientsRes.data);
-      setVehicles(vehiclesRes.data);
-      setServices(servicesRes.data);
-      setParts(partsRes.data);
+      const { data, next } = await api.getBootstrap('quotes');
+      if (quoteClientFilter === 'all') {
+        setQuotes(data.quotes);
+        setQuotesNext(next.quotes);
+      } else {
+        const { data: page } = await api.getBootstrapSection('quotes', { client_id: quoteClientFilter });
+        setQuotes(page.data);
+        setQuotesNext(page.next);
+      }
+      setClients(data.clients);
+      setVehicles(data.vehicles);
+      setServices(data.services);
+      setParts(data.parts);
     } catch (error) {
       toast.error('Erro ao carregar dados');
     } finally {
@@ -206,7 +211,29 @@ export default function Quotes() {
     }
   };
 
-  const handleEdit = (quote) => {
+  const loadMoreQuotes = async () => {
+    setLoadingMore(true);
+    try {
+      const params = { after: quotesNext };
+      if (quoteClientFilter !== 'all') params.client_id = quoteClientFilter;
+      const { data: page } = await api.getBootstrapSection('quotes', params);
+      setQuotes((prev) => [...prev, ...page.data]);
+      setQuotesNext(page.next);
+    } catch (error) {
+      toast.error('Erro ao carregar mais orçamentos');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const handleEdit = async (summary) => {
+    let quote;
+    try {
+      ({ data: quote } = await api.getQuote(summary.id));
+    } catch (error) {
+      toast.error('Erro ao carregar orçamento');
+      return;
+    }
     setEditingQuote(quote);
     setFormData({
       client_id: quote.client_id,
@@ -483,6 +510,20 @@ export default function Quotes() {
           )}
         </div>
 
+        {!loading && quotesNext && (
+          <div className="flex justify-center mt-6">
+            <Button
+              onClick={loadMoreQuotes}
+              disabled={loadingMore}
+              variant="ghost"
+              className="border border-zinc-700 hover:border-zinc-500 text-zinc-300 hover:text-white rounded-sm"
+              data-testid="load-more-quotes"
+            >
+              {loadingMore ? 'Carregando...' : 'Carregar mais'}
+            </Button>
+          </div>
+        )}
+
         <Dialog open={dialogOpen} onOpenChange={setDialogOpen}>
           <DialogContent className="bg-zinc-950 border-zinc-800 text-zinc-50 max-w-3xl max-h-[90vh] overflow-y-auto" data-testid="quote-dialog">
             <DialogHeader>
@@ -46,7 +46,7 @@ export default function Vehicles() {
     try {
       const [vehiclesRes, clientsRes] = await Promise.all([
         api.getVehicles(),
-        api.getClients(),
+        api.getClients({ fields: 'name' }),
       ]);
       setVehicles(vehiclesRes.data);
       setClients(clientsRes.data);
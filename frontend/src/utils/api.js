@@ -1,41 +1,98 @@
 import axios from 'axios';
 
 const API_URL = `${process.env.REACT_APP_BACKEND_URL}/api`;
+const PAGE_SIZE = 1000;
+
+// List endpoints are cursor-paginated: keep following X-Next-Cursor until the
+// server stops sending one so screens still receive the complete collection.
+const getAllPages = async (path, params = {}) => {
+  const items = [];
+  let after;
+  let response;
+  do {
+    response = await axios.get(`${API_URL}${path}`, {
+      params: { ...params, limit: PAGE_SIZE, ...(after ? { after } : {}) },
+    });
+    items.push(...response.data);
+    after = response.headers['x-next-cursor'];
+  } while (after);
+  return { ...response, data: items };
+};
+
+// Bootstrap sections already downloaded, reused while the server reports the
+// same version for them.
+const bootstrapCache = {};
+
+const getBootstrap = async (page) => {
+  const known = Object.entries(bootstrapCache)
+    .map(([name, section]) => `${name}:${section.version}`)
+    .join(',');
+  const response = await axios.get(`${API_URL}/bootstrap/${page}`, {
+    params: known ? { known } : {},
+  });
+  const data = {};
+  const next = {};
+  Object.entries(response.data.sections).forEach(([name, section]) => {
+    if (section.data !== null) {
+      bootstrapCache[name] = section;
+    }
+    data[name] = bootstrapCache[name].data;
+    // paged sections (quotes) only hold their newest page; `next` continues them
+    next[name] = bootstrapCache[name].next || null;
+  });
+  return { ...response, data, next };
+};
 
 export const api = {
+  // Page bootstrap (Quotes / Appointments reference data in one request)
+  getBootstrap,
+  getBootstrapSection: (name, params) => axios.get(`${API_URL}/bootstrap/sections/${name}`, { params }),
+
   // Clients
-  getClients: () => axios.get(`${API_URL}/clients`),
+  getClients: (params) => getAllPages('/clients', params),
+  getClientsPage: (params) => axios.get(`${API_URL}/clients`, { params }),
   createClient: (data) => axios.post(`${API_URL}/clients`, data),
   updateClient: (id, data) => axios.put(`${API_URL}/clients/${id}`, data),
   deleteClient: (id) => axios.delete(`${API_URL}/clients/${id}`),
+  getClientOverview: (id, params) => axios.get(`${API_URL}/clients/${id}/overview`, { params }),
 
   // Vehicles
-  getVehicles: () => axios.get(`${API_URL}/vehicles`),
-  getVehiclesByClient: (clientId) => axios.get(`${API_URL}/vehicles/by-client/${clientId}`),
+  getVehicles: (params) => getAllPages('/vehicles', params),
+  getVehiclesPage: (params) => axios.get(`${API_URL}/vehicles`, { params }),
+  getVehiclesByClient: (clientId) => getAllPages(`/vehicles/by-client/${clientId}`),
   createVehicle: (data) => axios.post(`${API_URL}/vehicles`, data),
   updateVehicle: (id, data) => axios.put(`${API_URL}/vehicles/${id}`, data),
   deleteVehicle: (id) => axios.delete(`${API_URL}/vehicles/${id}`),
 
+  // Search
+  search: (q, params) => axios.get(`${API_URL}/search`, { params: { q, ...params } }),
+
   // Services
-  getServices: () => axios.get(`${API_URL}/services`),
+  getServices: (params) => getAllPages('/services', params),
+  getServicesPage: (params) => axios.get(`${API_URL}/services`, { params }),
   createService: (data) => axios.post(`${API_URL}/services`, data),
   updateService: (id, data) => axios.put(`${API_URL}/services/${id}`, data),
   deleteService: (id) => axios.delete(`${API_URL}/services/${id}`),
 
   // Parts
-  getParts: () => axios.get(`${API_URL}/parts`),
+  getParts: (params) => getAllPages('/parts', params),
+  getPartsPage: (params) => axios.get(`${API_URL}/parts`, { params }),
   createPart: (data) => axios.post(`${API_URL}/parts`, data),
   updatePart: (id, data) => axios.put(`${API_URL}/parts/${id}`, data),
   deletePart: (id) => axios.delete(`${API_URL}/parts/${id}`),
 
   // Appointments
-  getAppointments: () => axios.get(`${API_URL}/appointments`),
-  createAppointment: (data) => axios.post(`${API_URL}/appointments`, data),
-  updateAppointment: (id, data) => axios.put(`${API_URL}/appointments/${id}`, data),
+  getAppointments: (params) => getAllPages('/appointments', params),
+  getAppointmentsPage: (params) => axios.get(`${API_URL}/appointments`, { params }),
+  getAppointmentCalendar: (from, to, params) => axios.get(`${API_URL}/appointments/calendar`, { params: { from, to, ...params } }),
+  createAppointment: (data, params) => axios.post(`${API_URL}/appointments`, data, { params }),
+  updateAppointment: (id, data, params) => axios.put(`${API_URL}/appointments/${id}`, data, { params }),
   deleteAppointment: (id) => axios.delete(`${API_URL}/appointments/${id}`),
 
   // Quotes
-  getQuotes: () => axios.get(`${API_URL}/quotes`),
+  getQuotes: (params) => getAllPages('/quotes', params),
+  getQuotesPage: (params) => axios.get(`${API_URL}/quotes`, { params }),
+  getQuote: (id) => axios.get(`${API_URL}/quotes/${id}`),
   createQuote: (data) => axios.post(`${API_URL}/quotes`, data),
   updateQuote: (id, data) => axios.put(`${API_URL}/quotes/${id}`, data),
   updateQuoteStatus: (id, status) => axios.patch(`${API_URL}/quotes/${id}/status`, { status }),
@@ -57,6 +114,9 @@ export const api = {
 
   // Dashboard
   getDashboardStats: () => axios.get(`${API_URL}/dashboard/stats`),
+
+  // Reports
+  getRevenueReport: (from, to, groupBy) => axios.get(`${API_URL}/reports/revenue`, { params: { from, to, group_by: groupBy } }),
 };
 
 export default api;
@@ -0,0 +1,54 @@
+"""Fixtures running the API against an in-memory MongoDB (mongomock-motor)."""
+import os
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+# server reads its configuration at import time
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "ibs_test")
+os.environ["PDF_CACHE_DIR"] = tempfile.mkdtemp(prefix="ibs-test-pdf-")
+# the stand-in lacks $type; test data only holds BSON dates
+os.environ["DATE_DUAL_READ"] = "0"
+
+import httpx  # noqa: E402
+from mongomock_motor import AsyncMongoMockClient  # noqa: E402
+
+import server  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """A fresh database per test, with the in-process caches that mirror it cleared."""
+    database = AsyncMongoMockClient()["ibs_test"]
+    monkeypatch.setattr(server, "db", database)
+    for cache in (server._token_cache, server._revoked_jtis, server._login_buckets, server._collection_versions):
+        cache.clear()
+    monkeypatch.setitem(server._settings_cache, "version", None)
+    monkeypatch.setitem(server._settings_cache, "doc", None)
+    monkeypatch.setitem(server._revocations_synced, "until", datetime.min.replace(tzinfo=timezone.utc))
+    return database
+
+
+@pytest.fixture
+async def http(db):
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+async def auth_headers(http):
+    await server.init_admin()
+    response = await http.post("/api/auth/login", json={"username": "ibs", "password": "ibs1234"})
+    return {"Authorization": f"Bearer {response.json()['token']}"}
@@ -0,0 +1,82 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+NINE = datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+async def book(db, http, auth_headers):
+    await server.ensure_indexes()
+
+    async def book(when, vehicle_id="v1", status="scheduled", appointment_id=None):
+        payload = {"client_id": "c1", "vehicle_id": vehicle_id, "status": status,
+                   "appointment_date": when.isoformat()}
+        params = {"check_conflicts": "true"}
+        if appointment_id:
+            return await http.put(f"/api/appointments/{appointment_id}", json=payload, params=params,
+                                  headers=auth_headers)
+        return await http.post("/api/appointments", json=payload, params=params, headers=auth_headers)
+
+    return book
+
+
+async def test_overlapping_booking_for_the_same_vehicle_is_refused(book):
+    assert (await book(NINE)).status_code == 200
+    response = await book(NINE + timedelta(minutes=59))
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Vehicle already has an appointment at this time"
+
+
+async def test_adjacent_slots_other_vehicles_and_cancelled_bookings_do_not_conflict(book):
+    assert (await book(NINE)).status_code == 200
+    assert (await book(NINE + timedelta(minutes=server.APPOINTMENT_SLOT_MINUTES))).status_code == 200
+    assert (await book(NINE - timedelta(minutes=server.APPOINTMENT_SLOT_MINUTES))).status_code == 200
+    assert (await book(NINE, vehicle_id="v2")).status_code == 200
+    # a cancelled booking neither conflicts nor blocks the slot
+    assert (await book(NINE + timedelta(minutes=30), status="cancelled")).status_code == 200
+
+
+async def test_rescheduling_ignores_the_appointment_itself(book):
+    first = (await book(NINE)).json()
+    assert (await book(NINE + timedelta(minutes=15), appointment_id=first["id"])).status_code == 200
+
+    other = (await book(NINE + timedelta(hours=3))).json()
+    response = await book(NINE + timedelta(minutes=30), appointment_id=other["id"])
+    assert response.status_code == 409
+
+
+async def test_bay_cap_counts_every_vehicle(book, monkeypatch):
+    monkeypatch.setattr(server, "APPOINTMENT_BAYS", 2)
+    assert (await book(NINE, vehicle_id="v1")).status_code == 200
+    assert (await book(NINE, vehicle_id="v2")).status_code == 200
+    response = await book(NINE + timedelta(minutes=10), vehicle_id="v3")
+    assert response.status_code == 409
+    assert response.json()["detail"] == "No bay is free at this time"
+
+
+async def test_concurrent_bookings_for_one_slot_admit_exactly_one(book, db, monkeypatch):
+    probe = server.find_booking_conflict
+
+    async def slow_probe(*args, **kwargs):
+        # widen the window between the check and the insert
+        conflict = await probe(*args, **kwargs)
+        await asyncio.sleep(0.01)
+        return conflict
+
+    monkeypatch.setattr(server, "find_booking_conflict", slow_probe)
+    responses = await asyncio.gather(*(book(NINE + timedelta(minutes=minute)) for minute in range(5)))
+    assert sorted(response.status_code for response in responses) == [200, 409, 409, 409, 409]
+    assert await db.appointments.count_documents({}) == 1
+    assert await db.booking_locks.count_documents({}) == 0
+
+
+async def test_an_expired_lock_left_by_a_crashed_worker_is_taken_over(book, db):
+    await db.booking_locks.insert_one({"id": "vehicle:v1", "token": "dead",
+                                       "expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)})
+    assert (await book(NINE)).status_code == 200
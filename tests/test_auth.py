@@ -0,0 +1,150 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+def bearer(token: str) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+async def rejection(token: str) -> str:
+    with pytest.raises(HTTPException) as error:
+        await server.verify_token_claims(bearer(token))
+    assert error.value.status_code == 401
+    return error.value.detail
+
+
+@pytest.fixture
+def decodes(monkeypatch):
+    """Tokens actually decoded (cache misses)."""
+    calls = []
+    decode = server._decode_token
+
+    def counting_decode(token):
+        calls.append(token)
+        return decode(token)
+
+    monkeypatch.setattr(server, "_decode_token", counting_decode)
+    return calls
+
+
+async def test_verified_tokens_are_cached(db, decodes):
+    token = server.create_access_token("ibs")
+    first = await server.verify_token_claims(bearer(token))
+    second = await server.verify_token_claims(bearer(token))
+    assert first == second and first["sub"] == "ibs"
+    assert decodes == [token]
+
+
+async def test_token_cache_evicts_the_least_recently_used(db, decodes, monkeypatch):
+    monkeypatch.setattr(server, "TOKEN_CACHE_MAX_ENTRIES", 2)
+    a, b, c = (server.create_access_token(name) for name in ("a", "b", "c"))
+    for token in (a, b, a, c, a, b):
+        await server.verify_token_claims(bearer(token))
+    # b was evicted by c because a had been used more recently
+    assert decodes == [a, b, c, b]
+
+
+async def test_cached_token_still_expires(db, monkeypatch):
+    token = server.create_access_token("ibs")
+    claims = await server.verify_token_claims(bearer(token))
+    monkeypatch.setattr(time, "time", lambda: claims["exp"] + 1)
+    assert await rejection(token) == "Token expired"
+    assert not server._token_cache
+
+
+async def test_logout_revokes_the_token(http, auth_headers):
+    assert (await http.get("/api/clients", headers=auth_headers)).status_code == 200
+    assert (await http.post("/api/auth/logout", headers=auth_headers)).status_code == 200
+    response = await http.get("/api/clients", headers=auth_headers)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token revoked"
+
+
+async def test_revocations_reach_other_workers_through_the_database(db):
+    token = server.create_access_token("ibs")
+    claims = await server.verify_token_claims(bearer(token))
+    await server.revoke_token(claims)
+
+    # another worker: nothing in memory until its next sync
+    server._revoked_jtis.clear()
+    assert await server.verify_token_claims(bearer(token))
+    await server.sync_revoked_tokens()
+    assert await rejection(token) == "Token revoked"
+
+
+async def test_expired_revocations_are_forgotten(db):
+    await db.revoked_tokens.insert_one({
+        "jti": "old", "expires_at": datetime.now(timezone.utc) - timedelta(minutes=1),
+        "revoked_at": datetime.now(timezone.utc) - timedelta(hours=9),
+    })
+    await server.sync_revoked_tokens()
+    assert "old" not in server._revoked_jtis
+
+
+async def test_key_rotation_keeps_older_kids_verifying(db, monkeypatch):
+    monkeypatch.setattr(server, "JWT_KEYS", {"2026a": "first-secret-0123456789abcdef0123"})
+    monkeypatch.setattr(server, "JWT_ACTIVE_KID", "2026a")
+    old_token = server.create_access_token("ibs")
+
+    monkeypatch.setattr(server, "JWT_KEYS", {"2026a": "first-secret-0123456789abcdef0123", "2026b": "second-secret-0123456789abcdef012"})
+    monkeypatch.setattr(server, "JWT_ACTIVE_KID", "2026b")
+    new_token = server.create_access_token("ibs")
+    assert jwt.get_unverified_header(new_token)["kid"] == "2026b"
+    for token in (old_token, new_token):
+        assert (await server.verify_token_claims(bearer(token)))["sub"] == "ibs"
+
+    # retiring the old kid invalidates its tokens once they leave the cache
+    monkeypatch.setattr(server, "JWT_KEYS", {"2026b": "second-secret-0123456789abcdef012"})
+    server._token_cache.clear()
+    assert await rejection(old_token) == "Invalid token"
+    assert (await server.verify_token_claims(bearer(new_token)))["sub"] == "ibs"
+
+
+async def test_tokens_without_kid_use_the_legacy_secret(db):
+    exp = datetime.now(timezone.utc) + timedelta(minutes=5)
+    legacy = jwt.encode({"sub": "ibs", "exp": exp}, server.SECRET_KEY, algorithm=server.ALGORITHM)
+    assert (await server.verify_token_claims(bearer(legacy)))["sub"] == "ibs"
+
+    forged = jwt.encode({"sub": "ibs", "exp": exp}, "guess-0123456789abcdef0123456789ab", algorithm=server.ALGORITHM, headers={"kid": "nope"})
+    assert await rejection(forged) == "Invalid token"
+
+
+async def login_from(http, username, forwarded_for=None):
+    headers = {"X-Forwarded-For": forwarded_for} if forwarded_for else {}
+    response = await http.post("/api/auth/login", json={"username": username, "password": "wrong"}, headers=headers)
+    return response.status_code
+
+
+@pytest.fixture
+def one_attempt_per_ip(monkeypatch):
+    monkeypatch.setattr(server, "LOGIN_IP_BURST", 1)
+    monkeypatch.setattr(server, "LOGIN_IP_RATE_PER_MINUTE", 0.001)
+
+
+async def test_login_throttle_keys_on_the_forwarded_client_behind_a_trusted_proxy(http, one_attempt_per_ip,
+                                                                                 monkeypatch):
+    # the test client connects from 127.0.0.1, standing in for the proxy
+    monkeypatch.setattr(server, "TRUSTED_PROXIES", server.parse_trusted_proxies("127.0.0.1, 10.0.0.0/8"))
+
+    assert await login_from(http, "a", "203.0.113.7") == 401
+    assert await login_from(http, "b", "203.0.113.7") == 429
+    # another client behind the same proxy has its own bucket
+    assert await login_from(http, "c", "198.51.100.4") == 401
+    # a spoofed first entry does not help: the nearest untrusted hop counts
+    assert await login_from(http, "d", "1.2.3.4, 203.0.113.7, 10.0.0.2") == 429
+
+
+async def test_forwarded_header_is_ignored_from_untrusted_peers(http, one_attempt_per_ip, monkeypatch):
+    monkeypatch.setattr(server, "TRUSTED_PROXIES", server.parse_trusted_proxies(""))
+
+    assert await login_from(http, "a", "203.0.113.7") == 401
+    assert await login_from(http, "b", "198.51.100.4") == 429
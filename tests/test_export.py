@@ -0,0 +1,77 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def clients(db):
+    start = datetime(2024, 3, 1, tzinfo=timezone.utc)
+    docs = [
+        {"id": f"c{index}", "name": f"Cliente {index}", "phone": "", "email": None, "cpf": None,
+         "address": "Rua A, 1\nFundos" if index == 1 else None, "created_at": start + timedelta(days=index)}
+        for index in range(3)
+    ]
+    await db.clients.insert_many([dict(doc) for doc in docs])
+    return docs
+
+
+async def export(http, auth_headers, collection, **params):
+    response = await http.get(f"/api/export/{collection}", params=params, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    return response
+
+
+async def test_ndjson_export_streams_one_document_per_line(http, auth_headers, clients):
+    response = await export(http, auth_headers, "clients")
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert response.headers["content-disposition"] == "attachment; filename=clients.ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == ["c0", "c1", "c2"]
+    # the stand-in returns naive datetimes; the server's client is tz_aware
+    assert rows[0]["created_at"].startswith("2024-03-01T00:00:00")
+    assert "_id" not in rows[0]
+
+
+async def test_csv_export_writes_a_header_and_the_selected_fields(http, auth_headers, clients):
+    response = await export(http, auth_headers, "clients", format="csv", fields="name,address")
+
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows == [
+        ["name", "address"],
+        ["Cliente 0", ""],
+        ["Cliente 1", "Rua A, 1\nFundos"],
+        ["Cliente 2", ""],
+    ]
+
+
+async def test_export_filters_by_creation_date(http, auth_headers, clients):
+    response = await export(http, auth_headers, "clients", fields="id",
+                            created_from="2024-03-02T00:00:00Z", created_to="2024-03-03T00:00:00Z")
+
+    assert [json.loads(line) for line in response.text.splitlines()] == [{"id": "c1"}]
+
+
+async def test_export_is_flushed_in_chunks(db, clients, monkeypatch):
+    monkeypatch.setattr(server, "EXPORT_CHUNK_BYTES", 1)
+
+    chunks = [chunk async for chunk in server.stream_collection_export(db.clients, {}, ["id"], "ndjson")]
+
+    assert chunks == [b'{"id": "c0"}\n', b'{"id": "c1"}\n', b'{"id": "c2"}\n']
+
+
+async def test_export_rejects_unknown_fields_and_collections(http, auth_headers, clients):
+    unknown_field = await http.get("/api/export/clients", params={"fields": "name,password"}, headers=auth_headers)
+    assert unknown_field.status_code == 400
+    assert unknown_field.json()["detail"] == "Unknown fields: password"
+
+    unknown_collection = await http.get("/api/export/users", headers=auth_headers)
+    assert unknown_collection.status_code == 422
@@ -0,0 +1,132 @@
+import io
+
+import pytest
+from starlette.datastructures import UploadFile
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+async def parse(content: str, import_format: str = "csv") -> list:
+    upload = UploadFile(file=io.BytesIO(content.encode("utf-8")))
+    return [(row_number, row if isinstance(row, dict) else str(row))
+            async for row_number, row in server._iter_import_rows(upload, import_format)]
+
+
+async def test_csv_rows_keep_quoted_newlines_and_skip_blank_lines():
+    rows = await parse('﻿name,phone,address\nAna,1,"Rua A\nApto 2"\n\nBia,2,"x, ""y"""\nCai,,\n')
+    assert rows == [
+        (1, {"name": "Ana", "phone": "1", "address": "Rua A\nApto 2"}),
+        (2, {"name": "Bia", "phone": "2", "address": 'x, "y"'}),
+        # empty cells are left out so model defaults apply
+        (3, {"name": "Cai"}),
+    ]
+
+
+async def test_stray_quote_is_rejected_with_its_line_and_parsing_resumes(monkeypatch):
+    monkeypatch.setattr(server, "IMPORT_MAX_RECORD_CHARS", 20)
+    # lines 2-5 pass the cap before a closing quote shows up
+    rows = await parse('name,phone\nAna,"1\nBia,2\nCai,3\nDan,4\nEva,5\n')
+    assert rows[0][0] == 1 and "starting on line 2" in rows[0][1]
+    assert rows[1:] == [(2, {"name": "Eva", "phone": "5"})]
+
+
+async def test_unterminated_quote_at_end_of_file_is_reported():
+    rows = await parse('name,phone\nAna,1\nBia,"2\n')
+    assert rows[0] == (1, {"name": "Ana", "phone": "1"})
+    assert rows[1][0] == 2 and "starting on line 3" in rows[1][1]
+
+
+async def test_ndjson_rows_report_bad_lines():
+    rows = await parse('{"name": "Ana"}\n\nnot json\n[1]\n', "ndjson")
+    assert rows[0] == (1, {"name": "Ana"})
+    assert rows[1][0] == 2 and rows[1][1].startswith("Invalid JSON")
+    assert rows[2] == (3, "Expected a JSON object")
+
+
+async def import_file(http, headers, collection, content, upsert=False, filename="rows.csv"):
+    response = await http.post(f"/api/import/{collection}", params={"upsert": str(upsert).lower()},
+                               files={"file": (filename, content.encode("utf-8"))}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def test_import_validates_rows_and_counts_inserts(db, http, auth_headers, monkeypatch):
+    monkeypatch.setattr(server, "IMPORT_CHUNK_SIZE", 2)
+    result = await import_file(http, auth_headers, "clients",
+                               "name,phone,email\nAna,1,\nBia,2,not-an-email\nCai,3,\nDan,4,\n,5,\n")
+
+    assert (result["received"], result["inserted"], result["failed"]) == (5, 3, 2)
+    assert [error["row"] for error in result["errors"]] == [2, 5]
+    assert await db.clients.count_documents({}) == 3
+    assert (await db.stats.find_one({"id": server.STATS_DOC_ID}))["total_clients"] == 3
+    # imported documents are searchable right away
+    assert (await db.clients.find_one({"name": "Cai"}))["search"]["name_tokens"] == ["cai"]
+
+
+async def test_upsert_matches_cpf_and_plate_in_normalized_form(db, http, auth_headers):
+    await import_file(http, auth_headers, "clients", "name,phone,cpf\nAna,1,123.456.789-00\nSem CPF,2,\n")
+
+    result = await import_file(http, auth_headers, "clients",
+                               "name,phone,cpf\nAna Souza,1,12345678900\nOutro Sem CPF,3,\n", upsert=True)
+
+    assert (result["inserted"], result["updated"]) == (1, 1)
+    ana = await db.clients.find_one({"search.cpf": "12345678900"})
+    assert (ana["name"], ana["cpf"]) == ("Ana Souza", "12345678900")
+    # rows without the key are inserted, never matched against each other
+    assert await db.clients.count_documents({}) == 3
+
+    vehicles = "client_id,brand,model,license_plate,year\nc1,VW,Gol,abc-1d23,2020\n"
+    await import_file(http, auth_headers, "vehicles", vehicles)
+    result = await import_file(http, auth_headers, "vehicles", vehicles.replace("abc-1d23", "ABC1D23"), upsert=True)
+    assert (result["inserted"], result["updated"]) == (0, 1)
+    assert await db.vehicles.count_documents({}) == 1
+
+
+async def test_upsert_is_refused_for_collections_without_a_natural_key(http, auth_headers):
+    response = await http.post("/api/import/parts", params={"upsert": "true"},
+                               files={"file": ("rows.csv", b"name,price\nFiltro,10\n")}, headers=auth_headers)
+    assert response.status_code == 400
+
+
+async def create_indexes(db):
+    # the stand-in's create_indexes() drops partialFilterExpression
+    for name in ("clients", "vehicles"):
+        for index in server.INDEXES[name]:
+            spec = dict(index.document)
+            await db[name].create_index(list(spec.pop("key").items()), **spec)
+
+
+async def test_duplicate_keys_in_one_file_keep_the_last_row(db, http, auth_headers):
+    await create_indexes(db)
+    content = "name,phone,cpf\nAna,1,123.456.789-00\nBia,2,\nAna Souza,3,12345678900\nCai,4,\n"
+
+    result = await import_file(http, auth_headers, "clients", content, upsert=True)
+
+    assert (result["received"], result["inserted"], result["duplicates"], result["failed"]) == (4, 3, 1, 0)
+    ana = await db.clients.find_one({"search.cpf": "12345678900"})
+    assert (ana["name"], ana["phone"]) == ("Ana Souza", "3")
+
+    # without upsert the unique index rejects the repeat
+    result = await import_file(http, auth_headers, "clients", "name,phone,cpf\nDan,5,98765432100\nDan,5,987.654.321-00\n")
+    assert (result["inserted"], result["failed"], result["duplicates"]) == (1, 1, 0)
+    assert [error["row"] for error in result["errors"]] == [2]
+
+
+async def test_duplicate_cpf_and_plate_are_refused_by_the_crud_routes(db, http, auth_headers):
+    await create_indexes(db)
+    await http.post("/api/clients", json={"name": "Ana", "cpf": "123.456.789-00"}, headers=auth_headers)
+    await http.post("/api/clients", json={"name": "Sem CPF"}, headers=auth_headers)
+    other = (await http.post("/api/clients", json={"name": "Outro Sem CPF"}, headers=auth_headers)).json()
+
+    response = await http.post("/api/clients", json={"name": "Bia", "cpf": "12345678900"}, headers=auth_headers)
+    assert response.status_code == 409
+    response = await http.put(f"/api/clients/{other['id']}", json={"name": "Outro", "cpf": "12345678900"},
+                              headers=auth_headers)
+    assert response.status_code == 409
+
+    vehicle = {"client_id": other["id"], "brand": "VW", "model": "Gol", "license_plate": "ABC-1D23", "year": 2020}
+    assert (await http.post("/api/vehicles", json=vehicle, headers=auth_headers)).status_code == 200
+    response = await http.post("/api/vehicles", json={**vehicle, "license_plate": "abc1d23"}, headers=auth_headers)
+    assert response.status_code == 409
@@ -0,0 +1,143 @@
+import asyncio
+import io
+import os
+
+import pytest
+from PIL import Image
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+REMOTE_LOGO = "https://cdn.example.com/logo.png"
+
+
+def png_bytes(size=(40, 20)) -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", size, "red").save(output, format="PNG")
+    return output.getvalue()
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+
+@pytest.fixture
+def remote_logo(monkeypatch):
+    """Fake the remote host; each call pops the next outcome (bytes or an exception)."""
+    outcomes = []
+
+    def fake_get(url, timeout):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return FakeResponse(outcome)
+
+    monkeypatch.setattr(server.requests, "get", fake_get)
+    monkeypatch.setattr(server, "_logo_assets", {})
+    monkeypatch.setattr(server, "_logo_prefetching", set())
+    return outcomes
+
+
+async def drain_prefetches():
+    while server._logo_prefetch_tasks:
+        await asyncio.gather(*server._logo_prefetch_tasks)
+
+
+async def test_remote_logo_is_fetched_in_the_background(remote_logo):
+    remote_logo.append(png_bytes())
+
+    assert await server.get_logo_asset({"logo_url": REMOTE_LOGO}) is None
+    assert len(server._logo_prefetch_tasks) == 1
+    await drain_prefetches()
+
+    asset = await server.get_logo_asset({"logo_url": REMOTE_LOGO})
+    assert (asset["width"], asset["height"]) == (40, 20)
+    assert not server._logo_prefetching
+    assert not server._logo_prefetch_tasks
+
+
+async def test_failed_remote_logo_is_retried_once_the_failure_expires(remote_logo):
+    remote_logo.extend([OSError("connection reset"), png_bytes()])
+
+    await server.get_logo_asset({"logo_url": REMOTE_LOGO})
+    await drain_prefetches()
+
+    assert server._logo_assets[REMOTE_LOGO] is None
+    assert REMOTE_LOGO not in server._logo_prefetching
+    # the failure is remembered, not refetched on every render
+    assert await server.get_logo_asset({"logo_url": REMOTE_LOGO}) is None
+    assert not server._logo_prefetch_tasks
+
+    server._logo_assets.pop(REMOTE_LOGO)  # what the LOGO_RETRY_SECONDS timer does
+    await server.get_logo_asset({"logo_url": REMOTE_LOGO})
+    await drain_prefetches()
+    assert server._logo_assets[REMOTE_LOGO]["width"] == 40
+
+
+@pytest.fixture
+def uploads(monkeypatch, tmp_path):
+    directory = tmp_path / "uploads"
+    directory.mkdir()
+    monkeypatch.setattr(server, "ROOT_DIR", tmp_path)
+    monkeypatch.setattr(server, "UPLOADS_DIR", directory)
+    monkeypatch.setattr(server, "_logo_assets", {})
+    return directory
+
+
+@pytest.fixture
+def decodes(monkeypatch):
+    calls = []
+    prepare = server.prepare_logo_asset
+
+    def counting_prepare(content):
+        calls.append(content)
+        return prepare(content)
+
+    monkeypatch.setattr(server, "prepare_logo_asset", counting_prepare)
+    return calls
+
+
+async def test_local_logo_is_memoized_per_path_and_mtime(uploads, decodes):
+    logo = uploads / "logo_abc.png"
+    logo.write_bytes(png_bytes((40, 20)))
+    settings = {"logo_url": "/uploads/logo_abc.png"}
+
+    first = await server.get_logo_asset(settings)
+    second = await server.get_logo_asset(settings)
+
+    assert first is second
+    assert len(decodes) == 1
+    assert list(server._logo_assets) == [(str(logo), logo.stat().st_mtime_ns)]
+
+    # replaced in place: the new mtime is a new key
+    logo.write_bytes(png_bytes((20, 40)))
+    os.utime(logo, ns=(logo.stat().st_atime_ns, logo.stat().st_mtime_ns + 1_000_000))
+    third = await server.get_logo_asset(settings)
+    assert (third["width"], third["height"]) == (20, 40)
+    assert len(decodes) == 2
+
+
+async def test_prepared_variant_is_used_without_decoding(uploads, decodes):
+    (uploads / "logo_abc.png").write_bytes(png_bytes((800, 400)))
+    variant = server.prepare_logo_asset(png_bytes((40, 20)))
+    (uploads / "logo_abc_pdf.png").write_bytes(variant["data"])
+    decodes.clear()
+    settings = {
+        "logo_url": "/uploads/logo_abc.png",
+        "logo_pdf_variant": {"source_url": "/uploads/logo_abc.png", "file": "logo_abc_pdf.png", "width": 40, "height": 20},
+    }
+
+    asset = await server.get_logo_asset(settings)
+
+    assert (asset["width"], asset["height"], asset["digest"]) == (40, 20, variant["digest"])
+    assert decodes == []
+
+
+async def test_missing_local_logo_renders_without_one(uploads):
+    assert await server.get_logo_asset({"logo_url": "/uploads/gone.png"}) is None
+    assert server._logo_assets == {}
@@ -0,0 +1,72 @@
+import re
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+SAMPLE = re.compile(r'^[a-z_]+(\{[a-z_]+="[^"]*"(,[a-z_]+="[^"]*")*\})? (-?[0-9.e+-]+|\+Inf)$')
+
+
+async def scrape(http, auth_headers) -> list:
+    response = await http.get("/metrics", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    return response.text.splitlines()
+
+
+def sample_value(lines, series) -> float:
+    values = [line.rsplit(" ", 1)[1] for line in lines if line.rsplit(" ", 1)[0] == series]
+    assert len(values) == 1, series
+    return float(values[0])
+
+
+async def test_metrics_use_the_text_exposition_format(http, auth_headers):
+    await http.get("/api/clients", headers=auth_headers)
+
+    lines = await scrape(http, auth_headers)
+
+    for line in lines:
+        if line.startswith("# "):
+            assert re.match(r"^# (HELP [a-z_]+ .+|TYPE [a-z_]+ (counter|gauge|histogram))$", line), line
+        else:
+            assert SAMPLE.match(line), line
+    assert "# TYPE http_requests_in_flight gauge" in lines
+    assert "# TYPE http_request_duration_seconds histogram" in lines
+    assert sample_value(lines, 'http_requests_total{method="GET",route="/api/clients",status="200"}') >= 1
+
+
+async def test_histogram_buckets_are_cumulative(http, auth_headers):
+    await http.get("/api/clients/unknown-id", headers=auth_headers)
+
+    lines = await scrape(http, auth_headers)
+
+    labels = 'method="GET",route="/api/clients/{client_id}"'
+    buckets = [float(line.rsplit(" ", 1)[1]) for line in lines
+               if line.startswith(f"http_request_duration_seconds_bucket{{{labels},")]
+    assert buckets == sorted(buckets)
+    assert buckets[-1] == sample_value(lines, f"http_request_duration_seconds_count{{{labels}}}")
+    assert f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {buckets[-1]:g}' in lines
+
+
+async def test_in_flight_gauge_is_labelled_by_route_template(http, auth_headers):
+    await http.get("/api/clients/unknown-id", headers=auth_headers)
+
+    lines = await scrape(http, auth_headers)
+
+    # the scrape itself is the request being served
+    assert sample_value(lines, 'http_requests_in_flight{method="GET",route="/metrics"}') == 1
+    assert sample_value(lines, 'http_requests_in_flight{method="GET",route="/api/clients/{client_id}"}') == 0
+
+
+def test_route_label_matches_the_router():
+    def scope(method, path):
+        return {"type": "http", "method": method, "path": path, "root_path": ""}
+
+    assert server.route_label(scope("GET", "/api/clients/abc")) == "/api/clients/{client_id}"
+    assert server.route_label(scope("GET", "/api/quotes/pdf-export")) == "/api/quotes/pdf-export"
+    # wrong method: the router answers 405 for the same template
+    assert server.route_label(scope("PATCH", "/api/clients")) == "/api/clients"
+    assert server.route_label(scope("GET", "/uploads/logo.png")) == "other"
+    assert server.route_label(scope("GET", "/nothing-here")) == "other"
@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta, timezone
+
+import mongomock.aggregate
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+NINE = datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def lookup_pipelines(monkeypatch):
+    """Teach the stand-in uncorrelated `$lookup: {pipeline}`, which the overview is built on."""
+    lookup = mongomock.aggregate._PIPELINE_HANDLERS["$lookup"]
+
+    def lookup_with_pipeline(in_collection, database, options):
+        if "pipeline" not in options:
+            return lookup(in_collection, database, options)
+        assert "let" not in options and "localField" not in options
+        joined = list(database[options["from"]].aggregate(options["pipeline"]))
+        return [{**doc, options["as"]: [dict(row) for row in joined]} for doc in in_collection]
+
+    monkeypatch.setitem(mongomock.aggregate._PIPELINE_HANDLERS, "$lookup", lookup_with_pipeline)
+
+
+@pytest.fixture
+async def shop(http, auth_headers):
+    """One client with a vehicle, three quotes and two appointments; another client with a quote."""
+    async def post(path, payload):
+        response = await http.post(path, json=payload, headers=auth_headers)
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    client = await post("/api/clients", {"name": "Ana"})
+    other = await post("/api/clients", {"name": "Bruno"})
+    vehicle = await post("/api/vehicles", {
+        "client_id": client["id"], "brand": "VW", "model": "Gol", "license_plate": "ABC1D23", "year": 2020,
+    })
+    item = {"type": "service", "item_id": "s1", "name": "Troca de óleo", "quantity": 1, "unit_price": 100,
+            "total": 100}
+    quotes = [await post("/api/quotes", {"client_id": client["id"], "vehicle_id": vehicle["id"], "items": [item]})
+              for _ in range(3)]
+    await post("/api/quotes", {"client_id": other["id"], "vehicle_id": "v-other", "items": [item]})
+    await http.patch(f"/api/quotes/{quotes[0]['id']}/status", json={"status": "approved"}, headers=auth_headers)
+    await http.patch(f"/api/quotes/{quotes[1]['id']}/status", json={"status": "completed"}, headers=auth_headers)
+    appointments = [
+        await post("/api/appointments", {"client_id": client["id"], "vehicle_id": vehicle["id"],
+                                         "appointment_date": (NINE + timedelta(days=day)).isoformat(),
+                                         "status": status})
+        for day, status in ((0, "completed"), (7, "scheduled"))
+    ]
+    return {"client": client, "vehicle": vehicle, "quotes": quotes, "appointments": appointments}
+
+
+async def overview(http, auth_headers, client_id, **params):
+    response = await http.get(f"/api/clients/{client_id}/overview", params=params, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def test_overview_joins_the_client_history(http, auth_headers, shop):
+    body = await overview(http, auth_headers, shop["client"]["id"])
+
+    assert body["client"]["name"] == "Ana"
+    assert [vehicle["id"] for vehicle in body["vehicles"]] == [shop["vehicle"]["id"]]
+    assert body["totals"] == {
+        "vehicles": 1, "quotes": 3, "open_quotes": 1, "lifetime_revenue": 200,
+        "appointments": 2, "pending_appointments": 1,
+    }
+    assert [quote["id"] for quote in body["quotes"]] == [quote["id"] for quote in reversed(shop["quotes"])]
+    assert {quote["vehicle_label"] for quote in body["quotes"]} == {"VW Gol - ABC1D23"}
+    assert [appointment["status"] for appointment in body["appointments"]] == ["scheduled", "completed"]
+    assert body["quotes_next_cursor"] is None
+    assert body["appointments_next_cursor"] is None
+
+
+async def test_overview_pages_quotes_and_appointments_separately(http, auth_headers, shop):
+    client_id = shop["client"]["id"]
+    first = await overview(http, auth_headers, client_id, limit=2)
+
+    assert len(first["quotes"]) == 2
+    assert len(first["appointments"]) == 2
+    assert first["appointments_next_cursor"] is None
+    # totals cover the whole history, not the page
+    assert first["totals"]["quotes"] == 3
+
+    rest = await overview(http, auth_headers, client_id, limit=2, quotes_after=first["quotes_next_cursor"])
+    assert [quote["id"] for quote in rest["quotes"]] == [shop["quotes"][0]["id"]]
+    assert rest["quotes_next_cursor"] is None
+
+
+async def test_overview_of_a_client_without_history(http, auth_headers, shop):
+    client = (await http.post("/api/clients", json={"name": "Carla"}, headers=auth_headers)).json()
+
+    body = await overview(http, auth_headers, client["id"])
+
+    assert body["vehicles"] == body["quotes"] == body["appointments"] == []
+    assert body["totals"] == {
+        "vehicles": 0, "quotes": 0, "open_quotes": 0, "lifetime_revenue": 0,
+        "appointments": 0, "pending_appointments": 0,
+    }
+
+
+async def test_overview_of_an_unknown_client_is_a_404(http, auth_headers):
+    response = await http.get("/api/clients/missing/overview", headers=auth_headers)
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Client not found"
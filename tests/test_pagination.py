@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException, Response
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+BASE = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize("value", ["2026-01-01T00:00:00+00:00", 12.5, 0, None])
+def test_cursor_round_trip(value):
+    cursor = server.encode_cursor(value, "id-1")
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+    assert server.decode_cursor(cursor) == (value, "id-1")
+
+
+def test_cursor_keeps_dates_as_dates():
+    # decoded as naive UTC, which the driver treats as UTC in queries
+    value, _ = server.decode_cursor(server.encode_cursor(BASE + timedelta(microseconds=123000), "id-1"))
+    assert value == datetime(2026, 1, 1, 0, 0, 0, 123000)
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", server.encode_cursor("x", 42)])
+def test_decode_cursor_rejects_garbage(cursor):
+    with pytest.raises(HTTPException) as error:
+        server.decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_keyset_filter_breaks_ties_on_id(monkeypatch):
+    monkeypatch.setattr(server, "DATE_DUAL_READ", False)
+    after = server.encode_cursor(10, "b")
+    assert server.keyset_filter("parts", "price", 1, after) == {
+        "$or": [{"price": {"$gt": 10}}, {"price": 10, "id": {"$gt": "b"}}]
+    }
+    assert server.keyset_filter("parts", "price", -1, after) == {
+        "$or": [{"price": {"$lt": 10}}, {"price": 10, "id": {"$lt": "b"}}]
+    }
+
+
+def test_keyset_filter_crosses_the_legacy_string_boundary(monkeypatch):
+    monkeypatch.setattr(server, "DATE_DUAL_READ", True)
+    ascending = server.keyset_filter("quotes", "created_at", 1, server.encode_cursor("2025-01-01T00:00:00", "a"))
+    assert {"created_at": {"$type": "date"}} in ascending["$or"]
+    descending = server.keyset_filter("quotes", "created_at", -1, server.encode_cursor(BASE, "a"))
+    assert {"created_at": {"$type": "string"}} in descending["$or"]
+
+
+async def walk(collection, sort, limit, projection=None):
+    pages, after = [], None
+    while True:
+        response = Response()
+        docs = await server.paginate(collection, {}, sort, {"created_at", "price"}, limit, after, response,
+                                     projection=projection)
+        pages.append(docs)
+        after = response.headers.get(server.NEXT_CURSOR_HEADER)
+        if not after:
+            return pages
+
+
+@pytest.mark.parametrize("sort", ["price", "-price", "created_at", "-created_at"])
+async def test_paginate_visits_every_row_once_despite_ties(db, sort):
+    # three distinct prices and two distinct dates for seven rows
+    docs = [
+        {"id": f"p{index}", "price": float(index % 3), "created_at": BASE + timedelta(days=index % 2)}
+        for index in (5, 2, 6, 0, 3, 1, 4)
+    ]
+    await db.parts.insert_many([dict(doc) for doc in docs])
+    field = sort.lstrip("-")
+    descending = sort.startswith("-")
+    expected = [doc["id"] for doc in sorted(docs, key=lambda doc: (doc[field], doc["id"]), reverse=descending)]
+
+    pages = await walk(db.parts, sort, 2)
+
+    assert [len(page) for page in pages] == [2, 2, 2, 1]
+    assert [doc["id"] for page in pages for doc in page] == expected
+
+
+async def test_paginate_hides_cursor_fields_left_out_of_the_projection(db):
+    await db.parts.insert_many([{"id": f"p{index}", "name": f"P{index}", "price": 1.0} for index in range(3)])
+
+    pages = await walk(db.parts, "price", 2, projection={"_id": 0, "name": 1})
+
+    assert [doc for page in pages for doc in page] == [{"name": "P0"}, {"name": "P1"}, {"name": "P2"}]
+
+
+async def test_list_route_pages_through_the_cursor_header(http, auth_headers, db):
+    await db.parts.insert_many([
+        {"id": f"p{index}", "name": f"Part {index}", "price": 10.0, "stock": 1, "created_at": BASE}
+        for index in range(5)
+    ])
+    seen, params = [], {"sort": "-price", "limit": 2, "fields": "name"}
+    while True:
+        response = await http.get("/api/parts", params=params, headers=auth_headers)
+        assert response.status_code == 200
+        seen += [part["id"] for part in response.json()]
+        if server.NEXT_CURSOR_HEADER not in response.headers:
+            break
+        params["after"] = response.headers[server.NEXT_CURSOR_HEADER]
+    assert seen == ["p4", "p3", "p2", "p1", "p0"]
+
+    response = await http.get("/api/parts", params={"sort": "cost"}, headers=auth_headers)
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("collection_name, sort_fields", [
+    ("clients", server.CLIENT_SORT_FIELDS),
+    ("vehicles", server.VEHICLE_SORT_FIELDS),
+    ("services", server.SERVICE_SORT_FIELDS),
+    ("parts", server.PART_SORT_FIELDS),
+    ("appointments", server.APPOINTMENT_SORT_FIELDS),
+    ("quotes", server.QUOTE_SORT_FIELDS),
+])
+def test_every_sort_has_an_index_and_a_query_shape(collection_name, sort_fields):
+    index_keys = {tuple(index.document["key"].items()) for index in server.INDEXES[collection_name]}
+    shape_sorts = {tuple(sort) for _, name, _, sort in server.QUERY_SHAPES if name == collection_name and sort}
+    for field in sort_fields:
+        assert ((field, 1), ("id", 1)) in index_keys, field
+        assert ((field, 1), ("id", 1)) in shape_sorts, field
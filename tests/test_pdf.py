@@ -0,0 +1,187 @@
+import asyncio
+import io
+from collections import OrderedDict
+import threading
+import zipfile
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def renderer(monkeypatch):
+    """Render in threads with a stand-in for reportlab; quote ids in `failing` raise."""
+    failing = set()
+
+    def fake_render(spec):
+        if spec["quote"]["id"] in failing:
+            raise ValueError("bad glyph")
+        return f"%PDF-fake {spec['quote']['id']}".encode()
+
+    monkeypatch.setattr(server, "PDF_EXECUTOR", "thread")
+    monkeypatch.setattr(server, "_pdf_executor", None)
+    # asyncio primitives bind to the first loop that waits on them
+    monkeypatch.setattr(server, "_pdf_slots", asyncio.Semaphore(server.PDF_MAX_WORKERS))
+    monkeypatch.setattr(server, "render_quote_pdf", fake_render)
+    yield failing
+    server.shutdown_pdf_executor()
+
+
+@pytest.fixture
+async def quotes(http, auth_headers):
+    client = (await http.post("/api/clients", json={"name": "Ana"}, headers=auth_headers)).json()
+    vehicle = (await http.post("/api/vehicles", json={
+        "client_id": client["id"], "brand": "VW", "model": "Gol", "license_plate": "ABC1D23", "year": 2020,
+    }, headers=auth_headers)).json()
+    item = {"type": "service", "item_id": "s1", "name": "Troca de óleo", "quantity": 1, "unit_price": 80, "total": 80}
+    created = []
+    for _ in range(3):
+        response = await http.post("/api/quotes", json={
+            "client_id": client["id"], "vehicle_id": vehicle["id"], "items": [item],
+        }, headers=auth_headers)
+        created.append(response.json()["id"])
+    return created
+
+
+async def export_archive(http, auth_headers) -> zipfile.ZipFile:
+    response = await http.get("/api/quotes/pdf-export", headers=auth_headers)
+    assert response.status_code == 200
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert archive.testzip() is None
+    return archive
+
+
+async def test_export_zips_every_quote(http, auth_headers, quotes, renderer):
+    archive = await export_archive(http, auth_headers)
+
+    assert sorted(archive.namelist()) == sorted(f"orcamento_{quote_id}.pdf" for quote_id in quotes)
+    assert archive.read(f"orcamento_{quotes[0]}.pdf") == f"%PDF-fake {quotes[0]}".encode()
+
+
+async def test_render_failure_is_listed_in_errors_txt(http, auth_headers, quotes, renderer):
+    renderer.add(quotes[1])
+
+    archive = await export_archive(http, auth_headers)
+
+    names = archive.namelist()
+    assert f"orcamento_{quotes[1]}.pdf" not in names
+    assert {f"orcamento_{quotes[0]}.pdf", f"orcamento_{quotes[2]}.pdf", "errors.txt"} == set(names)
+    assert archive.read("errors.txt").decode() == f"orcamento_{quotes[1]}.pdf: ValueError: bad glyph\n"
+
+
+async def test_failure_reading_quotes_still_closes_the_archive(http, auth_headers, quotes, renderer, monkeypatch):
+    async def broken_batches(query):
+        yield await server._with_references([await server.db.quotes.find_one({"id": quotes[0]}, {"_id": 0})])
+        raise RuntimeError("cursor killed")
+
+    monkeypatch.setattr(server, "_export_batches", broken_batches)
+
+    archive = await export_archive(http, auth_headers)
+
+    assert set(archive.namelist()) == {f"orcamento_{quotes[0]}.pdf", "errors.txt"}
+    assert "RuntimeError: cursor killed" in archive.read("errors.txt").decode()
+
+
+async def test_downloads_beyond_the_render_queue_get_503(http, auth_headers, quotes, renderer, pdf_cache,
+                                                        monkeypatch):
+    gate = threading.Event()
+    monkeypatch.setattr(server, "render_quote_pdf", lambda spec: gate.wait(5) and b"%PDF-fake")
+    monkeypatch.setattr(server, "_pdf_slots", asyncio.Semaphore(1))
+    monkeypatch.setattr(server, "PDF_MAX_QUEUE", 1)
+    rejected = server.pdf_metrics["rejected"]
+
+    # one download renders, one waits for the worker, the third is turned away
+    downloads = [asyncio.create_task(http.get(f"/api/quotes/{quote_id}/pdf", headers=auth_headers))
+                 for quote_id in quotes]
+    try:
+        done, _ = await asyncio.wait(downloads, return_when=asyncio.FIRST_COMPLETED)
+        busy = done.pop().result()
+        assert busy.status_code == 503
+        assert busy.headers["retry-after"] == "2"
+    finally:
+        gate.set()
+
+    responses = await asyncio.gather(*downloads)
+    assert sorted(response.status_code for response in responses) == [200, 200, 503]
+    assert server.pdf_metrics["rejected"] == rejected + 1
+    assert server.pdf_metrics["queued"] == 0
+
+
+async def test_export_is_never_turned_away(http, auth_headers, quotes, renderer, monkeypatch):
+    monkeypatch.setattr(server, "PDF_MAX_QUEUE", 0)
+
+    archive = await export_archive(http, auth_headers)
+
+    assert len(archive.namelist()) == 3
+
+
+@pytest.fixture
+def pdf_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(server, "_pdf_cache", OrderedDict())
+    monkeypatch.setattr(server, "_pdf_cache_refs", {})
+    monkeypatch.setattr(server, "PDF_CACHE_DIR", tmp_path)
+    return tmp_path
+
+
+async def test_memory_cache_evicts_the_least_recently_used(pdf_cache, monkeypatch):
+    monkeypatch.setattr(server, "PDF_CACHE_MAX_ENTRIES", 2)
+    monkeypatch.setattr(server, "PDF_DISK_CACHE", False)
+    for key in ("a", "b"):
+        await server.pdf_cache_put(key, key.encode(), {"quote_id": key})
+    await server.pdf_cache_get("a")
+    await server.pdf_cache_put("c", b"c", {"quote_id": "c"})
+
+    assert list(server._pdf_cache) == ["a", "c"]
+    assert await server.pdf_cache_get("b") is None
+    assert set(server._pdf_cache_refs) == {"a", "c"}
+
+
+async def test_disk_cache_serves_without_filling_the_memory_cache(pdf_cache, monkeypatch):
+    monkeypatch.setattr(server, "PDF_DISK_CACHE", True)
+    await server.pdf_cache_put("a", b"%PDF-a", {"quote_id": "q1", "client_id": "c1"})
+    assert (pdf_cache / "a.pdf").read_bytes() == b"%PDF-a"
+
+    server._pdf_cache.clear()  # a fresh worker
+    assert await server.pdf_cache_get("a") == b"%PDF-a"
+    assert "a" not in server._pdf_cache
+
+
+async def test_invalidation_drops_memory_and_disk_entries_by_reference(pdf_cache, monkeypatch):
+    monkeypatch.setattr(server, "PDF_DISK_CACHE", True)
+    await server.pdf_cache_put("a", b"a", {"quote_id": "q1", "client_id": "c1"})
+    await server.pdf_cache_put("b", b"b", {"quote_id": "q2", "client_id": "c2"})
+
+    await server.invalidate_pdf_cache(client_id="c1")
+
+    assert list(server._pdf_cache) == ["b"]
+    assert sorted(path.name for path in pdf_cache.iterdir()) == ["b.pdf"]
+
+
+async def test_download_is_cached_and_answers_if_none_match(http, auth_headers, quotes, renderer, pdf_cache,
+                                                            monkeypatch):
+    rendered = []
+    render = server.render_quote_pdf
+    monkeypatch.setattr(server, "render_quote_pdf", lambda spec: rendered.append(spec["quote"]["id"]) or render(spec))
+    path = f"/api/quotes/{quotes[0]}/pdf"
+
+    first = await http.get(path, headers=auth_headers)
+    second = await http.get(path, headers=auth_headers)
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content
+    assert rendered == [quotes[0]]
+    etag = first.headers["etag"]
+    assert second.headers["etag"] == etag
+
+    not_modified = await http.get(path, headers={**auth_headers, "If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+    # anything printed on the page changes the key, and with it the ETag
+    await http.patch(f"/api/quotes/{quotes[0]}/status", json={"status": "approved"}, headers=auth_headers)
+    changed = await http.get(path, headers={**auth_headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert rendered == [quotes[0], quotes[0]]
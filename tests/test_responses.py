@@ -0,0 +1,115 @@
+import gzip
+import json
+
+import brotli
+import pytest
+from starlette.requests import Request
+
+import server
+
+
+def request_accepting(accept_encoding: str) -> Request:
+    return Request({"type": "http", "headers": [(b"accept-encoding", accept_encoding.encode())]})
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("", None),
+    ("identity", None),
+    ("gzip, deflate, br", "br"),
+    ("gzip", "gzip"),
+    ("br;q=0, gzip", "gzip"),
+    ("gzip;q=0, br;q=0", None),
+    ("br;q=0.4, gzip;q=0.8", "gzip"),
+    ("BR; Q=0.9, gzip;q=0.9", "br"),
+    ("*", "br"),
+    ("*;q=0.5, br;q=0", "gzip"),
+    ("gzip;q=bogus, br;q=0.1", "br"),
+])
+def test_negotiate_encoding_honours_q_values(header, expected):
+    assert server.negotiate_encoding(request_accepting(header)) == expected
+
+
+@pytest.mark.parametrize("header, encoding, decode", [
+    ("br, gzip", "br", brotli.decompress),
+    ("gzip", "gzip", gzip.decompress),
+])
+def test_large_bodies_are_compressed(header, encoding, decode):
+    body = json.dumps([{"id": str(index), "name": "Cliente"} for index in range(100)]).encode()
+
+    response = server.compressed_response(request_accepting(header), body)
+
+    assert response.headers["content-encoding"] == encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert decode(response.body) == body
+
+
+@pytest.mark.parametrize("header, size", [
+    ("gzip;q=0, br;q=0", 4096),
+    ("br, gzip", 10),
+])
+def test_refused_or_small_bodies_are_sent_as_is(header, size):
+    body = b"x" * size
+
+    response = server.compressed_response(request_accepting(header), body)
+
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.body == body
+
+
+@pytest.mark.anyio
+async def test_list_route_is_served_compressed(http, auth_headers):
+    for index in range(30):
+        await http.post("/api/clients", json={"name": f"Cliente {index}", "phone": "0" * 11}, headers=auth_headers)
+
+    response = await http.get("/api/clients", headers={**auth_headers, "Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()) == 30
+
+
+def test_parse_fields_keeps_order_and_drops_repeats():
+    assert server.parse_fields(None, server.Client) is None
+    assert server.parse_fields("", server.Client) is None
+    assert server.parse_fields(" name, phone,name,", server.Client) == ["name", "phone"]
+
+
+def test_parse_fields_rejects_unknown_fields():
+    with pytest.raises(server.HTTPException) as raised:
+        server.parse_fields("name,password,search", server.Client)
+
+    assert raised.value.status_code == 400
+    assert raised.value.detail == "Unknown fields: password, search"
+
+
+def test_sparse_projection_always_includes_the_id():
+    assert server.sparse_projection(server.Client, ["name"]) == {"_id": 0, "id": 1, "name": 1}
+    assert server.sparse_projection(server.Client, None) == server.model_projection(server.Client)
+
+
+@pytest.fixture
+async def client_doc(http, auth_headers):
+    response = await http.post("/api/clients", json={"name": "Ana", "phone": "11999990000", "cpf": "12345678900"},
+                               headers=auth_headers)
+    return response.json()
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("fast_routes", [server.FAST_JSON_ROUTES, set()])
+async def test_fields_limit_list_and_detail_responses(http, auth_headers, client_doc, monkeypatch, fast_routes):
+    monkeypatch.setattr(server, "FAST_JSON_ROUTES", fast_routes)
+
+    listed = await http.get("/api/clients", params={"fields": "name"}, headers=auth_headers)
+    detail = await http.get(f"/api/clients/{client_doc['id']}", params={"fields": "phone,name"},
+                            headers=auth_headers)
+
+    assert listed.json() == [{"id": client_doc["id"], "name": "Ana"}]
+    assert detail.json() == {"id": client_doc["id"], "phone": "11999990000", "name": "Ana"}
+
+
+@pytest.mark.anyio
+async def test_unknown_field_is_a_400(http, auth_headers, client_doc):
+    response = await http.get("/api/clients", params={"fields": "name,search"}, headers=auth_headers)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unknown fields: search"
@@ -0,0 +1,204 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import mongomock_motor
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+DAY = datetime(2026, 3, 2, 15, 0, tzinfo=timezone.utc)
+
+
+def quote(status="approved", created_at=DAY, labor_cost=20.0, discount=10.0, items=None, quote_id="q1"):
+    items = [
+        {"type": "part", "total": 30.0},
+        {"type": "service", "total": 50.0},
+    ] if items is None else items
+    total = sum(item["total"] for item in items) + labor_cost - discount
+    return {"id": quote_id, "status": status, "created_at": created_at, "items": items,
+            "labor_cost": labor_cost, "discount": discount, "total": total}
+
+
+async def buckets(db) -> dict:
+    """Non-zero counters per day."""
+    rows = await db.revenue_daily.find({}, {"_id": 0}).to_list(None)
+    result = {}
+    for row in rows:
+        counters = {key: value for key, value in row.items() if key != "id" and value}
+        if counters:
+            result[row["id"]] = counters
+    return result
+
+
+def test_contribution_splits_revenue_by_source():
+    assert server._revenue_contribution(quote()) == {"2026-03-02": {
+        "quotes": 1, "approved": 1, "revenue": 90.0, "labor": 20.0, "parts": 30.0, "services": 50.0, "discount": 10.0,
+    }}
+    # only approved/completed quotes carry amounts
+    assert server._revenue_contribution(quote("pending")) == {"2026-03-02": {"quotes": 1, "pending": 1}}
+    assert server._revenue_contribution(None) == {}
+
+
+def test_days_are_utc():
+    late_evening = datetime(2026, 3, 1, 22, 0, tzinfo=timezone(timedelta(hours=-3)))
+    assert list(server._revenue_contribution(quote(created_at=late_evening))) == ["2026-03-02"]
+
+
+async def test_status_change_moves_counts_and_amounts(db):
+    await server.apply_revenue_change(None, quote("pending"))
+    assert await buckets(db) == {"2026-03-02": {"quotes": 1, "pending": 1}}
+
+    await server.apply_revenue_change(quote("pending"), quote("approved"))
+    assert await buckets(db) == {"2026-03-02": {
+        "quotes": 1, "approved": 1, "revenue": 90.0, "labor": 20.0, "parts": 30.0, "services": 50.0, "discount": 10.0,
+    }}
+
+
+async def test_item_edits_only_move_the_changed_split(db):
+    before = quote()
+    after = quote(items=[{"type": "part", "total": 30.0}, {"type": "service", "total": 80.0}])
+    await server.apply_revenue_change(None, before)
+    await server.apply_revenue_change(before, after)
+    day = (await buckets(db))["2026-03-02"]
+    assert (day["parts"], day["services"], day["revenue"], day["quotes"]) == (30.0, 80.0, 120.0, 1)
+
+
+async def test_moving_a_quote_to_another_day_splits_the_delta(db):
+    before = quote()
+    after = quote(created_at=DAY + timedelta(days=1))
+    await server.apply_revenue_change(None, before)
+    await server.apply_revenue_change(before, after)
+    assert list(await buckets(db)) == ["2026-03-03"]
+
+    await server.apply_revenue_change(after, None)
+    assert await buckets(db) == {}
+
+
+async def test_incremental_rollups_match_a_rebuild(db):
+    rng = random.Random(7)
+    quotes = {}
+    for step in range(200):
+        quote_id = f"q{rng.randrange(25)}"
+        before = quotes.get(quote_id)
+        if before and rng.random() < 0.15:
+            after = None
+        else:
+            items = [{"type": rng.choice(["part", "service"]), "total": float(rng.randrange(1, 500))}
+                     for _ in range(rng.randrange(0, 4))]
+            created_at = before["created_at"] if before else DAY + timedelta(hours=rng.randrange(0, 24 * 10))
+            after = quote(rng.choice(server.ROLLUP_COUNT_STATUSES), created_at, float(rng.randrange(0, 200)),
+                          float(rng.randrange(0, 20)), items, quote_id)
+        await server.apply_revenue_change(before, after)
+        if after:
+            await db.quotes.replace_one({"id": quote_id}, dict(after), upsert=True)
+            quotes[quote_id] = after
+        else:
+            await db.quotes.delete_one({"id": quote_id})
+            del quotes[quote_id]
+    incremental = await buckets(db)
+
+    days = await server.rebuild_revenue_rollups()
+
+    rebuilt = await buckets(db)
+    assert days == len(rebuilt)
+    assert incremental.keys() == rebuilt.keys()
+    for day, counters in rebuilt.items():
+        assert incremental[day] == pytest.approx(counters), day
+
+
+async def test_report_groups_days_into_partial_weeks(db, http, auth_headers):
+    await server.apply_revenue_change(None, quote(created_at=datetime(2026, 3, 1, tzinfo=timezone.utc)))
+    await server.apply_revenue_change(None, quote(created_at=datetime(2026, 3, 4, tzinfo=timezone.utc)))
+    await server.apply_revenue_change(None, quote("pending", created_at=datetime(2026, 3, 9, tzinfo=timezone.utc)))
+
+    response = await http.get("/api/reports/revenue", params={"from": "2026-03-01", "to": "2026-03-10",
+                                                                "group_by": "week"}, headers=auth_headers)
+
+    report = response.json()
+    assert [(bucket["period"], bucket["quotes"], bucket["revenue"]) for bucket in report["buckets"]] == [
+        ("2026-W09", 1, 90.0), ("2026-W10", 1, 90.0), ("2026-W11", 1, 0),
+    ]
+    assert (report["totals"]["quotes"], report["totals"]["pending"], report["totals"]["revenue"]) == (3, 1, 180.0)
+
+
+async def save_quote(db, before, after):
+    """What the quote handlers do: write the quote, then its rollup delta."""
+    if after:
+        await db.quotes.replace_one({"id": after["id"]}, dict(after), upsert=True)
+    else:
+        await db.quotes.delete_one({"id": before["id"]})
+    await server.apply_revenue_change(before, after)
+
+
+@pytest.fixture
+def during_scan(monkeypatch):
+    """Run a coroutine function once the rebuild has read its first quote."""
+    hooks = []
+    original = mongomock_motor.AsyncCursor.next
+
+    async def next_then_hook(cursor):
+        doc = await original(cursor)
+        while hooks:
+            await hooks.pop(0)()
+        return doc
+
+    monkeypatch.setattr(mongomock_motor.AsyncCursor, "next", next_then_hook)
+    monkeypatch.setattr(mongomock_motor.AsyncCursor, "__anext__", next_then_hook)
+    return hooks.append
+
+
+async def test_rebuild_keeps_changes_made_while_it_runs(db, during_scan):
+    first, second, third = quote(quote_id="q1"), quote("pending", quote_id="q2"), quote(quote_id="q3")
+    for doc in (first, second, third):
+        await save_quote(db, None, doc)
+    await db.revenue_daily.update_one({"id": "2026-03-02"}, {"$inc": {"revenue": 1000.0}})  # drift to repair
+
+    async def concurrent_writes():
+        await save_quote(db, second, quote("approved", quote_id="q2"))
+        await save_quote(db, third, None)
+        await save_quote(db, None, quote(created_at=DAY + timedelta(days=1), quote_id="q4"))
+        assert await db.revenue_daily.count_documents({"id": "2026-03-03"}) == 0  # parked, not applied
+    during_scan(concurrent_writes)
+
+    await server.rebuild_revenue_rollups()
+
+    assert await db.revenue_rebuilds.count_documents({}) == 0
+    assert await buckets(db) == {
+        "2026-03-02": {"quotes": 2, "approved": 2, "revenue": 180.0, "labor": 40.0, "parts": 60.0,
+                       "services": 100.0, "discount": 20.0},
+        "2026-03-03": {"quotes": 1, "approved": 1, "revenue": 90.0, "labor": 20.0, "parts": 30.0,
+                       "services": 50.0, "discount": 10.0},
+    }
+
+
+async def test_failed_rebuild_applies_the_parked_changes(db, during_scan, monkeypatch):
+    await save_quote(db, None, quote("pending"))
+
+    async def fail_after_a_write():
+        await save_quote(db, quote("pending"), quote("approved"))
+        monkeypatch.delitem(server.INDEXES, "revenue_daily")  # fails the staging step
+    during_scan(fail_after_a_write)
+
+    with pytest.raises(KeyError):
+        await server.rebuild_revenue_rollups()
+
+    monkeypatch.undo()
+    assert (await buckets(db))["2026-03-02"]["approved"] == 1
+    assert await db.revenue_rebuilds.count_documents({}) == 0
+
+
+async def test_only_one_rebuild_runs_at_a_time(db):
+    await server.ensure_indexes()
+    await db.revenue_rebuilds.insert_one({"id": server.REVENUE_REBUILD_ID, "started_at": datetime.now(timezone.utc),
+                                          "changes": []})
+
+    with pytest.raises(RuntimeError):
+        await server.rebuild_revenue_rollups()
+
+    # a rebuild that died long ago neither parks deltas nor blocks a new one
+    await db.revenue_rebuilds.update_one({}, {"$set": {"started_at": DAY - timedelta(days=30)}})
+    await save_quote(db, None, quote())
+    assert list(await buckets(db)) == ["2026-03-02"]
+    assert await server.rebuild_revenue_rollups() == 1
@@ -0,0 +1,30 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_startup_backfill_makes_legacy_documents_searchable(db, http, auth_headers):
+    # written before the search subdocument existed
+    await db.clients.insert_one({"id": "legacy", "name": "José Araújo", "phone": "(11) 98765-4321",
+                                 "cpf": "123.456.789-00", "created_at": datetime.now(timezone.utc)})
+    response = await http.get("/api/search", params={"q": "jose"}, headers=auth_headers)
+    assert response.json()["clients"] == []
+
+    await server.backfill_missing_search_keys()
+
+    for q in ("jose", "araujo", "123.456", "11987"):
+        response = await http.get("/api/search", params={"q": q, "scope": "clients"}, headers=auth_headers)
+        assert [client["id"] for client in response.json()["clients"]] == ["legacy"], q
+
+
+async def test_missing_only_backfill_keeps_existing_keys(db):
+    await db.clients.insert_one({"id": "a", "name": "Ana", "search": {"name": "stale"}})
+    await db.clients.insert_one({"id": "b", "name": "Bruno"})
+
+    assert await server.backfill_search_keys("clients", missing_only=True) == 1
+    assert (await db.clients.find_one({"id": "a"}))["search"] == {"name": "stale"}
+    assert (await db.clients.find_one({"id": "b"}))["search"]["name_tokens"] == ["bruno"]
@@ -0,0 +1,75 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+JANUARY = datetime(2026, 1, 10, tzinfo=timezone.utc)
+FEBRUARY = datetime(2026, 2, 10, tzinfo=timezone.utc)
+
+
+async def stats(db) -> dict:
+    doc = await db.stats.find_one({"id": server.STATS_DOC_ID}, {"_id": 0, "id": 0}) or {}
+    doc.setdefault("revenue_by_month", {})
+    return doc
+
+
+def quote(status, total=100.0, created_at=JANUARY):
+    return {"id": "q", "status": status, "total": total, "created_at": created_at}
+
+
+async def test_quote_status_changes_move_counters(db):
+    await server.apply_stats_change("quotes", None, quote("pending"))
+    assert await stats(db) == {"pending_quotes": 1, "revenue_by_month": {}}
+
+    await server.apply_stats_change("quotes", quote("pending"), quote("approved"))
+    assert await stats(db) == {"pending_quotes": 0, "revenue_by_month": {"2026-01": 100.0}}
+
+    # a new total on an approved quote only moves the difference
+    await server.apply_stats_change("quotes", quote("approved"), quote("completed", total=150.0))
+    assert (await stats(db))["revenue_by_month"] == {"2026-01": 150.0}
+
+    await server.apply_stats_change("quotes", quote("completed", total=150.0), None)
+    assert await stats(db) == {"pending_quotes": 0, "revenue_by_month": {"2026-01": 0.0}}
+
+
+async def test_revenue_follows_the_created_at_month(db):
+    await server.apply_stats_change("quotes", None, quote("approved"))
+    await server.apply_stats_change("quotes", quote("approved"), quote("approved", created_at=FEBRUARY))
+    assert (await stats(db))["revenue_by_month"] == {"2026-01": 0.0, "2026-02": 100.0}
+
+
+async def test_unchanged_counters_are_not_written(db):
+    await server.apply_stats_change("appointments", {"status": "completed"}, {"status": "cancelled"})
+    assert await db.stats.count_documents({}) == 0
+
+    await server.apply_stats_change("appointments", None, {"status": "scheduled"})
+    await server.apply_stats_change("appointments", {"status": "scheduled"}, {"status": "confirmed"})
+    assert (await stats(db))["pending_appointments"] == 1
+    await server.apply_stats_change("appointments", {"status": "confirmed"}, {"status": "completed"})
+    assert (await stats(db))["pending_appointments"] == 0
+
+
+async def test_route_deltas_match_a_full_reconciliation(db, http, auth_headers):
+    client = (await http.post("/api/clients", json={"name": "Ana", "phone": "1"}, headers=auth_headers)).json()
+    vehicle = (await http.post("/api/vehicles", json={
+        "client_id": client["id"], "brand": "VW", "model": "Gol", "license_plate": "ABC1D23", "year": 2020,
+    }, headers=auth_headers)).json()
+    quote_ids = []
+    for labor_cost in (100, 200, 300):
+        response = await http.post("/api/quotes", json={
+            "client_id": client["id"], "vehicle_id": vehicle["id"], "items": [], "labor_cost": labor_cost,
+        }, headers=auth_headers)
+        quote_ids.append(response.json()["id"])
+    await http.post(f"/api/quotes/{quote_ids[0]}/approve", headers=auth_headers)
+    await http.post(f"/api/quotes/{quote_ids[1]}/reject", headers=auth_headers)
+    await http.delete(f"/api/quotes/{quote_ids[2]}", headers=auth_headers)
+
+    incremental = await stats(db)
+    reconciled = await server.reconcile_dashboard_stats()
+    for key in ("total_clients", "total_vehicles", "pending_quotes"):
+        assert incremental.get(key, 0) == reconciled[key], key
+    assert {month: total for month, total in incremental["revenue_by_month"].items() if total} \
+        == reconciled["revenue_by_month"]
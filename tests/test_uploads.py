@@ -0,0 +1,84 @@
+import io
+
+import pytest
+from PIL import Image
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+LOGO_UPLOAD = "/api/settings/logo-upload"
+MAX_BYTES = 1024 * 1024
+
+
+def png_bytes() -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", (40, 20), "red").save(output, format="PNG")
+    return output.getvalue()
+
+
+def multipart(content: bytes, boundary="limit-test") -> bytes:
+    return (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="logo.png"\r\n'
+        "Content-Type: image/png\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+
+
+@pytest.fixture
+def uploads(monkeypatch, tmp_path):
+    directory = tmp_path / "uploads"
+    directory.mkdir()
+    monkeypatch.setattr(server, "UPLOADS_DIR", directory)
+    monkeypatch.setitem(server.UPLOAD_LIMITS, LOGO_UPLOAD, MAX_BYTES)
+    return directory
+
+
+async def test_logo_upload_is_stored_under_its_content_hash(http, auth_headers, uploads):
+    content = png_bytes()
+
+    first = await http.post(LOGO_UPLOAD, files={"file": ("logo.png", content, "image/png")}, headers=auth_headers)
+    second = await http.post(LOGO_UPLOAD, files={"file": ("other.png", content, "image/png")}, headers=auth_headers)
+
+    assert first.status_code == second.status_code == 200
+    assert first.json()["logo_url"] == second.json()["logo_url"]
+    stored = sorted(path.name for path in uploads.iterdir())
+    assert len(stored) == 2  # the upload and its PDF variant, no temp files
+    assert first.json()["logo_url"].endswith(f"/uploads/{stored[0]}")
+
+
+async def test_declared_length_over_the_limit_is_refused_up_front(http, auth_headers, uploads):
+    body = multipart(b"\0" * (MAX_BYTES + server.UPLOAD_FORM_OVERHEAD))
+
+    response = await http.post(LOGO_UPLOAD, content=body, headers={
+        **auth_headers, "Content-Type": "multipart/form-data; boundary=limit-test",
+    })
+
+    assert response.status_code == 413
+    assert response.json()["detail"] == "File too large. Max size is 1MB."
+    assert list(uploads.iterdir()) == []
+
+
+async def test_streamed_body_over_the_limit_is_cut_off(http, auth_headers, uploads):
+    body = multipart(b"\0" * (MAX_BYTES + server.UPLOAD_FORM_OVERHEAD))
+
+    async def chunked():
+        # no Content-Length: the middleware has to count
+        for start in range(0, len(body), 64 * 1024):
+            yield body[start:start + 64 * 1024]
+
+    response = await http.post(LOGO_UPLOAD, content=chunked(), headers={
+        **auth_headers, "Content-Type": "multipart/form-data; boundary=limit-test",
+    })
+
+    assert response.status_code == 413
+    assert response.json()["detail"] == "File too large. Max size is 1MB."
+    assert list(uploads.iterdir()) == []
+
+
+async def test_other_routes_are_not_limited(http, auth_headers, uploads, monkeypatch):
+    monkeypatch.setattr(server, "UPLOAD_LIMITS", {LOGO_UPLOAD: 0})
+
+    response = await http.post("/api/clients", json={"name": "Ana", "address": "x" * 4096}, headers=auth_headers)
+
+    assert response.status_code == 200
@@ -0,0 +1,112 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+async def conditional_get(http, auth_headers, path, etag):
+    return await http.get(path, headers={**auth_headers, "If-None-Match": etag})
+
+
+async def test_list_answers_304_until_a_write(http, auth_headers):
+    await http.post("/api/clients", json={"name": "Ana"}, headers=auth_headers)
+    first = await http.get("/api/clients", headers=auth_headers)
+    etag = first.headers["etag"]
+
+    assert (await conditional_get(http, auth_headers, "/api/clients", etag)).status_code == 304
+
+    await http.post("/api/clients", json={"name": "Bruno"}, headers=auth_headers)
+    fresh = await conditional_get(http, auth_headers, "/api/clients", etag)
+    assert fresh.status_code == 200
+    assert fresh.headers["etag"] != etag
+    assert [client["name"] for client in fresh.json()] == ["Ana", "Bruno"]
+
+
+async def test_list_sees_a_write_made_by_another_worker(http, auth_headers, db):
+    await http.post("/api/clients", json={"name": "Ana"}, headers=auth_headers)
+    etag = (await http.get("/api/clients", headers=auth_headers)).headers["etag"]
+
+    # another instance wrote and bumped the counter; this one's memory is stale
+    await db.clients.insert_one({"id": "c2", "name": "Bruno", "phone": "", "created_at": datetime.now(timezone.utc)})
+    await db.versions.update_one({"id": "clients"}, {"$inc": {"version": 1}})
+
+    fresh = await conditional_get(http, auth_headers, "/api/clients", etag)
+    assert fresh.status_code == 200
+    assert len(fresh.json()) == 2
+
+
+async def test_list_etag_changes_when_the_counter_is_recreated(http, auth_headers, db):
+    await http.post("/api/clients", json={"name": "Ana"}, headers=auth_headers)
+    etag = (await http.get("/api/clients", headers=auth_headers)).headers["etag"]
+
+    await db.versions.delete_many({})
+
+    assert (await conditional_get(http, auth_headers, "/api/clients", etag)).status_code == 200
+
+
+async def bootstrap(http, auth_headers, page, known=None):
+    params = {"known": ",".join(f"{name}:{version}" for name, version in known.items())} if known else {}
+    response = await http.get(f"/api/bootstrap/{page}", params=params, headers=auth_headers)
+    assert response.status_code == 200
+    return response.json()["sections"]
+
+
+async def test_bootstrap_sends_every_section_with_its_version(http, auth_headers):
+    client = (await http.post("/api/clients", json={"name": "Ana", "phone": "1"}, headers=auth_headers)).json()
+
+    sections = await bootstrap(http, auth_headers, "quotes")
+
+    assert list(sections) == ["quotes", "clients", "vehicles", "services", "parts"]
+    assert all(isinstance(section["version"], str) for section in sections.values())
+    assert sections["clients"]["data"] == [{"id": client["id"], "name": "Ana"}]
+    assert sections["vehicles"]["data"] == []
+    assert sections["quotes"] == {"version": sections["quotes"]["version"], "data": [], "next": None}
+    assert "next" not in sections["clients"]
+
+
+async def test_bootstrap_omits_sections_the_client_already_has(http, auth_headers):
+    await http.post("/api/clients", json={"name": "Ana"}, headers=auth_headers)
+    first = await bootstrap(http, auth_headers, "appointments")
+    known = {name: section["version"] for name, section in first.items()}
+
+    again = await bootstrap(http, auth_headers, "appointments", known)
+
+    assert again == {name: {"version": version, "data": None} for name, version in known.items()}
+
+
+async def test_bootstrap_resends_a_section_another_worker_changed(http, auth_headers, db):
+    await http.post("/api/clients", json={"name": "Ana"}, headers=auth_headers)
+    first = await bootstrap(http, auth_headers, "appointments")
+    known = {name: section["version"] for name, section in first.items()}
+
+    await db.clients.insert_one({"id": "c2", "name": "Bruno", "phone": "", "created_at": datetime.now(timezone.utc)})
+    await db.versions.update_one({"id": "clients"}, {"$inc": {"version": 1}})
+
+    again = await bootstrap(http, auth_headers, "appointments", known)
+
+    assert again["clients"]["version"] != known["clients"]
+    assert [client["name"] for client in again["clients"]["data"]] == ["Ana", "Bruno"]
+    assert again["vehicles"]["data"] is None
+
+
+async def test_settings_cache_follows_writes(http, auth_headers):
+    assert (await http.get("/api/settings", headers=auth_headers)).json()["workshop_name"] == "IBS Auto Center"
+
+    await http.put("/api/settings", json={"workshop_name": "Oficina Nova"}, headers=auth_headers)
+
+    assert (await http.get("/api/settings", headers=auth_headers)).json()["workshop_name"] == "Oficina Nova"
+
+
+async def test_settings_cache_sees_a_write_made_by_another_worker(http, auth_headers, db):
+    await http.get("/api/settings", headers=auth_headers)
+    assert server._settings_cache["doc"]["workshop_name"] == "IBS Auto Center"
+
+    await db.settings.update_one({"id": "settings"}, {"$set": {"workshop_name": "Oficina Nova"}})
+    await db.versions.update_one({"id": "settings"}, {"$inc": {"version": 1}, "$set": {"epoch": "other"}},
+                                 upsert=True)
+
+    assert (await server.get_cached_settings())["workshop_name"] == "Oficina Nova"
+    assert (await http.get("/api/settings", headers=auth_headers)).json()["workshop_name"] == "Oficina Nova"